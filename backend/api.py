@@ -5,221 +5,207 @@ Flask backend for React frontend
 from flask import Flask, jsonify, request
 from flask_cors import CORS
 import psycopg2
-from psycopg2.extras import RealDictCursor
 import os
 import sys
+from datetime import date, timedelta
 
 # Add parent directory for imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from scripts.config import DB_CONFIG
+from backend import db, metrics, serialize
+from backend.audit import audit_event
+from backend.db import get_db, tuple_cursor
+from backend.prepared import execute_prepared
+from backend.counts import COUNT_STRATEGIES, count_rows
+from backend.cache import LRUCache, get_data_version, on_data_version_change
+from backend.response_cache import cached_response
+from backend.export import EXPORT_FORMATS, EXPORT_SELECT, stream_export
+from backend.serialize import RESPONSE_SHAPES, shape_rows
+from scripts.config import API_STATS_TTL, API_SUGGEST_CACHE_SIZE, API_NEXT_ACTION_COUNT_TTL, LIFT_REPLACEMENT_COST
+from backend.pagination import InvalidCursor, encode_cursor
+from backend import queries
 
 app = Flask(__name__)
 app.config['JSON_AS_ASCII'] = False  # Правильная работа с UTF-8
 CORS(app)  # Enable CORS for React dev server
+db.init_app(app)  # Соединения из пула возвращаются в teardown каждого запроса
+# after_request вызываются в обратном порядке регистрации: метрики подключаются раньше сжатия,
+# чтобы их хук сработал после него и время gzip/brotli вошло в задержку запроса
+metrics.init_app(app)  # /metrics: задержки, время SQL и сериализации по эндпоинтам
+serialize.init_app(app)  # orjson и gzip/brotli для больших ответов
 
-def get_db():
-    """Get database connection"""
-    return psycopg2.connect(**DB_CONFIG, cursor_factory=RealDictCursor)
+# Статистика дашборда: ключ - версия данных, TTL на случай правок в БД мимо импорта
+_stats_cache = LRUCache(maxsize=2, ttl=API_STATS_TTL)
+on_data_version_change(lambda version: _stats_cache.clear())
+
+# Справочник регионов: 14 строк, меняются только вместе с данными
+_regions_cache = LRUCache(maxsize=2)
+on_data_version_change(lambda version: _regions_cache.clear())
+
+# Подсказки поиска: ключ - (нормализованный запрос, limit). Набор текста дает много повторов
+_suggest_cache = LRUCache(maxsize=API_SUGGEST_CACHE_SIZE)
+on_data_version_change(lambda version: _suggest_cache.clear())
+
+# Бейдж "дела на сегодня": ключ - (user_id, дата); CRM-данные меняются мимо импорта, поэтому только TTL
+_next_action_count_cache = LRUCache(maxsize=1000, ttl=API_NEXT_ACTION_COUNT_TTL)
+
+@app.errorhandler(InvalidCursor)
+def handle_invalid_cursor(e):
+    return jsonify({'error': str(e)}), 400
+
+@app.errorhandler(psycopg2.IntegrityError)
+def handle_integrity_error(e):
+    # Несуществующий status_id/building_id и т.п.; транзакцию откатит возврат соединения в пул
+    return jsonify({'error': e.diag.message_primary or 'Integrity error'}), 400
+
+@app.route('/api/health', methods=['GET'])
+def get_health():
+    """Health check with connection pool metrics"""
+    return jsonify({'status': 'ok', 'pool': db.get_pool().stats()})
 
 @app.route('/api/regions', methods=['GET'])
+@cached_response
 def get_regions():
-    """Get list of regions from buildings table"""
+    """Get regions (id, code, name, buildings count) from the regions table"""
     conn = get_db()
-    cur = conn.cursor()
-
-    # Get distinct regions from buildings (text field, not FK)
-    cur.execute("""
-        SELECT DISTINCT region
-        FROM buildings
-        WHERE region IS NOT NULL
-        ORDER BY region
-    """)
-    regions_raw = cur.fetchall()
+    version = get_data_version(conn)
 
-    # Format as list of region names
-    regions = [{'region': r['region']} for r in regions_raw]
-
-    cur.close()
-    conn.close()
+    regions = _regions_cache.get(version)
+    if regions is None:
+        cur = conn.cursor()
+        cur.execute(queries.REGIONS_QUERY)
+        regions = queries.shape_regions(cur.fetchall())
+        cur.close()
+        _regions_cache.set(version, regions)
 
     return jsonify({'regions': regions})
 
 @app.route('/api/stats', methods=['GET'])
 def get_stats():
-    """Get dashboard statistics"""
+    """Get dashboard statistics (snapshot refreshed by importers)"""
+    # Без cached_response: его кэш и ETag живут до смены версии данных, а здесь
+    # правки в БД мимо импорта должны появляться через API_STATS_TTL
     conn = get_db()
-    cur = conn.cursor()
-    
-    stats = {}
-    
-    # Buildings count
-    cur.execute("SELECT COUNT(*) as count FROM buildings")
-    stats['buildings'] = cur.fetchone()['count']
-    
-    # Companies count
-    cur.execute("SELECT COUNT(*) as count FROM management_companies")
-    stats['companies'] = cur.fetchone()['count']
-    
-    # Companies with contacts
-    cur.execute("SELECT COUNT(*) as count FROM management_companies WHERE phone IS NOT NULL")
-    stats['with_phone'] = cur.fetchone()['count']
-    
-    cur.execute("SELECT COUNT(*) as count FROM management_companies WHERE email IS NOT NULL")
-    stats['with_email'] = cur.fetchone()['count']
-    
-    # Linked buildings
-    cur.execute("SELECT COUNT(*) as count FROM buildings_management")
-    stats['linked'] = cur.fetchone()['count']
-    
-    cur.close()
-    conn.close()
-    
+    version = get_data_version(conn)
+
+    stats = _stats_cache.get(version)
+    if stats is None:
+        cur = conn.cursor()
+        cur.execute(queries.STATS_SNAPSHOT_QUERY)
+        stats = cur.fetchone()
+
+        if stats is None:
+            cur.execute(queries.STATS_FALLBACK_QUERY)
+            stats = cur.fetchone()
+
+        cur.close()
+        stats = dict(stats)
+        _stats_cache.set(version, stats)
+
     return jsonify(stats)
 
 @app.route('/api/buildings', methods=['GET'])
+@cached_response
 def get_buildings():
     """Get buildings list with pagination and filters"""
     conn = get_db()
     cur = conn.cursor()
     
-    # Pagination
+    # Pagination: cursor (keyset) или page (offset, запасной вариант)
     page = int(request.args.get('page', 1))
     per_page = int(request.args.get('per_page', 20))
     offset = (page - 1) * per_page
-    
-    # Filters
-    search = request.args.get('search', '')
-    region = request.args.get('region', '')
-    account_type = request.args.get('account_type', '')  # 'SPEC' or 'REGOP'
-    min_balance = request.args.get('min_balance', '')
-    replacement_year = request.args.get('replacement_year', '')  # Конкретный год замены
-    has_lifts = request.args.get('has_lifts', 'true')  # Только с лифтами (по умолчанию true)
-    sort_by = request.args.get('sort_by', 'balance')  # balance, address, lifts, date
-    sort_order = request.args.get('sort_order', 'desc')  # asc or desc
-
-    # Build query with lifts info
-    query = """
-        SELECT b.id, b.address, b.mkd_code, b.total_sq, b.overhaul_funds_balance,
-               b.spec_account_owner_type, b.region, mc.name as company_name, mc.phone, mc.email, mc.director_name,
-               (SELECT COUNT(*) FROM lifts WHERE building_id = b.id) as lifts_count,
-               (SELECT MIN(decommissioning_date) FROM lifts WHERE building_id = b.id) as nearest_replacement
-        FROM buildings b
-        LEFT JOIN buildings_management bm ON b.id = bm.building_id
-        LEFT JOIN management_companies mc ON bm.company_id = mc.id
-        WHERE 1=1
-    """
-    params = []
-
-    if search:
-        query += " AND (b.address ILIKE %s OR b.mkd_code ILIKE %s)"
-        params.extend([f'%{search}%', f'%{search}%'])
-
-    if region:
-        query += " AND b.region = %s"
-        params.append(region)
-
-    # Filter by account type
-    if account_type == 'SPEC':
-        query += " AND b.spec_account_owner_type IN ('UK', 'TSJ', 'JSK')"
-    elif account_type == 'REGOP':
-        query += " AND (b.spec_account_owner_type = 'REGOP' OR b.spec_account_owner_type IS NULL)"
-
-    # Filter by minimum balance (значения уже в тысячах в БД!)
-    if min_balance:
-        try:
-            min_bal = float(min_balance)
-            query += " AND b.overhaul_funds_balance >= %s"
-            params.append(min_bal)
-        except ValueError:
-            pass
-
-    # Filter by replacement years (можно выбрать несколько годов через запятую)
-    if replacement_year:
-        try:
-            # Разбираем строку с годами: "2025,2026,2027" -> [2025, 2026, 2027]
-            years = [int(y.strip()) for y in replacement_year.split(',') if y.strip()]
-            if years:
-                placeholders = ','.join(['%s'] * len(years))
-                query += f" AND EXISTS (SELECT 1 FROM lifts l WHERE l.building_id = b.id AND EXTRACT(YEAR FROM l.decommissioning_date) IN ({placeholders}))"
-                params.extend(years)
-        except ValueError:
-            pass
-
-    # Filter by lifts presence (только дома с лифтами)
-    if has_lifts == 'true':
-        query += " AND EXISTS (SELECT 1 FROM lifts WHERE building_id = b.id)"
-
-    # Sorting
-    sort_column = 'b.overhaul_funds_balance'  # default
-    if sort_by == 'address':
-        sort_column = 'b.address'
-    elif sort_by == 'lifts':
-        sort_column = 'lifts_count'
-    elif sort_by == 'date':
-        sort_column = 'nearest_replacement'
-    elif sort_by == 'balance':
-        sort_column = 'b.overhaul_funds_balance'
-
-    sort_dir = 'DESC' if sort_order == 'desc' else 'ASC'
-    query += f" ORDER BY {sort_column} {sort_dir} NULLS LAST LIMIT {per_page} OFFSET {offset}"
-    
-    cur.execute(query, params)
-    buildings = cur.fetchall()
+    cursor = request.args.get('cursor', '')
+    count_strategy = request.args.get('count', 'auto')  # auto, exact, estimate, none
+    if count_strategy not in COUNT_STRATEGIES:
+        count_strategy = 'auto'
+    shape = request.args.get('shape', 'objects')  # objects или columns ({columns, rows})
+    if shape not in RESPONSE_SHAPES:
+        shape = 'objects'
+    sort_by, _, _, sort_dir = queries.building_sort(request.args)
+
+    query, params, count_query, count_params, signature = queries.buildings_page(
+        request.args, per_page, offset, cursor
+    )
+
+    # Страница - кортежами: без dict на строку, sort_key (последняя колонка) отрезается срезом
+    page_cur = tuple_cursor(conn)
+    execute_prepared(page_cur, query, params)
+    rows = page_cur.fetchall()
+    columns = [col.name for col in page_cur.description][:-1]
+    page_cur.close()
+
+    next_cursor = None
+    if len(rows) == per_page:
+        last = rows[-1]
+        next_cursor = encode_cursor(sort_by, sort_dir, last[-1], last[0])
+    rows = [row[:-1] for row in rows]
     
     # Get total count (using same filters)
-    count_query = "SELECT COUNT(*) as count FROM buildings b WHERE 1=1"
-    count_params = []
-
-    if search:
-        count_query += " AND (b.address ILIKE %s OR b.mkd_code ILIKE %s)"
-        count_params.extend([f'%{search}%', f'%{search}%'])
-
-    if region:
-        count_query += " AND b.region = %s"
-        count_params.append(region)
-
-    if account_type == 'SPEC':
-        count_query += " AND b.spec_account_owner_type IN ('UK', 'TSJ', 'JSK')"
-    elif account_type == 'REGOP':
-        count_query += " AND (b.spec_account_owner_type = 'REGOP' OR b.spec_account_owner_type IS NULL)"
-
-    if min_balance:
-        try:
-            min_bal = float(min_balance)
-            count_query += " AND b.overhaul_funds_balance >= %s"
-            count_params.append(min_bal)
-        except ValueError:
-            pass
-
-    if replacement_year:
-        try:
-            # Разбираем строку с годами: "2025,2026,2027" -> [2025, 2026, 2027]
-            years = [int(y.strip()) for y in replacement_year.split(',') if y.strip()]
-            if years:
-                placeholders = ','.join(['%s'] * len(years))
-                count_query += f" AND EXISTS (SELECT 1 FROM lifts l WHERE l.building_id = b.id AND EXTRACT(YEAR FROM l.decommissioning_date) IN ({placeholders}))"
-                count_params.extend(years)
-        except ValueError:
-            pass
-
-    if has_lifts == 'true':
-        count_query += " AND EXISTS (SELECT 1 FROM lifts WHERE building_id = b.id)"
-
-    cur.execute(count_query, count_params)
-    total = cur.fetchone()['count']
+    total, count_strategy = count_rows(cur, count_query, count_params, signature, count_strategy)
     
     cur.close()
-    conn.close()
     
     return jsonify({
-        'buildings': buildings,
+        **shape_rows(columns, rows, shape, 'buildings'),
         'total': total,
+        'count_strategy': count_strategy,  # 'estimate' - total приблизительный
         'page': page,
         'per_page': per_page,
-        'pages': (total + per_page - 1) // per_page
+        'pages': (total + per_page - 1) // per_page if total is not None else None,
+        'next_cursor': next_cursor
     })
 
+@app.route('/api/buildings/facets', methods=['GET'])
+@cached_response
+def get_building_facets():
+    """Counts per region, account type, replacement year and balance bucket for the current filters"""
+    conn = get_db()
+    cur = conn.cursor()
+
+    query, params = queries.facets_query(request.args)
+    cur.execute(query, params)
+    rows = cur.fetchall()
+    cur.close()
+
+    return jsonify({'facets': queries.shape_facets(rows)})
+
+@app.route('/api/buildings/export', methods=['GET'])
+def export_buildings():
+    """Stream all buildings matching the list filters as CSV, NDJSON or XLSX"""
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f'Unknown format, use one of: {", ".join(EXPORT_FORMATS)}'}), 400
+
+    query, params = queries.buildings_export_query(request.args, EXPORT_SELECT)
+
+    return stream_export(get_db(), query, params, export_format, 'buildings')
+
+@app.route('/api/search/suggest', methods=['GET'])
+def get_search_suggest():
+    """Typeahead: top-N buildings by mkd_code prefix/substring and address similarity"""
+    q = ' '.join(request.args.get('q', '').split())
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 20)
+    if len(q) < 2:
+        return jsonify({'suggestions': []})
+
+    key = (q.lower(), limit)
+    suggestions = _suggest_cache.get(key)
+    if suggestions is not None:
+        return jsonify({'suggestions': suggestions, 'cached': True})
+
+    conn = get_db()
+    cur = conn.cursor()
+    cur.execute(queries.SUGGEST_QUERY, queries.suggest_params(q, limit))
+    rows = cur.fetchall()
+    cur.close()
+
+    suggestions = queries.merge_suggestions(rows, limit)
+
+    _suggest_cache.set(key, suggestions)
+    return jsonify({'suggestions': suggestions, 'cached': False})
+
 @app.route('/api/companies', methods=['GET'])
+@cached_response
 def get_companies():
     """Get management companies list"""
     conn = get_db()
@@ -228,53 +214,39 @@ def get_companies():
     page = int(request.args.get('page', 1))
     per_page = int(request.args.get('per_page', 20))
     offset = (page - 1) * per_page
+    cursor = request.args.get('cursor', '')
     search = request.args.get('search', '')
     
-    query = """
-        SELECT mc.id, mc.name, mc.ogrn, mc.phone, mc.email, mc.director_name,
-               COUNT(bm.building_id) as buildings_count
-        FROM management_companies mc
-        LEFT JOIN buildings_management bm ON mc.id = bm.company_id
-        WHERE 1=1
-    """
-    params = []
-    
-    if search:
-        query += " AND (mc.name ILIKE %s OR mc.ogrn ILIKE %s OR mc.phone ILIKE %s)"
-        params.extend([f'%{search}%', f'%{search}%', f'%{search}%'])
-    
-    query += f" GROUP BY mc.id ORDER BY buildings_count DESC LIMIT {per_page} OFFSET {offset}"
-    
-    cur.execute(query, params)
+    query, params, count_query, count_params, signature = queries.companies_page(search, per_page, offset, cursor)
+    execute_prepared(cur, query, params)
     companies = cur.fetchall()
+
+    next_cursor = None
+    if len(companies) == per_page:
+        last = companies[-1]
+        next_cursor = encode_cursor('buildings_count', 'DESC', last['buildings_count'], last['id'])
     
-    # Get total
-    cur.execute("SELECT COUNT(*) as count FROM management_companies")
-    total = cur.fetchone()['count']
+    # Get total (с учетом search, кэшируется до следующего импорта)
+    total, _ = count_rows(cur, count_query, count_params, signature, 'exact')
     
     cur.close()
-    conn.close()
     
     return jsonify({
         'companies': companies,
         'total': total,
         'page': page,
-        'pages': (total + per_page - 1) // per_page
+        'pages': (total + per_page - 1) // per_page,
+        'next_cursor': next_cursor
     })
 
 @app.route('/api/companies/<int:company_id>', methods=['GET'])
+@cached_response
 def get_company(company_id):
     """Get company details"""
     conn = get_db()
     cur = conn.cursor()
     
-    cur.execute("""
-        SELECT mc.*, COUNT(bm.building_id) as buildings_count
-        FROM management_companies mc
-        LEFT JOIN buildings_management bm ON mc.id = bm.company_id
-        WHERE mc.id = %s
-        GROUP BY mc.id
-    """, (company_id,))
+    cur.execute(queries.COMPANY_QUERY, (company_id,))
     
     company = cur.fetchone()
     
@@ -282,23 +254,279 @@ def get_company(company_id):
         return jsonify({'error': 'Company not found'}), 404
     
     # Get buildings for this company
-    cur.execute("""
-        SELECT b.id, b.address, b.mkd_code, b.total_sq
-        FROM buildings b
-        JOIN buildings_management bm ON b.id = bm.building_id
-        WHERE bm.company_id = %s
-        LIMIT 100
-    """, (company_id,))
+    cur.execute(queries.COMPANY_BUILDINGS_QUERY, (company_id,))
     
     buildings = cur.fetchall()
     
     cur.close()
-    conn.close()
     
     return jsonify({
         'company': company,
         'buildings': buildings
     })
 
+@app.route('/api/targets', methods=['GET'])
+@cached_response
+def get_targets():
+    """Get target buildings for sales (mv_target_buildings)"""
+    conn = get_db()
+    cur = conn.cursor()
+
+    page = int(request.args.get('page', 1))
+    per_page = int(request.args.get('per_page', 20))
+    offset = (page - 1) * per_page
+    priority = request.args.get('priority', '')  # HIGH, MEDIUM, LOW
+    region = request.args.get('region', '')  # region_name
+
+    where, params = queries.targets_where(priority, region)
+
+    cur.execute(queries.targets_page(where, per_page, offset), params)
+    targets = cur.fetchall()
+    for t in targets:
+        del t['company_key'], t['deal_key']
+
+    cur.execute(f"SELECT COUNT(*) as count FROM mv_target_buildings {where}", params)
+    total = cur.fetchone()['count']
+
+    cur.close()
+
+    return jsonify({
+        'targets': targets,
+        'total': total,
+        'page': page,
+        'pages': (total + per_page - 1) // per_page
+    })
+
+@app.route('/api/forecast', methods=['GET'])
+@cached_response
+def get_forecast():
+    """Lift replacement forecast sliced from lift_forecast_cube"""
+    try:
+        group_by, query, params = queries.forecast_query(request.args, LIFT_REPLACEMENT_COST)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    conn = get_db()
+    cur = conn.cursor()
+    cur.execute(query, params)
+    rows = queries.label_balance_buckets(cur.fetchall())
+    cur.close()
+
+    return jsonify({
+        'group_by': group_by,
+        'lift_replacement_cost': LIFT_REPLACEMENT_COST,
+        'rows': rows
+    })
+
+@app.route('/api/regions/stats', methods=['GET'])
+@cached_response
+def get_regional_stats():
+    """Get per-region statistics (mv_regional_stats)"""
+    conn = get_db()
+    cur = conn.cursor()
+
+    cur.execute(queries.REGIONAL_STATS_QUERY)
+    regions = cur.fetchall()
+
+    cur.close()
+
+    return jsonify({'regions': regions})
+
+@app.route('/api/companies/top', methods=['GET'])
+@cached_response
+def get_top_companies():
+    """Get top management companies by lifts and balance (mv_top_management_companies)"""
+    conn = get_db()
+    cur = conn.cursor()
+
+    limit = min(int(request.args.get('limit', 50)), 500)
+
+    cur.execute(queries.top_companies_query(limit))
+    companies = cur.fetchall()
+
+    cur.close()
+
+    return jsonify({'companies': companies})
+
+def _changes(old, new, fields):
+    """Old and new values of the written fields, for audit_log"""
+    return {f: old[f] for f in fields}, {f: new[f] for f in fields}
+
+@app.route('/api/deals', methods=['GET'])
+def get_deals():
+    """Deals list, newest first; filters: status_id, assigned_user_id, building_id, company_id"""
+    per_page = min(max(request.args.get('per_page', 50, type=int), 1), 200)
+    cursor = request.args.get('cursor', '')
+    try:
+        query, params = queries.deals_page(request.args, per_page, cursor)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    conn = get_db()
+    cur = conn.cursor()
+    cur.execute(query, params)
+    deals = cur.fetchall()
+    cur.close()
+
+    next_cursor = None
+    if len(deals) == per_page:
+        last_id = deals[-1]['id']
+        next_cursor = encode_cursor('id', 'DESC', last_id, last_id)
+
+    return jsonify({'deals': deals, 'per_page': per_page, 'next_cursor': next_cursor})
+
+@app.route('/api/deals/pipeline', methods=['GET'])
+def get_pipeline():
+    """Sales pipeline per status from deal_pipeline_summary (maintained by a trigger on deals)"""
+    conn = get_db()
+    cur = conn.cursor()
+    cur.execute(queries.PIPELINE_QUERY)
+    stages = cur.fetchall()
+    cur.close()
+
+    return jsonify({'stages': stages})
+
+@app.route('/api/deals/<int:deal_id>', methods=['GET'])
+def get_deal(deal_id):
+    """Get deal details"""
+    conn = get_db()
+    cur = conn.cursor()
+    cur.execute(queries.DEAL_QUERY, (deal_id,))
+    deal = cur.fetchone()
+    cur.close()
+
+    if not deal:
+        return jsonify({'error': 'Deal not found'}), 404
+    return jsonify({'deal': deal})
+
+@app.route('/api/deals', methods=['POST'])
+def create_deal():
+    """Create a deal; pipeline counters are updated by the trigger in the same transaction"""
+    try:
+        values = queries.deal_values(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    conn = get_db()
+    cur = conn.cursor()
+    query, params = queries.deal_insert(values)
+    cur.execute(query, params)
+    deal_id = cur.fetchone()['id']
+    cur.execute(queries.DEAL_QUERY, (deal_id,))
+    deal = cur.fetchone()
+    conn.commit()
+    cur.close()
+
+    audit_event('deal_create', 'deal', deal_id, new_values=values)
+    return jsonify({'deal': deal}), 201
+
+@app.route('/api/deals/<int:deal_id>', methods=['PATCH'])
+def update_deal(deal_id):
+    """Update deal fields; moving a card on the board is PATCH {"status_id": ...}"""
+    try:
+        values = queries.deal_values(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    conn = get_db()
+    cur = conn.cursor()
+    cur.execute(queries.DEAL_LOCK_QUERY, (deal_id,))
+    old = cur.fetchone()
+    if not old:
+        cur.close()
+        return jsonify({'error': 'Deal not found'}), 404
+
+    query, params = queries.deal_update(deal_id, values)
+    cur.execute(query, params)
+    new = cur.fetchone()
+    cur.execute(queries.DEAL_QUERY, (deal_id,))
+    deal = cur.fetchone()
+    conn.commit()
+    cur.close()
+
+    old_values, new_values = _changes(old, new, values)
+    audit_event('deal_update', 'deal', deal_id, old_values, new_values)
+    return jsonify({'deal': deal})
+
+@app.route('/api/deals/<int:deal_id>', methods=['DELETE'])
+def delete_deal(deal_id):
+    """Delete a deal (its activities are deleted by ON DELETE CASCADE)"""
+    conn = get_db()
+    cur = conn.cursor()
+    cur.execute(queries.DEAL_DELETE_QUERY, (deal_id,))
+    old = cur.fetchone()
+    conn.commit()
+    cur.close()
+
+    if not old:
+        return jsonify({'error': 'Deal not found'}), 404
+
+    audit_event('deal_delete', 'deal', deal_id, old_values=dict(old))
+    return '', 204
+
+@app.route('/api/activities/next-actions', methods=['GET'])
+def get_next_actions():
+    """A manager's open next actions due today or earlier (or within `days`), oldest first"""
+    user_id = request.args.get('user_id', type=int)
+    if user_id is None:
+        return jsonify({'error': 'user_id is required'}), 400
+    days = min(max(request.args.get('days', 0, type=int), 0), 30)  # 0 - только сегодня и просроченные
+    per_page = min(max(request.args.get('per_page', 50, type=int), 1), 200)
+    cursor = request.args.get('cursor', '')
+
+    query, params = queries.next_actions_page(user_id, date.today() + timedelta(days=days), per_page, cursor)
+
+    conn = get_db()
+    cur = conn.cursor()
+    cur.execute(query, params)
+    actions = cur.fetchall()
+    cur.close()
+
+    next_cursor = None
+    if len(actions) == per_page:
+        last = actions[-1]
+        next_cursor = encode_cursor('next_action_date', 'ASC', last['next_action_date'], last['id'])
+
+    return jsonify({'actions': actions, 'per_page': per_page, 'next_cursor': next_cursor})
+
+@app.route('/api/activities/next-actions/count', methods=['GET'])
+def get_next_action_count():
+    """Badge: number of a manager's open next actions due today or overdue (next_action_counts)"""
+    user_id = request.args.get('user_id', type=int)
+    if user_id is None:
+        return jsonify({'error': 'user_id is required'}), 400
+
+    key = (user_id, date.today())
+    counts = _next_action_count_cache.get(key)
+    if counts is not None:
+        return jsonify({**counts, 'cached': True})
+
+    conn = get_db()
+    cur = conn.cursor()
+    cur.execute(queries.NEXT_ACTION_COUNT_QUERY, (user_id,))
+    counts = {'user_id': user_id, **cur.fetchone()}
+    cur.close()
+
+    _next_action_count_cache.set(key, counts)
+    return jsonify({**counts, 'cached': False})
+
+@app.route('/api/activities/<int:activity_id>/done', methods=['POST'])
+def complete_next_action(activity_id):
+    """Mark an activity's next action as done - it leaves the queue and the badge count"""
+    conn = get_db()
+    cur = conn.cursor()
+    cur.execute(queries.NEXT_ACTION_DONE_QUERY, (activity_id,))
+    action = cur.fetchone()
+    conn.commit()
+    cur.close()
+
+    if not action:
+        return jsonify({'error': 'Open next action not found'}), 404
+
+    # Другие воркеры увидят новое значение по истечении TTL
+    _next_action_count_cache.pop((action['user_id'], date.today()))
+    audit_event('next_action_done', 'activity', activity_id, new_values=dict(action))
+    return jsonify({'action': action})
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,323 @@
+"""
+Capital Repair Management - REST API, ASGI variant
+The read endpoints of backend/api.py on FastAPI with an async psycopg 3
+connection pool. SQL comes from backend/queries.py, so both apps answer the
+same. Independent queries of one request (a page and its total, a company
+and its buildings) run concurrently on separate pooled connections.
+
+    uvicorn backend.asgi:app --host 127.0.0.1 --port 8000 --workers 4
+
+Not ported: /api/buildings/export (streams through a psycopg2 named cursor),
+/metrics and the ETag response cache - they stay in the Flask app.
+"""
+import asyncio
+import os
+import sys
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import Response
+from psycopg import AsyncClientCursor
+from psycopg.conninfo import make_conninfo
+from psycopg.rows import dict_row, tuple_row
+from psycopg_pool import AsyncConnectionPool, PoolTimeout
+
+# Add parent directory for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend import queries
+from backend.cache import LRUCache, get_data_version_async, on_data_version_change
+from backend.counts import COUNT_STRATEGIES, count_rows_async
+from backend.pagination import InvalidCursor, encode_cursor
+from backend.serialize import RESPONSE_SHAPES, dumps, shape_rows
+from scripts.config import (
+    DB_CONFIG, DB_POOL_MIN, DB_POOL_MAX, DB_POOL_TIMEOUT,
+    API_STATS_TTL, API_SUGGEST_CACHE_SIZE, API_COMPRESS_MIN_BYTES, LIFT_REPLACEMENT_COST
+)
+
+
+class JSONResponse(Response):
+    """
+    Response encoded by backend.serialize (orjson, Decimal as string, ISO dates).
+    Handlers return it explicitly: a plain dict would first go through FastAPI's
+    jsonable_encoder, which turns Decimal into float
+    """
+
+    media_type = 'application/json'
+
+    def render(self, content):
+        return dumps(content) + b'\n'  # Перевод строки в конце, как у jsonify() - тела совпадают побайтно
+
+
+def _conninfo():
+    # DB_CONFIG использует 'database' (psycopg2), libpq ждет 'dbname'
+    return make_conninfo(**{('dbname' if key == 'database' else key): value for key, value in DB_CONFIG.items()})
+
+
+# AsyncClientCursor подставляет параметры на клиенте, как psycopg2 -
+# SQL из queries.py (%s, %%, EXPLAIN с параметрами) работает без изменений
+pool = AsyncConnectionPool(
+    _conninfo(),
+    min_size=DB_POOL_MIN,
+    max_size=DB_POOL_MAX,
+    timeout=DB_POOL_TIMEOUT,
+    check=AsyncConnectionPool.check_connection,  # SELECT-проверка перед выдачей, как в backend/db.py
+    kwargs={'row_factory': dict_row, 'cursor_factory': AsyncClientCursor, 'autocommit': True},
+    open=False,
+)
+
+_stats_cache = LRUCache(maxsize=2, ttl=API_STATS_TTL)
+on_data_version_change(lambda version: _stats_cache.clear())
+
+_regions_cache = LRUCache(maxsize=2)
+on_data_version_change(lambda version: _regions_cache.clear())
+
+_suggest_cache = LRUCache(maxsize=API_SUGGEST_CACHE_SIZE)
+on_data_version_change(lambda version: _suggest_cache.clear())
+
+
+@asynccontextmanager
+async def lifespan(app):
+    await pool.open()
+    try:
+        yield
+    finally:
+        await pool.close()
+
+
+app = FastAPI(title='Capital Repair Management API', lifespan=lifespan, default_response_class=JSONResponse)
+app.add_middleware(GZipMiddleware, minimum_size=API_COMPRESS_MIN_BYTES)
+app.add_middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])
+
+
+@app.exception_handler(InvalidCursor)
+async def handle_invalid_cursor(request, e):
+    return JSONResponse({'error': str(e)}, status_code=400)
+
+
+@app.exception_handler(PoolTimeout)
+async def handle_pool_timeout(request, e):
+    return JSONResponse({'error': 'Database is busy, try again later'}, status_code=503)
+
+
+async def fetch_all(query, params=None, row_factory=dict_row):
+    """Run one query on its own pooled connection. Returns (rows, description)"""
+    async with pool.connection() as conn:
+        cur = conn.cursor(row_factory=row_factory)
+        await cur.execute(query, params)
+        return await cur.fetchall(), cur.description
+
+
+async def fetch_one(query, params=None):
+    rows, _ = await fetch_all(query, params)
+    return rows[0] if rows else None
+
+
+def _int_arg(args, name, default):
+    return int(args.get(name, default))
+
+
+@app.get('/api/health')
+async def get_health():
+    """Health check with connection pool metrics"""
+    return JSONResponse({'status': 'ok', 'pool': pool.get_stats()})
+
+
+@app.get('/api/regions')
+async def get_regions():
+    """Get regions (id, code, name, buildings count) from the regions table"""
+    async with pool.connection() as conn:
+        version = await get_data_version_async(conn)
+        regions = _regions_cache.get(version)
+        if regions is None:
+            cur = await conn.execute(queries.REGIONS_QUERY)
+            regions = queries.shape_regions(await cur.fetchall())
+            _regions_cache.set(version, regions)
+    return JSONResponse({'regions': regions})
+
+
+@app.get('/api/stats')
+async def get_stats():
+    """Get dashboard statistics (snapshot refreshed by importers)"""
+    async with pool.connection() as conn:
+        version = await get_data_version_async(conn)
+        stats = _stats_cache.get(version)
+        if stats is None:
+            cur = await conn.execute(queries.STATS_SNAPSHOT_QUERY)
+            stats = await cur.fetchone()
+            if stats is None:
+                cur = await conn.execute(queries.STATS_FALLBACK_QUERY)
+                stats = await cur.fetchone()
+            _stats_cache.set(version, stats)
+    return JSONResponse(stats)
+
+
+@app.get('/api/buildings')
+async def get_buildings(request: Request):
+    """Get buildings list with pagination and filters; page and total are fetched concurrently"""
+    args = request.query_params
+    page = _int_arg(args, 'page', 1)
+    per_page = _int_arg(args, 'per_page', 20)
+    offset = (page - 1) * per_page
+    cursor = args.get('cursor', '')
+    count_strategy = args.get('count', 'auto')
+    if count_strategy not in COUNT_STRATEGIES:
+        count_strategy = 'auto'
+    shape = args.get('shape', 'objects')
+    if shape not in RESPONSE_SHAPES:
+        shape = 'objects'
+    sort_by, _, _, sort_dir = queries.building_sort(args)
+
+    query, params, count_query, count_params, signature = queries.buildings_page(args, per_page, offset, cursor)
+
+    (rows, description), (total, count_strategy) = await asyncio.gather(
+        fetch_all(query, params, row_factory=tuple_row),
+        count_rows_async(pool, count_query, count_params, signature, count_strategy),
+    )
+    columns = [col.name for col in description][:-1]
+
+    next_cursor = None
+    if len(rows) == per_page:
+        last = rows[-1]
+        next_cursor = encode_cursor(sort_by, sort_dir, last[-1], last[0])
+    rows = [row[:-1] for row in rows]
+
+    return JSONResponse({
+        **shape_rows(columns, rows, shape, 'buildings'),
+        'total': total,
+        'count_strategy': count_strategy,
+        'page': page,
+        'per_page': per_page,
+        'pages': (total + per_page - 1) // per_page if total is not None else None,
+        'next_cursor': next_cursor
+    })
+
+
+@app.get('/api/buildings/facets')
+async def get_building_facets(request: Request):
+    """Counts per region, account type, replacement year and balance bucket for the current filters"""
+    query, params = queries.facets_query(request.query_params)
+    rows, _ = await fetch_all(query, params)
+    return JSONResponse({'facets': queries.shape_facets(rows)})
+
+
+@app.get('/api/search/suggest')
+async def get_search_suggest(request: Request):
+    """Typeahead: top-N buildings by mkd_code prefix/substring and address similarity"""
+    q = ' '.join(request.query_params.get('q', '').split())
+    try:
+        limit = min(max(_int_arg(request.query_params, 'limit', 10), 1), 20)
+    except ValueError:
+        limit = 10
+    if len(q) < 2:
+        return JSONResponse({'suggestions': []})
+
+    key = (q.lower(), limit)
+    suggestions = _suggest_cache.get(key)
+    if suggestions is not None:
+        return JSONResponse({'suggestions': suggestions, 'cached': True})
+
+    rows, _ = await fetch_all(queries.SUGGEST_QUERY, queries.suggest_params(q, limit))
+    suggestions = queries.merge_suggestions(rows, limit)
+
+    _suggest_cache.set(key, suggestions)
+    return JSONResponse({'suggestions': suggestions, 'cached': False})
+
+
+@app.get('/api/companies')
+async def get_companies(request: Request):
+    """Get management companies list; page and total are fetched concurrently"""
+    args = request.query_params
+    page = _int_arg(args, 'page', 1)
+    per_page = _int_arg(args, 'per_page', 20)
+    offset = (page - 1) * per_page
+
+    query, params, count_query, count_params, signature = queries.companies_page(
+        args.get('search', ''), per_page, offset, args.get('cursor', '')
+    )
+    (companies, _), (total, _) = await asyncio.gather(
+        fetch_all(query, params),
+        count_rows_async(pool, count_query, count_params, signature, 'exact'),
+    )
+
+    next_cursor = None
+    if len(companies) == per_page:
+        last = companies[-1]
+        next_cursor = encode_cursor('buildings_count', 'DESC', last['buildings_count'], last['id'])
+
+    return JSONResponse({
+        'companies': companies,
+        'total': total,
+        'page': page,
+        'pages': (total + per_page - 1) // per_page,
+        'next_cursor': next_cursor
+    })
+
+
+@app.get('/api/companies/top')
+async def get_top_companies(request: Request):
+    """Get top management companies by lifts and balance (mv_top_management_companies)"""
+    limit = min(_int_arg(request.query_params, 'limit', 50), 500)
+    companies, _ = await fetch_all(queries.top_companies_query(limit))
+    return JSONResponse({'companies': companies})
+
+
+@app.get('/api/companies/{company_id}')
+async def get_company(company_id: int):
+    """Get company details"""
+    company, (buildings, _) = await asyncio.gather(
+        fetch_one(queries.COMPANY_QUERY, (company_id,)),
+        fetch_all(queries.COMPANY_BUILDINGS_QUERY, (company_id,)),
+    )
+    if not company:
+        return JSONResponse({'error': 'Company not found'}, status_code=404)
+    return JSONResponse({'company': company, 'buildings': buildings})
+
+
+@app.get('/api/targets')
+async def get_targets(request: Request):
+    """Get target buildings for sales (mv_target_buildings)"""
+    args = request.query_params
+    page = _int_arg(args, 'page', 1)
+    per_page = _int_arg(args, 'per_page', 20)
+    offset = (page - 1) * per_page
+
+    where, params = queries.targets_where(args.get('priority', ''), args.get('region', ''))
+    (targets, _), total_row = await asyncio.gather(
+        fetch_all(queries.targets_page(where, per_page, offset), params),
+        fetch_one(f"SELECT COUNT(*) as count FROM mv_target_buildings {where}", params),
+    )
+    for t in targets:
+        del t['company_key'], t['deal_key']
+    total = total_row['count']
+
+    return JSONResponse({
+        'targets': targets,
+        'total': total,
+        'page': page,
+        'pages': (total + per_page - 1) // per_page
+    })
+
+
+@app.get('/api/forecast')
+async def get_forecast(request: Request):
+    """Lift replacement forecast sliced from lift_forecast_cube"""
+    try:
+        group_by, query, params = queries.forecast_query(request.query_params, LIFT_REPLACEMENT_COST)
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+
+    rows, _ = await fetch_all(query, params)
+    return JSONResponse({
+        'group_by': group_by,
+        'lift_replacement_cost': LIFT_REPLACEMENT_COST,
+        'rows': queries.label_balance_buckets(rows)
+    })
+
+
+@app.get('/api/regions/stats')
+async def get_regional_stats():
+    """Get per-region statistics (mv_regional_stats)"""
+    regions, _ = await fetch_all(queries.REGIONAL_STATS_QUERY)
+    return JSONResponse({'regions': regions})
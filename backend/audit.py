@@ -0,0 +1,150 @@
+"""
+Capital Repair Management - buffered audit log writer
+
+audit_event() only puts the entry on an in-process queue; a background
+thread inserts queued entries into audit_log in batches (execute_values)
+every AUDIT_FLUSH_INTERVAL seconds or as soon as AUDIT_BATCH_SIZE entries
+are waiting, on a connection borrowed from the pool. A user action never
+waits for the audit INSERT.
+
+Entries still queued when a worker exits are flushed by an atexit hook.
+If the queue is full (database down for a long time) new entries are
+dropped and counted in api_audit_events_total{outcome="dropped"}.
+"""
+import atexit
+import ipaddress
+import logging
+import os
+import queue
+import threading
+from datetime import datetime
+
+from flask import has_request_context, request
+from psycopg2.extras import Json, execute_values
+
+from backend import metrics
+from backend.serialize import dumps
+from scripts.config import AUDIT_FLUSH_INTERVAL, AUDIT_BATCH_SIZE, AUDIT_QUEUE_SIZE
+
+logger = logging.getLogger('backend.audit')
+
+INSERT_QUERY = """
+    INSERT INTO audit_log (
+        user_id, action, entity_type, entity_id, old_values, new_values, ip_address, user_agent, created_at
+    ) VALUES %s
+"""
+
+
+def _json(value):
+    # Decimal и даты - как в ответах API
+    return Json(value, dumps=lambda obj: dumps(obj).decode('utf-8')) if value is not None else None
+
+
+class AuditWriter:
+    """Queue + background flusher thread, started lazily in each worker process"""
+
+    def __init__(self, flush_interval, batch_size, queue_size):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def log(self, row):
+        """Queue one audit_log row (tuple in INSERT_QUERY column order); never blocks"""
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            metrics.AUDIT_EVENTS.inc(('dropped',))
+            logger.warning(f"Audit queue is full ({self._queue.maxsize}), entry dropped: {row[1]} {row[2]} {row[3]}")
+            return
+        if self._queue.qsize() >= self.batch_size:
+            self._wakeup.set()
+
+    def _ensure_thread(self):
+        # Поток создается в воркере: с gunicorn --preload модуль импортируется до fork
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Audit writer error: {e}")
+
+    def _drain(self):
+        rows = []
+        while len(rows) < self.batch_size:
+            try:
+                rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return rows
+
+    def flush(self):
+        """Insert everything queued so far, batch by batch"""
+        from backend.db import get_pool  # db.py импортирует metrics, как и этот модуль
+
+        pool = get_pool()
+        rows = self._drain()
+        while rows:
+            conn = None
+            try:
+                conn = pool.getconn()
+                with conn.cursor() as cur:
+                    execute_values(cur, INSERT_QUERY, rows, page_size=self.batch_size)
+                conn.commit()
+                metrics.AUDIT_EVENTS.inc(('written',), len(rows))
+            except Exception as e:
+                if conn is not None and not conn.closed:
+                    conn.rollback()
+                # Повторять не пытаемся: пакет с ошибочной строкой заблокировал бы очередь
+                metrics.AUDIT_EVENTS.inc(('failed',), len(rows))
+                logger.error(f"Audit flush of {len(rows)} entries failed: {e}")
+            finally:
+                if conn is not None:
+                    pool.putconn(conn)
+            rows = self._drain()
+
+    def pending(self):
+        return self._queue.qsize()
+
+
+writer = AuditWriter(AUDIT_FLUSH_INTERVAL, AUDIT_BATCH_SIZE, AUDIT_QUEUE_SIZE)
+atexit.register(lambda: writer.pending() and writer.flush())
+
+
+def _client_ip():
+    # nginx передает адрес клиента в X-Real-IP; мусор в заголовке не должен ронять INSERT в колонку INET
+    value = request.headers.get('X-Real-IP') or request.remote_addr
+    try:
+        return str(ipaddress.ip_address(value)) if value else None
+    except ValueError:
+        return None
+
+
+def audit_event(action, entity_type=None, entity_id=None, old_values=None, new_values=None, user_id=None):
+    """
+    Record a CRM action in audit_log asynchronously. IP and User-Agent are
+    taken from the current request, if there is one.
+    """
+    ip_address = user_agent = None
+    if has_request_context():
+        ip_address = _client_ip()
+        user_agent = request.user_agent.string or None
+
+    writer.log((
+        user_id, action, entity_type, entity_id, _json(old_values), _json(new_values),
+        ip_address, user_agent, datetime.now(),
+    ))
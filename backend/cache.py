@@ -0,0 +1,125 @@
+"""
+Capital Repair Management - in-process caches for the API
+Data only changes when an import runs, so cached values are keyed by the
+global data version (table data_version, bumped by the importers)
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from scripts.config import API_DATA_VERSION_CHECK_INTERVAL
+
+
+class LRUCache:
+    """Thread-safe LRU cache with a size cap and optional TTL (seconds)"""
+
+    def __init__(self, maxsize, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (value, expires_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and (item[1] is None or item[1] > time.monotonic()):
+                self._data.move_to_end(key)
+                self.hits += 1
+                return item[0]
+            if item is not None:
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+_data_version = {'value': None, 'updated_at': None, 'checked_at': 0.0}
+_data_version_lock = threading.Lock()
+_invalidation_hooks = []
+
+
+def on_data_version_change(callback):
+    """Register callback(new_version) called when an import bumps the data version"""
+    _invalidation_hooks.append(callback)
+    return callback
+
+
+DATA_VERSION_QUERY = "SELECT version, updated_at::timestamptz AS updated_at FROM data_version"
+
+
+def _cached_version(now):
+    """Version read less than API_DATA_VERSION_CHECK_INTERVAL ago, or None"""
+    with _data_version_lock:
+        if _data_version['value'] is not None and now - _data_version['checked_at'] < API_DATA_VERSION_CHECK_INTERVAL:
+            return _data_version['value']
+    return None
+
+
+def _store_version(row, now):
+    """Remember the data_version row and run the hooks if the version changed"""
+    version = row['version'] if row else 0
+
+    with _data_version_lock:
+        changed = _data_version['value'] is not None and _data_version['value'] != version
+        _data_version['value'] = version
+        _data_version['updated_at'] = row['updated_at'] if row else None
+        _data_version['checked_at'] = now
+
+    if changed:
+        for callback in _invalidation_hooks:
+            callback(version)
+    return version
+
+
+def get_data_version(conn):
+    """
+    Current data version. The DB is asked at most once per
+    API_DATA_VERSION_CHECK_INTERVAL seconds per process.
+    """
+    now = time.monotonic()
+    version = _cached_version(now)
+    if version is not None:
+        return version
+
+    with conn.cursor() as cur:
+        cur.execute(DATA_VERSION_QUERY)
+        row = cur.fetchone()
+    return _store_version(row, now)
+
+
+async def get_data_version_async(conn):
+    """get_data_version() for an async (psycopg 3) connection"""
+    now = time.monotonic()
+    version = _cached_version(now)
+    if version is not None:
+        return version
+
+    cur = await conn.execute(DATA_VERSION_QUERY)
+    row = await cur.fetchone()
+    return _store_version(row, now)
+
+
+def get_data_updated_at(conn):
+    """When the current data version was produced (for Last-Modified)"""
+    get_data_version(conn)
+    return _data_version['updated_at']
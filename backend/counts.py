@@ -0,0 +1,78 @@
+"""
+Capital Repair Management - total counts for filtered lists
+
+Strategies (?count=...):
+    exact    - COUNT(*), cached per filter signature until the next import
+    estimate - planner row estimate from EXPLAIN, no table scan
+    none     - no total at all (infinite scroll)
+    auto     - estimate for broad filters, exact (cached) for narrow ones
+"""
+from backend.cache import LRUCache, get_data_version, get_data_version_async, on_data_version_change
+from backend.prepared import execute_prepared
+from scripts.config import API_COUNT_CACHE_SIZE, API_COUNT_ESTIMATE_THRESHOLD
+
+COUNT_STRATEGIES = ('auto', 'exact', 'estimate', 'none')
+
+_exact_counts = LRUCache(API_COUNT_CACHE_SIZE)
+on_data_version_change(lambda version: _exact_counts.clear())
+
+
+def estimate_rows(cur, from_where, params):
+    """Planner estimate of the number of rows matched by `from_where`"""
+    # Не через PREPARE: оценка generic-плана не учитывает значения параметров
+    cur.execute("EXPLAIN (FORMAT JSON) SELECT 1 " + from_where, params)
+    plan = list(cur.fetchone().values())[0]
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def exact_rows(cur, from_where, params, signature):
+    """COUNT(*) of `from_where`, cached per (filter signature, data version)"""
+    key = (signature, get_data_version(cur.connection))
+    total = _exact_counts.get(key)
+    if total is None:
+        execute_prepared(cur, "SELECT COUNT(*) as count " + from_where, params)
+        total = cur.fetchone()['count']
+        _exact_counts.set(key, total)
+    return total
+
+
+def count_rows(cur, from_where, params, signature, strategy='auto'):
+    """
+    Total for a filtered list. `from_where` is the "FROM ... WHERE ..." part
+    of the list query without ORDER BY/LIMIT.
+    Returns (total or None, strategy actually used).
+    """
+    if strategy == 'none':
+        return None, 'none'
+
+    if strategy in ('estimate', 'auto'):
+        estimate = estimate_rows(cur, from_where, params)
+        if strategy == 'estimate' or estimate >= API_COUNT_ESTIMATE_THRESHOLD:
+            return estimate, 'estimate'
+
+    return exact_rows(cur, from_where, params, signature), 'exact'
+
+
+async def count_rows_async(pool, from_where, params, signature, strategy='auto'):
+    """
+    count_rows() for the ASGI app: takes its own connection from the async
+    pool, so it can run concurrently with the page query
+    """
+    if strategy == 'none':
+        return None, 'none'
+
+    async with pool.connection() as conn:
+        if strategy in ('estimate', 'auto'):
+            cur = await conn.execute("EXPLAIN (FORMAT JSON) SELECT 1 " + from_where, params)
+            plan = list((await cur.fetchone()).values())[0]
+            estimate = int(plan[0]['Plan']['Plan Rows'])
+            if strategy == 'estimate' or estimate >= API_COUNT_ESTIMATE_THRESHOLD:
+                return estimate, 'estimate'
+
+        key = (signature, await get_data_version_async(conn))
+        total = _exact_counts.get(key)
+        if total is None:
+            cur = await conn.execute("SELECT COUNT(*) as count " + from_where, params)
+            total = (await cur.fetchone())['count']
+            _exact_counts.set(key, total)
+        return total, 'exact'
@@ -0,0 +1,189 @@
+"""
+Capital Repair Management - database connection pool
+Pooled psycopg2 connections for the Flask API (one checkout per request)
+"""
+import threading
+import time
+
+import psycopg2
+from psycopg2 import pool as pg_pool
+from psycopg2.extensions import cursor as TupleCursor
+from psycopg2.extras import RealDictCursor
+from flask import g, jsonify
+
+from backend.metrics import InstrumentedCursor, InstrumentedTupleCursor
+from backend.prepared import PreparingConnection
+from scripts.config import (
+    DB_CONFIG, DB_POOL_MIN, DB_POOL_MAX, DB_POOL_TIMEOUT, DB_POOL_HEALTHCHECK_IDLE,
+    API_METRICS_ENABLED, API_PREPARED_STATEMENTS
+)
+
+
+class PoolTimeout(Exception):
+    """No free connection became available within DB_POOL_TIMEOUT"""
+
+
+class ConnectionPool:
+    """
+    Thread-safe connection pool on top of psycopg2 ThreadedConnectionPool.
+
+    Unlike ThreadedConnectionPool it waits for a free connection instead of
+    raising PoolError, checks connections that were idle for a while with
+    SELECT 1 before handing them out, and keeps checkout metrics.
+    """
+
+    def __init__(self, minconn, maxconn, timeout, healthcheck_idle, **conn_kwargs):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.healthcheck_idle = healthcheck_idle
+
+        self._pool = pg_pool.ThreadedConnectionPool(minconn, maxconn, **conn_kwargs)
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._last_used = {}  # id(conn) -> time.monotonic() of last return
+
+        # Метрики
+        self._in_use = 0
+        self._checkouts = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._discarded = 0
+        self._checkout_seconds_total = 0.0
+        self._checkout_seconds_max = 0.0
+
+    def getconn(self):
+        """Check out a healthy connection, waiting up to `timeout` seconds"""
+        started = time.monotonic()
+
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._waits += 1
+            if not self._slots.acquire(timeout=self.timeout):
+                with self._lock:
+                    self._timeouts += 1
+                raise PoolTimeout(f"No free DB connection after {self.timeout}s (max {self.maxconn})")
+
+        try:
+            conn = self._checkout_healthy()
+        except Exception:
+            self._slots.release()
+            raise
+
+        elapsed = time.monotonic() - started
+        with self._lock:
+            self._in_use += 1
+            self._checkouts += 1
+            self._checkout_seconds_total += elapsed
+            self._checkout_seconds_max = max(self._checkout_seconds_max, elapsed)
+
+        return conn
+
+    def putconn(self, conn):
+        """Return a connection; open transactions are rolled back by psycopg2"""
+        try:
+            self._pool.putconn(conn, close=bool(conn.closed))
+        finally:
+            with self._lock:
+                if conn.closed:
+                    self._last_used.pop(id(conn), None)
+                else:
+                    self._last_used[id(conn)] = time.monotonic()
+                self._in_use -= 1
+            self._slots.release()
+
+    def _checkout_healthy(self):
+        # Все соединения в пуле могут оказаться мертвыми (например, после рестарта Postgres)
+        for _ in range(self.maxconn + 1):
+            conn = self._pool.getconn()
+
+            with self._lock:
+                last_used = self._last_used.get(id(conn))
+            idle = time.monotonic() - last_used if last_used is not None else 0.0
+
+            if not conn.closed and (idle < self.healthcheck_idle or self._is_alive(conn)):
+                return conn
+
+            with self._lock:
+                self._last_used.pop(id(conn), None)
+                self._discarded += 1
+            self._pool.putconn(conn, close=True)
+
+        raise psycopg2.OperationalError("Could not obtain a live DB connection from pool")
+
+    @staticmethod
+    def _is_alive(conn):
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def stats(self):
+        """Pool metrics snapshot"""
+        with self._lock:
+            checkouts = self._checkouts
+            return {
+                'min_size': self.minconn,
+                'max_size': self.maxconn,
+                'in_use': self._in_use,
+                'idle': len(self._pool._pool),
+                'checkouts': checkouts,
+                'waits': self._waits,
+                'timeouts': self._timeouts,
+                'discarded': self._discarded,
+                'checkout_ms_avg': round(self._checkout_seconds_total * 1000 / checkouts, 3) if checkouts else 0.0,
+                'checkout_ms_max': round(self._checkout_seconds_max * 1000, 3),
+            }
+
+    def closeall(self):
+        self._pool.closeall()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Process-wide pool, created lazily so every gunicorn worker gets its own"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    DB_POOL_MIN, DB_POOL_MAX, DB_POOL_TIMEOUT, DB_POOL_HEALTHCHECK_IDLE,
+                    cursor_factory=InstrumentedCursor if API_METRICS_ENABLED else RealDictCursor,
+                    connection_factory=PreparingConnection if API_PREPARED_STATEMENTS else None,
+                    **DB_CONFIG
+                )
+    return _pool
+
+
+def get_db():
+    """Get pooled database connection for the current request"""
+    if 'db_conn' not in g:
+        g.db_conn = get_pool().getconn()
+    return g.db_conn
+
+
+def tuple_cursor(conn):
+    """Cursor returning plain tuples - cheaper than RealDictCursor for large pages"""
+    return conn.cursor(cursor_factory=InstrumentedTupleCursor if API_METRICS_ENABLED else TupleCursor)
+
+
+def release_db(exc=None):
+    """Return the request's connection to the pool (teardown hook)"""
+    conn = g.pop('db_conn', None)
+    if conn is not None:
+        get_pool().putconn(conn)
+
+
+def init_app(app):
+    """Register per-request connection return and pool error handling"""
+    app.teardown_appcontext(release_db)
+
+    @app.errorhandler(PoolTimeout)
+    def handle_pool_timeout(e):
+        return jsonify({'error': 'Database is busy, try again later'}), 503
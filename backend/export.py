@@ -0,0 +1,139 @@
+"""
+Capital Repair Management - streaming exports
+Rows are read through a server-side (named) cursor in chunks of
+EXPORT_CHUNK_ROWS and written out as they arrive, so memory use does not
+depend on the size of the result
+"""
+import csv
+import io
+import json
+import tempfile
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask import Response, stream_with_context
+from psycopg2.extensions import cursor as TupleCursor
+
+EXPORT_CHUNK_ROWS = 5000
+EXPORT_FORMATS = ('csv', 'ndjson', 'xlsx')
+
+# (заголовок, SQL выражение) - колонки выгрузки домов
+EXPORT_COLUMNS = [
+    ('id', 'b.id'),
+    ('region', 'b.region'),
+    ('address', 'b.address'),
+    ('mkd_code', 'b.mkd_code'),
+    ('total_sq', 'b.total_sq'),
+    ('overhaul_funds_balance', 'b.overhaul_funds_balance'),
+    ('spec_account_owner_type', 'b.spec_account_owner_type'),
+    ('lifts_count', 'COALESCE(ls.lifts_count, 0)'),
+    ('nearest_replacement', 'ls.nearest_replacement'),
+    ('replacement_years', "array_to_string(ls.replacement_years, ',')"),
+    ('lead_score', 'sc.score'),
+    ('company_name', 'mc.name'),
+    ('company_inn', 'mc.inn'),
+    ('company_ogrn', 'mc.ogrn'),
+    ('director_name', 'mc.director_name'),
+    ('phone', 'mc.phone'),
+    ('email', 'mc.email'),
+]
+EXPORT_SELECT = ', '.join(f'{expr} as {name}' for name, expr in EXPORT_COLUMNS)
+
+MIMETYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def _iter_chunks(conn, query, params):
+    """Yield (columns, rows) chunks from a server-side cursor"""
+    cur = conn.cursor(name=f'export_{uuid.uuid4().hex}', cursor_factory=TupleCursor)
+    cur.itersize = EXPORT_CHUNK_ROWS
+    try:
+        cur.execute(query, params)
+        while True:
+            rows = cur.fetchmany(EXPORT_CHUNK_ROWS)
+            if not rows:
+                break
+            yield [col.name for col in cur.description], rows
+    finally:
+        cur.close()
+        conn.rollback()  # Закрываем транзакцию именованного курсора
+
+
+def _write_csv(chunks):
+    # BOM и ';' - чтобы Excel сразу открывал кириллицу по колонкам
+    yield '\ufeff'.encode('utf-8')
+    header_written = False
+    for columns, rows in chunks:
+        buf = io.StringIO()
+        writer = csv.writer(buf, delimiter=';')
+        if not header_written:
+            writer.writerow(columns)
+            header_written = True
+        writer.writerows(rows)
+        yield buf.getvalue().encode('utf-8')
+
+
+def _write_ndjson(chunks):
+    for columns, rows in chunks:
+        yield ''.join(
+            json.dumps(dict(zip(columns, row)), default=_json_default, ensure_ascii=False) + '\n'
+            for row in rows
+        ).encode('utf-8')
+
+
+def _write_xlsx(chunks):
+    # XLSX - zip-архив, его нельзя отдавать по частям до конца записи.
+    # write_only книга держит строки во временных файлах, в памяти только текущий чанк
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('buildings')
+    header_written = False
+    for columns, rows in chunks:
+        if not header_written:
+            ws.append(columns)
+            header_written = True
+        for row in rows:
+            ws.append(list(row))
+
+    with tempfile.TemporaryFile() as tmp:
+        wb.save(tmp)
+        tmp.seek(0)
+        while True:
+            data = tmp.read(1024 * 1024)
+            if not data:
+                break
+            yield data
+
+
+WRITERS = {
+    'csv': _write_csv,
+    'ndjson': _write_ndjson,
+    'xlsx': _write_xlsx,
+}
+
+
+def stream_export(conn, query, params, export_format, basename):
+    """Streaming Flask response with the query result in `export_format`"""
+    body = WRITERS[export_format](_iter_chunks(conn, query, params))
+    filename = f'{basename}_{date.today():%Y%m%d}.{export_format}'
+    return Response(
+        stream_with_context(body),
+        content_type=MIMETYPES[export_format],
+        headers={
+            'Content-Disposition': f'attachment; filename="{filename}"',
+            'X-Accel-Buffering': 'no',  # nginx: не буферизовать поток целиком
+        },
+    )
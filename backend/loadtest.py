@@ -0,0 +1,133 @@
+"""
+Capital Repair Management - load test of the API backends
+
+Replays the same request mix against each base URL at a fixed concurrency
+and prints throughput and latency percentiles side by side:
+
+    gunicorn --bind 127.0.0.1:5000 --workers 4 backend.api:app
+    uvicorn backend.asgi:app --host 127.0.0.1 --port 8000 --workers 4
+    python backend/loadtest.py http://127.0.0.1:5000 http://127.0.0.1:8000 --concurrency 32 --duration 30
+
+The Flask app caches whole responses by data version and the ASGI app does
+not - use --no-cache to compare the query paths themselves.
+Only the standard library is used, so it runs from any machine with Python.
+"""
+import argparse
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+
+# (вес, путь) - примерно как ходит фронтенд
+REQUEST_MIX = [
+    (30, '/api/buildings?page=1&per_page=20&account_type=SPEC&has_lifts=true'),
+    (10, '/api/buildings?page=3&per_page=20&account_type=SPEC&has_lifts=true&sort_by=date&sort_order=asc'),
+    (10, '/api/buildings?page=1&per_page=100&account_type=&has_lifts=false&min_balance=1000'),
+    (10, '/api/buildings?page=1&per_page=20&replacement_year=2025,2026&has_lifts=true'),
+    (10, '/api/buildings/facets?account_type=SPEC&has_lifts=true'),
+    (10, '/api/companies?page=1&per_page=20'),
+    (5, '/api/stats'),
+    (5, '/api/targets?page=1&per_page=20&priority=HIGH'),
+    (5, '/api/forecast?group_by=year'),
+    (5, '/api/regions/stats'),
+]
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+    return values[k]
+
+
+def replay(base_url, plan, concurrency, duration, bust_cache=False, timeout=30):
+    """
+    Replay plan [(label, path)] in a loop from `concurrency` threads for `duration` seconds.
+    Returns (latencies in seconds by label, error messages by label, elapsed seconds)
+    """
+    position = {'next': 0}
+    lock = threading.Lock()
+    latencies = {label: [] for label, _ in plan}
+    errors = {label: [] for label, _ in plan}
+    deadline = time.monotonic() + duration
+
+    def worker():
+        while time.monotonic() < deadline:
+            with lock:
+                label, path = plan[position['next'] % len(plan)]
+                position['next'] += 1
+            url = base_url.rstrip('/') + path
+            if bust_cache:
+                url += f"&_={time.monotonic_ns()}" if '?' in url else f"?_={time.monotonic_ns()}"
+            request = urllib.request.Request(url, headers={'Accept-Encoding': 'gzip'})
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request, timeout=timeout) as response:
+                    response.read()
+                elapsed = time.perf_counter() - started
+                with lock:
+                    latencies[label].append(elapsed)
+            except (urllib.error.URLError, OSError) as e:
+                with lock:
+                    errors[label].append(str(e))
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    started = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, errors, time.monotonic() - started
+
+
+def run(base_url, concurrency, duration, no_cache, seed):
+    """Hammer one backend; returns dict with throughput, latency percentiles and error count"""
+    rng = random.Random(seed)
+    weights = [w for w, _ in REQUEST_MIX]
+    paths = [p for _, p in REQUEST_MIX]
+    # Одна и та же последовательность запросов для каждого бэкенда
+    plan = [(path, path) for path in rng.choices(paths, weights=weights, k=200000)]
+    by_path, errors_by_path, elapsed = replay(base_url, plan, concurrency, duration, bust_cache=no_cache)
+
+    latencies = [v for values in by_path.values() for v in values]
+    errors = [e for messages in errors_by_path.values() for e in messages]
+    return {
+        'url': base_url,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'rps': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'sample_error': errors[0] if errors else '',
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test of the API backends (WSGI vs ASGI)')
+    parser.add_argument('urls', nargs='+', help='Base URLs, e.g. http://127.0.0.1:5000 http://127.0.0.1:8000')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=30, help='Seconds per backend')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Add a unique query arg so response caches are bypassed')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    results = []
+    for url in args.urls:
+        print(f"{url}: {args.concurrency} clients, {args.duration:.0f} s...")
+        results.append(run(url, args.concurrency, args.duration, args.no_cache, args.seed))
+
+    print()
+    print(f"{'backend':<32} {'requests':>9} {'errors':>7} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for r in results:
+        print(f"{r['url']:<32} {r['requests']:>9} {r['errors']:>7} {r['rps']:>8.1f} "
+              f"{r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f}")
+        if r['sample_error']:
+            print(f"    first error: {r['sample_error']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,250 @@
+"""
+Capital Repair Management - request and query metrics for the API
+
+Per endpoint: latency, DB time, JSON serialization time and rows returned,
+exposed on /metrics in Prometheus text format. Queries slower than
+API_SLOW_QUERY_MS are sampled (API_SLOW_QUERY_SAMPLE_RATE) and logged with
+their EXPLAIN (ANALYZE, BUFFERS) plan. With API_METRICS_ENABLED=false
+nothing is registered and the plain RealDictCursor is used.
+
+Metrics live in the worker process: every gunicorn worker reports its own
+series, labelled with its pid. /metrics is not proxied by nginx (only /api
+is) - scrape it on 127.0.0.1:5000.
+"""
+import logging
+import os
+import random
+import threading
+import time
+
+from flask import Response, g, has_request_context, request
+from psycopg2.extensions import cursor as TupleCursor
+from psycopg2.extras import RealDictCursor
+
+from backend.serialize import FastJSONProvider
+
+from scripts.config import API_METRICS_ENABLED, API_SLOW_QUERY_MS, API_SLOW_QUERY_SAMPLE_RATE
+
+logger = logging.getLogger('backend.slow_query')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROWS_BUCKETS = (0, 1, 10, 50, 100, 500, 1000, 5000, 10000)
+
+
+def _worker():
+    # pid при каждом вызове: с gunicorn --preload модуль импортируется до fork
+    return str(os.getpid())
+
+
+def _format_labels(names, values):
+    pairs = ','.join(
+        '{}="{}"'.format(n, str(v).replace('\\', '\\\\').replace('"', '\\"'))
+        for n, v in zip(names, values)
+    )
+    return '{' + pairs + '}' if pairs else ''
+
+
+class Counter:
+    """Monotonic counter with labels"""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = ('worker',) + tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        key = (_worker(),) + tuple(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(self.labelnames, key)} {value}')
+        return lines
+
+
+class Histogram:
+    """Cumulative histogram with labels (Prometheus semantics)"""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = ('worker',) + tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [counts per bucket, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        key = (_worker(),) + tuple(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        bucket_labels = self.labelnames + ('le',)
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, n in zip(self.buckets, counts):
+                    cumulative += n
+                    lines.append(f'{self.name}_bucket{_format_labels(bucket_labels, key + (bound,))} {cumulative}')
+                lines.append(f'{self.name}_bucket{_format_labels(bucket_labels, key + ("+Inf",))} {count}')
+                lines.append(f'{self.name}_sum{_format_labels(self.labelnames, key)} {total}')
+                lines.append(f'{self.name}_count{_format_labels(self.labelnames, key)} {count}')
+        return lines
+
+
+REQUESTS = Counter('api_requests_total', 'HTTP requests', ('endpoint', 'method', 'status'))
+REQUEST_SECONDS = Histogram('api_request_duration_seconds', 'Request latency', ('endpoint', 'method'))
+DB_SECONDS = Histogram('api_request_db_seconds', 'Time spent in SQL per request', ('endpoint',))
+SERIALIZE_SECONDS = Histogram('api_request_serialize_seconds', 'Time spent encoding JSON per request', ('endpoint',))
+ROWS = Histogram('api_request_rows', 'Rows returned by SQL per request', ('endpoint',), buckets=ROWS_BUCKETS)
+QUERIES = Counter('api_db_queries_total', 'SQL statements executed', ('endpoint',))
+SLOW_QUERIES = Counter('api_slow_queries_total', f'SQL statements slower than {API_SLOW_QUERY_MS} ms', ('endpoint',))
+AUDIT_EVENTS = Counter('api_audit_events_total', 'Audit log entries by outcome (written, failed, dropped)', ('outcome',))
+
+REGISTRY = [REQUESTS, REQUEST_SECONDS, DB_SECONDS, SERIALIZE_SECONDS, ROWS, QUERIES, SLOW_QUERIES, AUDIT_EVENTS]
+
+
+def _endpoint():
+    """Route template (/api/companies/<int:company_id>), not the raw path - keeps label cardinality low"""
+    rule = request.url_rule
+    return rule.rule if rule is not None else 'unmatched'
+
+
+class _InstrumentedMixin:
+    """Adds the cursor's execute() time and row count to the current request"""
+
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        succeeded = False
+        try:
+            result = super().execute(query, vars)
+            succeeded = True
+            return result
+        finally:
+            elapsed = time.perf_counter() - started
+            if has_request_context():
+                g.metrics_db_seconds = g.get('metrics_db_seconds', 0.0) + elapsed
+                g.metrics_queries = g.get('metrics_queries', 0) + 1
+                if self.rowcount > 0:
+                    g.metrics_rows = g.get('metrics_rows', 0) + self.rowcount
+                if elapsed * 1000 >= API_SLOW_QUERY_MS:
+                    self._slow_query(query, vars, elapsed, explain=succeeded)
+
+    def _slow_query(self, query, vars, elapsed, explain=True):
+        endpoint = _endpoint()
+        SLOW_QUERIES.inc((endpoint,))
+        # Выборка: EXPLAIN ANALYZE выполняет запрос повторно. После ошибки повторять нечего
+        if not explain or API_SLOW_QUERY_SAMPLE_RATE <= 0 or random.random() >= API_SLOW_QUERY_SAMPLE_RATE:
+            return
+
+        sql = self.mogrify(query, vars).decode('utf-8', 'replace')
+        # EXECUTE - подготовленный запрос из backend/prepared.py (только SELECT), EXPLAIN EXECUTE показывает его план.
+        # WITH не берем: CTE может содержать INSERT/UPDATE/DELETE, и ANALYZE выполнил бы их второй раз
+        if not sql.lstrip().upper().startswith(('SELECT', '(', 'EXECUTE')):
+            return  # Изменяющие запросы не повторяем
+        try:
+            plan = self._explain(sql)
+        except Exception as e:
+            logger.warning(f"{endpoint}: slow query {elapsed * 1000:.0f} ms, EXPLAIN failed: {e}")
+            return
+        logger.warning(f"{endpoint}: slow query {elapsed * 1000:.0f} ms\n{sql}\n{plan}")
+
+    def _explain(self, sql):
+        """EXPLAIN ANALYZE inside a savepoint: an error must not abort the request's transaction"""
+        conn = self.connection
+        savepoint = not conn.autocommit
+        with conn.cursor() as explain_cur:
+            if savepoint:
+                RealDictCursor.execute(explain_cur, 'SAVEPOINT slow_query_explain')
+            try:
+                RealDictCursor.execute(explain_cur, 'EXPLAIN (ANALYZE, BUFFERS) ' + sql)
+                plan = '\n'.join(row['QUERY PLAN'] for row in explain_cur.fetchall())
+            except Exception:
+                if savepoint:
+                    RealDictCursor.execute(explain_cur, 'ROLLBACK TO SAVEPOINT slow_query_explain')
+                    RealDictCursor.execute(explain_cur, 'RELEASE SAVEPOINT slow_query_explain')
+                raise
+            if savepoint:
+                RealDictCursor.execute(explain_cur, 'RELEASE SAVEPOINT slow_query_explain')
+        return plan
+
+
+class InstrumentedCursor(_InstrumentedMixin, RealDictCursor):
+    """RealDictCursor with request metrics (default cursor of the pool)"""
+
+
+class InstrumentedTupleCursor(_InstrumentedMixin, TupleCursor):
+    """Plain tuple cursor with request metrics"""
+
+
+class TimedJSONProvider(FastJSONProvider):
+    """Flask JSON provider that adds jsonify() encoding time to the current request"""
+
+    def dumps(self, obj, **kwargs):
+        started = time.perf_counter()
+        try:
+            # indent/separators от jsonify() передаются как есть - FastJSONProvider переводит их в опции orjson
+            return super().dumps(obj, **kwargs)
+        finally:
+            if has_request_context():
+                g.metrics_serialize_seconds = g.get('metrics_serialize_seconds', 0.0) + time.perf_counter() - started
+
+
+def render_metrics():
+    """All metrics in Prometheus text exposition format"""
+    from backend.db import get_pool  # db.py импортирует этот модуль
+
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+
+    worker = _format_labels(('worker',), (_worker(),))
+    for key, value in get_pool().stats().items():
+        lines.append(f'# TYPE api_db_pool_{key} gauge')
+        lines.append(f'api_db_pool_{key}{worker} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def init_app(app):
+    """Register request timing hooks, the JSON provider and the /metrics endpoint"""
+    if not API_METRICS_ENABLED:
+        return
+
+    app.json_provider_class = TimedJSONProvider
+    app.json = TimedJSONProvider(app)
+
+    @app.before_request
+    def start_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        started = g.get('metrics_started')
+        if started is None:
+            return response
+        endpoint = _endpoint()
+        REQUESTS.inc((endpoint, request.method, response.status_code))
+        REQUEST_SECONDS.observe((endpoint, request.method), time.perf_counter() - started)
+        DB_SECONDS.observe((endpoint,), g.get('metrics_db_seconds', 0.0))
+        SERIALIZE_SECONDS.observe((endpoint,), g.get('metrics_serialize_seconds', 0.0))
+        ROWS.observe((endpoint,), g.get('metrics_rows', 0))
+        QUERIES.inc((endpoint,), g.get('metrics_queries', 0))
+        return response
+
+    @app.route('/metrics', methods=['GET'])
+    def get_metrics():
+        return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,71 @@
+"""
+Capital Repair Management - keyset (cursor) pagination
+Opaque cursors encode the last row's sort key and id, so the next page is a
+range scan "after (key, id)" instead of LIMIT/OFFSET over everything before it
+"""
+import base64
+import binascii
+import json
+from datetime import date
+from decimal import Decimal
+
+
+class InvalidCursor(ValueError):
+    """Cursor is malformed or was issued for a different sort"""
+
+
+def encode_cursor(sort_by, sort_dir, sort_key, row_id):
+    """Build an opaque cursor pointing just after the given row"""
+    if isinstance(sort_key, Decimal):
+        sort_key = str(sort_key)
+    elif isinstance(sort_key, date):
+        sort_key = sort_key.isoformat()
+
+    payload = json.dumps({'s': sort_by, 'o': sort_dir, 'k': sort_key, 'id': row_id},
+                         separators=(',', ':'), ensure_ascii=False)
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, sort_by, sort_dir):
+    """Return (sort_key, row_id) from a cursor issued for the same sort"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(raw.decode('utf-8'))
+        sort_key, row_id = payload['k'], int(payload['id'])
+        issued_for = (payload['s'], payload['o'])
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise InvalidCursor('Malformed cursor')
+
+    if issued_for != (sort_by, sort_dir):
+        raise InvalidCursor('Cursor does not match sort_by/sort_order')
+
+    return sort_key, row_id
+
+
+def keyset_condition(sort_expr, id_expr, sort_dir, sort_key, row_id, cast):
+    """
+    SQL predicate for rows strictly after (sort_key, row_id) in
+    ORDER BY sort_expr <sort_dir> NULLS LAST, id_expr <sort_dir> that share the
+    cursor's NULL-ness - a single row comparison, i.e. one btree range
+    """
+    op = '<' if sort_dir == 'DESC' else '>'
+
+    if sort_key is None:
+        # Уже дошли до хвоста с NULL ключом - дальше только по id
+        return f"({sort_expr} IS NULL AND {id_expr} {op} %s)", [row_id]
+
+    # Строки с NULL ключом сравнение отбрасывает - их отдает keyset_branches отдельной веткой
+    return f"({sort_expr}, {id_expr}) {op} (%s::{cast}, %s)", [sort_key, row_id]
+
+
+def keyset_branches(sort_expr, id_expr, sort_dir, sort_key, row_id, cast, nullable=True):
+    """
+    Rows after the cursor as [(predicate, params)], one index range each.
+    For a nullable sort column and a non-NULL cursor key the NULL tail is a
+    second branch: "(key, id) < (...) OR key IS NULL" is not a btree bound and
+    would read every index entry before the cursor. Combine with UNION ALL
+    """
+    branches = [keyset_condition(sort_expr, id_expr, sort_dir, sort_key, row_id, cast)]
+    if nullable and sort_key is not None:
+        branches.append((f"{sort_expr} IS NULL", []))
+    return branches
@@ -0,0 +1,64 @@
+"""
+Capital Repair Management - server-side prepared statements
+
+Queries from backend/queries.py are canonical per filter shape: the same set
+of filters and sort gives the same SQL text, values (including LIMIT/OFFSET)
+are parameters. execute_prepared() PREPAREs such a text once per pooled
+connection and then only EXECUTEs it, so Postgres skips parsing and, after a
+few executions, planning (plan_cache_mode = auto switches to a generic plan
+when it is not worse than the custom ones).
+"""
+import hashlib
+import itertools
+import re
+
+from psycopg2.extensions import connection as _connection
+
+from scripts.config import API_PREPARED_MAX
+
+
+class PreparingConnection(_connection):
+    """psycopg2 connection that remembers which statements it has PREPAREd"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+
+
+_PLACEHOLDER = re.compile(r'%%|%s')
+
+
+def to_numbered(query):
+    """psycopg2 placeholders to PREPARE syntax: 'a = %s AND b LIKE %s' -> 'a = $1 AND b LIKE $2'"""
+    counter = itertools.count(1)
+    return _PLACEHOLDER.sub(lambda m: '%' if m.group(0) == '%%' else f'${next(counter)}', query)
+
+
+def statement_name(query):
+    return 'api_' + hashlib.sha1(query.encode('utf-8')).hexdigest()[:16]
+
+
+def execute_prepared(cur, query, params=()):
+    """
+    cur.execute(query, params) through PREPARE/EXECUTE. `query` must use
+    positional %s placeholders. Connections that are not PreparingConnection
+    (scripts, API_PREPARED_STATEMENTS=false) run the query as is.
+    """
+    conn = cur.connection
+    prepared = getattr(conn, 'prepared', None)
+    if prepared is None:
+        return cur.execute(query, params)
+
+    name = statement_name(query)
+    if name not in prepared:
+        if len(prepared) >= API_PREPARED_MAX:
+            # Редкие формы фильтров не должны копить планы в памяти бэкенда Postgres
+            cur.execute("DEALLOCATE ALL")
+            prepared.clear()
+        # Типы параметров Postgres выводит из контекста ($1 в ILIKE - text, в LIMIT - bigint...)
+        cur.execute(f"PREPARE {name} AS {to_numbered(query)}")
+        prepared.add(name)
+
+    if params:
+        return cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+    return cur.execute(f"EXECUTE {name}")
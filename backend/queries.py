@@ -0,0 +1,774 @@
+"""
+Capital Repair Management - SQL of the API endpoints
+Filters, sorting and query text shared by the Flask app (backend/api.py) and
+the ASGI app (backend/asgi.py). Functions here only build SQL and shape rows,
+they never touch a connection.
+"""
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from backend.pagination import decode_cursor, keyset_branches, keyset_condition
+
+# sort_by -> (SQL выражение, тип для курсора)
+BUILDING_SORT_COLUMNS = {
+    'balance': ('b.overhaul_funds_balance', 'numeric'),
+    'address': ('b.address', 'text'),
+    'lifts': ('COALESCE(ls.lifts_count, 0)', 'integer'),  # Дома без лифтов - как 0 лифтов, не в конце
+    'date': ('ls.nearest_replacement', 'date'),
+    'score': ('sc.score', 'numeric'),  # building_scores, database/015_lead_scores.sql
+}
+
+# Сортировки, у которых ключ бывает NULL (такие дома идут в конце, NULLS LAST)
+NULLABLE_SORTS = {'balance', 'date'}
+
+# Разрезы куба прогноза: group_by -> (колонки SELECT, колонки GROUP BY)
+FORECAST_DIMENSIONS = {
+    'year': (['c.replacement_year'], ['c.replacement_year']),
+    'region': (['c.region_id', 'r.region_name'], ['c.region_id', 'r.region_name']),
+    'municipality': (['c.municipality_id', 'm.name as municipality'], ['c.municipality_id', 'm.name']),
+    'account_type': (['c.account_type'], ['c.account_type']),
+    'balance_bucket': (['c.balance_bucket'], ['c.balance_bucket']),
+}
+
+# Корзины баланса - см. balance_bucket() в database/008_lift_forecast_cube.sql
+BALANCE_BUCKETS = {
+    0: 'до 1.2 млн',
+    1: '1.2 - 2 млн',
+    2: '2 - 5 млн',
+    3: 'от 5 млн',
+}
+
+# Фасеты считаются без собственного фильтра: выбранный регион не скрывает остальные регионы
+FACET_FILTERS = ('region', 'region_id', 'account_type', 'replacement_year')
+
+
+def parse_years(replacement_year):
+    """"2025,2026,2027" -> [2025, 2026, 2027]; ValueError on garbage"""
+    return [int(y.strip()) for y in replacement_year.split(',') if y.strip()]
+
+
+def escape_like(value):
+    """Escape LIKE wildcards in user input"""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def building_filters(args, exclude=()):
+    """
+    Shared filters of /api/buildings, /api/buildings/export and /api/buildings/facets.
+    Returns (lifts_join, where, params): where is a string of " AND ..." conditions.
+    Filters named in `exclude` are ignored.
+    """
+    def arg(name, default=''):
+        return default if name in exclude else args.get(name, default)
+
+    search = arg('search')
+    region = arg('region')
+    region_id = arg('region_id')  # regions.id - идет по idx_buildings_region, в отличие от текстового region
+    account_type = arg('account_type')  # 'SPEC' or 'REGOP'
+    min_balance = arg('min_balance')
+    replacement_year = arg('replacement_year')  # Конкретный год замены
+    has_lifts = args.get('has_lifts', 'true')  # Только с лифтами (по умолчанию true)
+
+    # Сводка по лифтам (building_lift_summary) содержит только дома с лифтами,
+    # поэтому фильтр "только с лифтами" - это просто INNER JOIN
+    lifts_join = 'JOIN' if has_lifts == 'true' else 'LEFT JOIN'
+
+    where = ''
+    params = []
+
+    if search:
+        where += " AND (b.address ILIKE %s OR b.mkd_code ILIKE %s)"
+        params.extend([f'%{search}%', f'%{search}%'])
+
+    if region:
+        where += " AND b.region = %s"
+        params.append(region)
+
+    if region_id:
+        try:
+            region_id = int(region_id)
+            where += " AND b.region_id = %s"
+            params.append(region_id)
+        except ValueError:
+            pass
+
+    # Filter by account type
+    if account_type == 'SPEC':
+        where += " AND b.spec_account_owner_type IN ('UK', 'TSJ', 'JSK')"
+    elif account_type == 'REGOP':
+        where += " AND (b.spec_account_owner_type = 'REGOP' OR b.spec_account_owner_type IS NULL)"
+
+    # Filter by minimum balance (значения уже в тысячах в БД!)
+    if min_balance:
+        try:
+            min_bal = float(min_balance)
+            where += " AND b.overhaul_funds_balance >= %s"
+            params.append(min_bal)
+        except ValueError:
+            pass
+
+    # Filter by replacement years (можно выбрать несколько годов через запятую)
+    if replacement_year:
+        try:
+            years = parse_years(replacement_year)
+            if years:
+                where += " AND ls.replacement_years && %s::smallint[]"
+                params.append(years)
+        except ValueError:
+            pass
+
+    return lifts_join, where, params
+
+
+def building_sort(args):
+    """Returns (sort_by, sort_column, sort_cast, sort_dir) for /api/buildings"""
+    sort_by = args.get('sort_by', 'balance')  # balance, address, lifts, date, score
+    sort_order = args.get('sort_order', 'desc')  # asc or desc
+    if sort_by not in BUILDING_SORT_COLUMNS:
+        sort_by = 'balance'
+    sort_column, sort_cast = BUILDING_SORT_COLUMNS[sort_by]
+    if sort_by == 'lifts' and args.get('has_lifts', 'true') == 'true':
+        # INNER JOIN сводки: lifts_count не NULL, голая колонка идет по idx_lift_summary_count
+        sort_column = 'ls.lifts_count'
+    sort_dir = 'DESC' if sort_order == 'desc' else 'ASC'
+    return sort_by, sort_column, sort_cast, sort_dir
+
+
+# УК дома для списка и выгрузки: у дома может быть несколько строк buildings_management,
+# берется одна (активная, с самым поздним договором) - строка списка = дом, ORDER BY ..., b.id полный
+COMPANY_LATERAL_JOIN = """
+        LEFT JOIN LATERAL (
+            SELECT company_id
+            FROM buildings_management
+            WHERE building_id = b.id
+            ORDER BY is_active DESC NULLS LAST, contract_start_date DESC NULLS LAST, id DESC
+            LIMIT 1
+        ) bm ON true
+        LEFT JOIN management_companies mc ON bm.company_id = mc.id"""
+
+
+def score_join(sort_by):
+    """
+    building_scores for the list. Sorted by score, the list is driven by
+    idx_building_scores_score, so the join is inner: every building gets a row
+    in refresh_building_scores() at the end of each import
+    """
+    join = 'JOIN' if sort_by == 'score' else 'LEFT JOIN'
+    return f"""
+        {join} building_scores sc ON sc.building_id = b.id"""
+
+
+def buildings_from_where(lifts_join, where, joins=''):
+    """FROM ... WHERE of the buildings list, shared by the page and its COUNT"""
+    return (
+        f"FROM buildings b {lifts_join} building_lift_summary ls ON ls.building_id = b.id{joins} WHERE 1=1" + where
+    )
+
+
+def buildings_page(args, per_page, offset, cursor):
+    """
+    One /api/buildings page; the last column (sort_key) is the value for next_cursor.
+    Returns (query, params, count_from_where, count_params, count_signature).
+
+    The SQL text depends only on the filter shape (which filters are set, sort,
+    cursor or offset) - values, LIMIT and OFFSET are parameters, so the text
+    can be PREPAREd once per connection (backend/prepared.py).
+    """
+    lifts_join, where, filter_params = building_filters(args)
+    sort_by, sort_column, sort_cast, sort_dir = building_sort(args)
+
+    query = f"""
+        SELECT b.id, b.address, b.mkd_code, b.total_sq, b.overhaul_funds_balance,
+               b.spec_account_owner_type, b.region, mc.name as company_name, mc.phone, mc.email, mc.director_name,
+               COALESCE(ls.lifts_count, 0) as lifts_count,
+               ls.nearest_replacement, sc.score as lead_score,
+               {sort_column} as sort_key
+    """ + buildings_from_where(lifts_join, where, score_join(sort_by) + COMPANY_LATERAL_JOIN)
+    # Ключ и id из одной таблицы: сравнение (score, building_id) - диапазон idx_building_scores_score
+    id_column = 'sc.building_id' if sort_by == 'score' else 'b.id'
+    order_by = f" ORDER BY {sort_column} {sort_dir} NULLS LAST, {id_column} {sort_dir} LIMIT %s"
+
+    if not cursor:
+        query += order_by + " OFFSET %s"
+        params = list(filter_params) + [per_page, offset]
+    else:
+        # Keyset: продолжаем строго после последней строки предыдущей страницы.
+        # Каждая ветка - один диапазон индекса; NULL-хвост (если есть) - своей веткой UNION ALL
+        last_key, last_id = decode_cursor(cursor, sort_by, sort_dir)
+        branches = keyset_branches(
+            sort_column, id_column, sort_dir, last_key, last_id, sort_cast, nullable=sort_by in NULLABLE_SORTS
+        )
+        parts, params = [], []
+        for condition, condition_params in branches:
+            parts.append(f"{query} AND {condition}{order_by}")
+            params.extend(list(filter_params) + condition_params + [per_page])
+        if len(parts) == 1:
+            query = parts[0]
+        else:
+            query = (
+                "SELECT * FROM (" + "\nUNION ALL\n".join(f"({part})" for part in parts) + ") page"
+                f" ORDER BY sort_key {sort_dir} NULLS LAST, id {sort_dir} LIMIT %s"
+            )
+            params.append(per_page)
+
+    # С сортировкой по баллу в список попадают только дома со строкой в building_scores - COUNT так же
+    count_from_where = buildings_from_where(lifts_join, where, score_join(sort_by) if sort_by == 'score' else '')
+
+    # Точный COUNT кэшируется до следующего импорта, ключ - текст запроса и параметры
+    signature = ('buildings', count_from_where, tuple(tuple(p) if isinstance(p, list) else p for p in filter_params))
+
+    return query, params, count_from_where, filter_params, signature
+
+
+def facet_conditions(args):
+    """Facet filters as conditions on the columns of the facets CTE: {facet: (sql, params)}"""
+    conditions = {}
+
+    region = args.get('region', '')
+    region_id = args.get('region_id', '')
+    if region_id.isdigit():
+        conditions['region'] = ("region_id = %s", [int(region_id)])
+    elif region:
+        conditions['region'] = ("region = %s", [region])
+
+    account_type = args.get('account_type', '')
+    if account_type == 'SPEC':
+        conditions['account_type'] = ("account_type IN ('UK', 'TSJ', 'JSK')", [])
+    elif account_type == 'REGOP':
+        conditions['account_type'] = ("account_type = 'REGOP'", [])
+
+    try:
+        years = parse_years(args.get('replacement_year', ''))
+        if years:
+            conditions['replacement_year'] = ("replacement_years && %s::smallint[]", [years])
+    except ValueError:
+        pass
+
+    return conditions
+
+
+FACET_BRANCHES = [
+    # По regions.id, как фильтр region_id: текстовый b.region может не совпадать с regions.region_name
+    ('region', "SELECT 'region' as facet, region_id::text as value, COUNT(*) as count FROM f WHERE region_id IS NOT NULL{} GROUP BY region_id"),
+    ('account_type', "SELECT 'account_type', account_type, COUNT(*) FROM f WHERE 1=1{} GROUP BY account_type"),
+    ('replacement_year', "SELECT 'replacement_year', y::text, COUNT(*) FROM f CROSS JOIN LATERAL unnest(f.replacement_years) y WHERE 1=1{} GROUP BY y"),
+    ('balance_bucket', "SELECT 'balance_bucket', balance_bucket::text, COUNT(*) FROM f WHERE 1=1{} GROUP BY balance_bucket"),
+]
+
+
+def facets_query(args):
+    """Counts of every facet in one query (rows: facet, value, count). Returns (query, params)"""
+    lifts_join, where, params = building_filters(args, exclude=FACET_FILTERS)
+    conditions = facet_conditions(args)
+
+    def other_conditions(facet):
+        sql, sql_params = '', []
+        for name, (condition, condition_params) in conditions.items():
+            if name != facet:
+                sql += f" AND {condition}"
+                sql_params.extend(condition_params)
+        return sql, sql_params
+
+    # Один проход по отфильтрованным домам (CTE), дальше группировки по каждому фасету
+    query = f"""
+        WITH f AS (
+            SELECT b.region, b.region_id,
+                   COALESCE(b.spec_account_owner_type, 'REGOP') as account_type,
+                   balance_bucket(b.overhaul_funds_balance) as balance_bucket,
+                   ls.replacement_years
+            FROM buildings b
+            {lifts_join} building_lift_summary ls ON ls.building_id = b.id
+            WHERE 1=1 {where}
+        )
+    """
+    parts = []
+    for facet, template in FACET_BRANCHES:
+        sql, sql_params = other_conditions(facet)
+        parts.append(template.format(sql))
+        params.extend(sql_params)
+    query += "\nUNION ALL\n".join(parts)
+
+    return query, params
+
+
+def shape_facets(rows):
+    """Rows of facets_query() -> {facet: [{value, count}, ...]}"""
+    facets = {facet: [] for facet, _ in FACET_BRANCHES}
+    for row in rows:
+        facets[row['facet']].append({'value': row['value'], 'count': row['count']})
+
+    facets['region'].sort(key=lambda f: int(f['value']))
+    facets['replacement_year'].sort(key=lambda f: int(f['value']))
+    facets['balance_bucket'].sort(key=lambda f: int(f['value']))
+    for f in facets['balance_bucket']:
+        f['label'] = BALANCE_BUCKETS.get(int(f['value']))
+    # Значение фильтра SPEC = УК + ТСЖ + ЖСК
+    spec_count = sum(f['count'] for f in facets['account_type'] if f['value'] in ('UK', 'TSJ', 'JSK'))
+    facets['account_type'].append({'value': 'SPEC', 'count': spec_count})
+    return facets
+
+
+# Две ветки, каждая идет по своему индексу (009_search_suggest.sql) и отдает не больше limit строк:
+#   код МКД - GIN триграммы, сначала совпадения по префиксу
+#   адрес - GiST триграммы по normalize_address(), ближайшие по word similarity
+SUGGEST_QUERY = """
+    (
+        SELECT b.id, b.address, b.mkd_code, b.region, 'mkd_code' as match,
+               CASE WHEN b.mkd_code ILIKE %(prefix)s THEN 1.0
+                    ELSE similarity(b.mkd_code, %(q)s) END as score
+        FROM buildings b
+        WHERE b.mkd_code ILIKE %(contains)s
+        ORDER BY score DESC, b.mkd_code
+        LIMIT %(limit)s
+    )
+    UNION ALL
+    (
+        SELECT b.id, b.address, b.mkd_code, b.region, 'address' as match,
+               1 - (nq.q <<-> normalize_address(b.address)) as score
+        FROM buildings b, (SELECT normalize_address(%(q)s) as q) nq
+        WHERE nq.q <%% normalize_address(b.address)
+        ORDER BY nq.q <<-> normalize_address(b.address)
+        LIMIT %(limit)s
+    )
+"""
+
+
+def suggest_params(q, limit):
+    return {
+        'q': q,
+        'prefix': escape_like(q) + '%',
+        'contains': '%' + escape_like(q) + '%',
+        'limit': limit,
+    }
+
+
+def merge_suggestions(rows, limit):
+    """Дом мог найтись обеими ветками SUGGEST_QUERY - оставляем лучший результат"""
+    best = {}
+    for row in rows:
+        if row['id'] not in best or row['score'] > best[row['id']]['score']:
+            best[row['id']] = row
+    suggestions = sorted(best.values(), key=lambda r: -r['score'])[:limit]
+    for s in suggestions:
+        s['score'] = round(float(s['score']), 3)
+    return suggestions
+
+
+def companies_page(search, per_page, offset, cursor):
+    """
+    One /api/companies page from company_summary (database/010_company_summary.sql).
+    Returns (query, params, count_from_where, count_params, count_signature)
+    """
+    where = ''
+    filter_params = []
+
+    if search:
+        where += " AND (mc.name ILIKE %s OR mc.ogrn ILIKE %s OR mc.phone ILIKE %s)"
+        filter_params.extend([f'%{search}%', f'%{search}%', f'%{search}%'])
+
+    from_where = "FROM company_summary cs JOIN management_companies mc ON mc.id = cs.company_id WHERE 1=1" + where
+    query = """
+        SELECT mc.id, mc.name, mc.ogrn, mc.phone, mc.email, mc.director_name,
+               cs.buildings_count, cs.lifts_count, cs.spec_account_balance
+    """ + from_where
+    params = list(filter_params)
+
+    # Keyset по (buildings_count, id), сортировка всегда по убыванию - идет по idx_company_summary_buildings
+    if cursor:
+        last_key, last_id = decode_cursor(cursor, 'buildings_count', 'DESC')
+        condition, condition_params = keyset_condition(
+            'cs.buildings_count', 'cs.company_id', 'DESC', last_key, last_id, 'integer'
+        )
+        query += f" AND {condition}"
+        params.extend(condition_params)
+
+    query += " ORDER BY cs.buildings_count DESC, cs.company_id DESC LIMIT %s"
+    params.append(per_page)
+    if not cursor:
+        query += " OFFSET %s"
+        params.append(offset)
+
+    # Total учитывает search; точный COUNT кэшируется до следующего импорта
+    signature = ('companies', from_where, tuple(filter_params))
+
+    return query, params, from_where, filter_params, signature
+
+
+COMPANY_QUERY = """
+    SELECT mc.*, COALESCE(cs.buildings_count, 0) as buildings_count,
+           COALESCE(cs.lifts_count, 0) as lifts_count, cs.spec_account_balance
+    FROM management_companies mc
+    LEFT JOIN company_summary cs ON cs.company_id = mc.id
+    WHERE mc.id = %s
+"""
+
+COMPANY_BUILDINGS_QUERY = """
+    SELECT b.id, b.address, b.mkd_code, b.total_sq
+    FROM buildings b
+    JOIN buildings_management bm ON b.id = bm.building_id
+    WHERE bm.company_id = %s
+    LIMIT 100
+"""
+
+
+def targets_where(priority, region):
+    """WHERE of /api/targets over mv_target_buildings. Returns (where, params)"""
+    where = "WHERE 1=1"
+    params = []
+
+    if priority:
+        where += " AND priority = %s"
+        params.append(priority)
+
+    if region:
+        where += " AND region_name = %s"
+        params.append(region)
+
+    return where, params
+
+
+def targets_page(where, per_page, offset):
+    return f"""
+        SELECT *
+        FROM mv_target_buildings
+        {where}
+        ORDER BY overhaul_funds_balance DESC, earliest_replacement_date ASC, building_id, company_key, deal_key
+        LIMIT {per_page} OFFSET {offset}
+    """
+
+
+def forecast_query(args, lift_replacement_cost):
+    """
+    Slice of lift_forecast_cube. Returns (group_by, query, params);
+    ValueError with a client-facing message on bad arguments
+    """
+    group_by = [d.strip() for d in args.get('group_by', 'year').split(',') if d.strip()]
+    unknown = [d for d in group_by if d not in FORECAST_DIMENSIONS]
+    if unknown:
+        raise ValueError(f'Unknown group_by: {", ".join(unknown)}')
+
+    year_from = args.get('year_from', '')
+    year_to = args.get('year_to', '')
+    region_id = args.get('region_id', '')
+    municipality_id = args.get('municipality_id', '')
+    account_type = args.get('account_type', '')  # 'SPEC', 'REGOP' или код UK/TSJ/JSK
+    min_balance_bucket = args.get('min_balance_bucket', '')  # 0..3
+
+    where = "WHERE 1=1"
+    params = []
+
+    try:
+        if year_from:
+            where += " AND c.replacement_year >= %s"
+            params.append(int(year_from))
+        if year_to:
+            where += " AND c.replacement_year <= %s"
+            params.append(int(year_to))
+        if region_id:
+            where += " AND c.region_id = %s"
+            params.append(int(region_id))
+        if municipality_id:
+            where += " AND c.municipality_id = %s"
+            params.append(int(municipality_id))
+        if min_balance_bucket:
+            where += " AND c.balance_bucket >= %s"
+            params.append(int(min_balance_bucket))
+    except ValueError:
+        raise ValueError('year_from, year_to, region_id, municipality_id and min_balance_bucket must be integers')
+
+    if account_type == 'SPEC':
+        where += " AND c.account_type IN ('UK', 'TSJ', 'JSK')"
+    elif account_type:
+        where += " AND c.account_type = %s"
+        params.append(account_type)
+
+    select_cols = [col for d in group_by for col in FORECAST_DIMENSIONS[d][0]]
+    group_cols = [col for d in group_by for col in FORECAST_DIMENSIONS[d][1]]
+
+    query = f"""
+        SELECT {''.join(col + ', ' for col in select_cols)}
+               SUM(c.lifts_count) as lifts_count,
+               SUM(c.buildings_count) as buildings_count,
+               SUM(c.balance_sum) as balance_sum,
+               SUM(c.lifts_count) * %s as estimated_deal_amount
+        FROM lift_forecast_cube c
+        LEFT JOIN regions r ON r.id = c.region_id
+        LEFT JOIN municipalities m ON m.id = c.municipality_id
+        {where}
+    """
+    if group_cols:
+        query += f" GROUP BY {', '.join(group_cols)} ORDER BY {', '.join(group_cols)}"
+
+    return group_by, query, [lift_replacement_cost] + params
+
+
+def label_balance_buckets(rows):
+    for row in rows:
+        if 'balance_bucket' in row:
+            row['balance_bucket_label'] = BALANCE_BUCKETS.get(row['balance_bucket'])
+    return rows
+
+
+def buildings_export_query(args, select):
+    """All rows of the /api/buildings filters in list order. Returns (query, params)"""
+    lifts_join, where, params = building_filters(args)
+    sort_by, sort_column, _, sort_dir = building_sort(args)
+
+    query = f"""
+        SELECT {select}
+        FROM buildings b
+        {lifts_join} building_lift_summary ls ON ls.building_id = b.id""" + score_join(sort_by) + COMPANY_LATERAL_JOIN + """
+        WHERE 1=1
+    """ + where + f" ORDER BY {sort_column} {sort_dir} NULLS LAST, b.id {sort_dir}"
+    return query, params
+
+
+# Справочник регионов; количество домов - из снимка mv_regional_stats (обновляется импортом)
+REGIONS_QUERY = """
+    SELECT r.id, r.region_code as code, r.region_name as name,
+           COALESCE(rs.total_buildings, 0) as buildings_count
+    FROM regions r
+    LEFT JOIN mv_regional_stats rs ON rs.region_code = r.region_code
+    WHERE r.is_active = true
+    ORDER BY r.region_name
+"""
+
+
+def shape_regions(rows):
+    """Rows of REGIONS_QUERY -> list for /api/regions; 'region' (name) - для старых клиентов"""
+    return [dict(row, region=row['name']) for row in rows]
+
+
+STATS_SNAPSHOT_QUERY = """
+    SELECT buildings, companies, with_phone, with_email, linked, refreshed_at
+    FROM stats_snapshot
+"""
+
+# Снимка еще нет (импорт не запускался после миграции) - считаем на лету
+STATS_FALLBACK_QUERY = "SELECT *, NULL as refreshed_at FROM v_dashboard_stats"
+
+REGIONAL_STATS_QUERY = "SELECT * FROM mv_regional_stats ORDER BY total_buildings DESC"
+
+
+def top_companies_query(limit):
+    return f"""
+        SELECT *
+        FROM mv_top_management_companies
+        ORDER BY lifts_count DESC, total_balance_in_buildings DESC
+        LIMIT {limit}
+    """
+
+
+# ============================================
+# CRM: сделки и воронка
+# ============================================
+
+# Поля сделки, которые можно задать через API -> тип значения
+DEAL_FIELDS = {
+    'building_id': int,
+    'company_id': int,
+    'status_id': int,
+    'deal_name': str,
+    'potential_amount': Decimal,
+    'lift_count_to_replace': int,
+    'estimated_cost_per_lift': Decimal,
+    'advance_percent': int,
+    'installment_months': int,
+    'first_contact_date': date,
+    'presentation_date': date,
+    'expected_close_date': date,
+    'actual_close_date': date,
+    'probability_percent': int,
+    'assigned_user_id': int,
+    'notes': str,
+    'rejection_reason': str,
+}
+
+# Фильтры списка сделок (целочисленные колонки deals)
+DEAL_LIST_FILTERS = ('status_id', 'assigned_user_id', 'building_id', 'company_id')
+
+
+def _deal_value(field, value):
+    kind = DEAL_FIELDS[field]
+    if value is None:
+        return None
+    try:
+        if kind is int:
+            if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+                raise ValueError
+            return int(value)
+        if kind is Decimal:
+            if isinstance(value, bool):
+                raise ValueError
+            amount = Decimal(str(value))
+            if not amount.is_finite():
+                raise ValueError
+            return amount
+        if kind is date:
+            return date.fromisoformat(value)
+        if not isinstance(value, str):
+            raise ValueError
+        return value
+    except (ValueError, TypeError, InvalidOperation):
+        raise ValueError(f"Invalid value for {field}: {value!r}")
+
+
+def deal_values(payload):
+    """
+    JSON body of POST/PATCH /api/deals -> {column: value}.
+    ValueError with a client-facing message on unknown fields or bad values
+    """
+    if not isinstance(payload, dict) or not payload:
+        raise ValueError('Expected a non-empty JSON object')
+    unknown = sorted(set(payload) - set(DEAL_FIELDS))
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+
+    values = {field: _deal_value(field, value) for field, value in payload.items()}
+    probability = values.get('probability_percent')
+    if probability is not None and not 0 <= probability <= 100:
+        raise ValueError('probability_percent must be between 0 and 100')
+    return values
+
+
+DEAL_SELECT = """
+    SELECT d.id, d.deal_name, d.status_id, ds.code as status_code, ds.name as status,
+           d.building_id, b.address, b.mkd_code, d.company_id, mc.name as company_name,
+           d.potential_amount, d.lift_count_to_replace, d.estimated_cost_per_lift,
+           d.advance_percent, d.advance_amount, d.installment_months,
+           d.first_contact_date, d.presentation_date, d.expected_close_date, d.actual_close_date,
+           d.probability_percent, d.assigned_user_id, u.full_name as assigned_user,
+           d.notes, d.rejection_reason, d.created_at, d.updated_at
+    FROM deals d
+    LEFT JOIN deal_statuses ds ON ds.id = d.status_id
+    LEFT JOIN buildings b ON b.id = d.building_id
+    LEFT JOIN management_companies mc ON mc.id = d.company_id
+    LEFT JOIN users u ON u.id = d.assigned_user_id
+"""
+
+DEAL_QUERY = DEAL_SELECT + " WHERE d.id = %s"
+
+# Старые значения для audit_log; FOR UPDATE - параллельная правка той же сделки ждет
+DEAL_LOCK_QUERY = "SELECT * FROM deals WHERE id = %s FOR UPDATE"
+
+DEAL_DELETE_QUERY = "DELETE FROM deals WHERE id = %s RETURNING *"
+
+
+def deal_insert(values):
+    """INSERT of a new deal from deal_values(). Returns (query, params)"""
+    columns = list(values)
+    query = f"""
+        INSERT INTO deals ({', '.join(columns)})
+        VALUES ({', '.join(['%s'] * len(columns))})
+        RETURNING *
+    """
+    return query, [values[c] for c in columns]
+
+
+def deal_update(deal_id, values):
+    """UPDATE of the given deal columns from deal_values(). Returns (query, params)"""
+    columns = list(values)
+    query = f"""
+        UPDATE deals SET {', '.join(f'{c} = %s' for c in columns)}
+        WHERE id = %s
+        RETURNING *
+    """
+    return query, [values[c] for c in columns] + [deal_id]
+
+
+def deals_page(args, per_page, cursor):
+    """
+    One /api/deals page, newest first, keyset by id (колонка канбана идет по
+    idx_deals_status_id). Returns (query, params); ValueError on bad filters
+    """
+    query = DEAL_SELECT + " WHERE 1=1"
+    params = []
+
+    for name in DEAL_LIST_FILTERS:
+        value = args.get(name, '')
+        if value:
+            query += f" AND d.{name} = %s"
+            params.append(_deal_value(name, value))
+
+    if cursor:
+        _, last_id = decode_cursor(cursor, 'id', 'DESC')
+        query += " AND d.id < %s"
+        params.append(last_id)
+
+    query += " ORDER BY d.id DESC LIMIT %s"
+    params.append(per_page)
+    return query, params
+
+
+# Воронка из deal_pipeline_summary (database/014_deal_pipeline.sql) - те же колонки, что у v_sales_pipeline
+PIPELINE_QUERY = """
+    SELECT ds.id as status_id, ds.name as stage, ds.code as stage_code, ds.sort_order, ds.color,
+           COALESCE(s.deals_count, 0) as deals_count,
+           COALESCE(s.total_amount, 0) as total_amount,
+           COALESCE(ROUND(s.probability_sum::numeric / NULLIF(s.probability_count, 0)), 0) as avg_probability,
+           (
+               SELECT STRING_AGG(DISTINCT u.full_name, ', ')
+               FROM deal_pipeline_managers pm
+               JOIN users u ON u.id = pm.user_id
+               WHERE pm.status_id = ds.id AND pm.deals_count > 0
+           ) as managers
+    FROM deal_statuses ds
+    LEFT JOIN deal_pipeline_summary s ON s.status_id = ds.id
+    ORDER BY ds.sort_order, ds.id
+"""
+
+
+# ============================================
+# CRM: очередь следующих действий менеджера (database/016_next_actions.sql)
+# ============================================
+
+def next_actions_page(user_id, until, per_page, cursor):
+    """
+    Open next actions of one manager due on or before `until`, oldest first,
+    keyset by (next_action_date, id) over idx_activities_next_action_queue.
+    Returns (query, params)
+    """
+    query = """
+        SELECT a.id, a.next_action_date, a.next_action, a.next_action_date < CURRENT_DATE as overdue,
+               a.activity_type, a.subject, a.outcome, a.activity_date,
+               d.id as deal_id, d.deal_name, ds.code as deal_status_code, ds.name as deal_status,
+               b.id as building_id, b.address,
+               c.id as contact_id, c.full_name as contact_name, c.position as contact_position,
+               c.phone as contact_phone, c.email as contact_email
+        FROM activities a
+        LEFT JOIN deals d ON d.id = a.deal_id
+        LEFT JOIN deal_statuses ds ON ds.id = d.status_id
+        LEFT JOIN contacts c ON c.id = a.contact_id
+        LEFT JOIN buildings b ON b.id = COALESCE(d.building_id, c.building_id)
+        WHERE a.user_id = %s
+          AND a.next_action_date IS NOT NULL AND a.next_action_done_at IS NULL
+          AND a.next_action_date <= %s
+    """
+    params = [user_id, until]
+
+    if cursor:
+        last_date, last_id = decode_cursor(cursor, 'next_action_date', 'ASC')
+        condition, condition_params = keyset_condition(
+            'a.next_action_date', 'a.id', 'ASC', last_date, last_id, 'date'
+        )
+        query += f" AND {condition}"
+        params.extend(condition_params)
+
+    query += " ORDER BY a.next_action_date, a.id LIMIT %s"
+    params.append(per_page)
+    return query, params
+
+
+# Бейдж: сумма по дням из next_action_counts, без обращения к activities
+NEXT_ACTION_COUNT_QUERY = """
+    SELECT COALESCE(SUM(pending_count), 0) as due,
+           COALESCE(SUM(pending_count) FILTER (WHERE next_action_date < CURRENT_DATE), 0) as overdue
+    FROM next_action_counts
+    WHERE user_id = %s AND next_action_date <= CURRENT_DATE
+"""
+
+NEXT_ACTION_DONE_QUERY = """
+    UPDATE activities SET next_action_done_at = CURRENT_TIMESTAMP
+    WHERE id = %s AND next_action_date IS NOT NULL AND next_action_done_at IS NULL
+    RETURNING id, user_id, next_action_date, next_action
+"""
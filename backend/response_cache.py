@@ -0,0 +1,111 @@
+"""
+Capital Repair Management - HTTP response cache for GET endpoints
+
+Responses are cached by (endpoint, normalized query args, data version) and
+carry ETag/Last-Modified derived from the data version, so repeat views get
+304 Not Modified until the next import.
+
+Storage is an in-process LRU by default. If API_CACHE_REDIS_URL is set and the
+optional `redis` package is installed, a Redis-compatible server is used
+instead and shared between gunicorn workers.
+"""
+import functools
+import hashlib
+import logging
+
+from flask import Response, request
+
+from backend.cache import LRUCache, get_data_version, get_data_updated_at, on_data_version_change
+from backend.db import get_db
+from scripts.config import API_RESPONSE_CACHE_SIZE, API_CACHE_REDIS_URL, API_CACHE_REDIS_TTL
+
+logger = logging.getLogger(__name__)
+
+
+class RedisStore:
+    """Response store in Redis; entries expire by TTL, stale versions are never read"""
+
+    prefix = 'capital-repair:response:'
+
+    def __init__(self, url, ttl):
+        import redis  # Необязательная зависимость
+        self._client = redis.Redis.from_url(url)
+        self.ttl = int(ttl)
+
+    def _key(self, key):
+        return self.prefix + hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+
+    def get(self, key, default=None):
+        raw = self._client.get(self._key(key))
+        if raw is None:
+            return default
+        status, mimetype, body = raw.split(b'\n', 2)
+        return int(status), mimetype.decode('ascii'), body
+
+    def set(self, key, value):
+        status, mimetype, body = value
+        raw = f'{status}\n{mimetype}\n'.encode('ascii') + body
+        self._client.set(self._key(key), raw, ex=self.ttl)
+
+    def clear(self):
+        # Ключи содержат версию данных - старые просто истекут по TTL
+        pass
+
+
+def _make_store():
+    if API_CACHE_REDIS_URL:
+        try:
+            return RedisStore(API_CACHE_REDIS_URL, API_CACHE_REDIS_TTL)
+        except ImportError:
+            logger.warning("API_CACHE_REDIS_URL is set but `redis` is not installed, using in-process cache")
+    return LRUCache(API_RESPONSE_CACHE_SIZE)
+
+
+_store = _make_store()
+on_data_version_change(lambda version: _store.clear())
+
+
+def _normalized_args():
+    """Query args in a stable order (?a=1&b=2 and ?b=2&a=1 share an entry)"""
+    return tuple(sorted((k, v.strip()) for k, v in request.args.items(multi=True)))
+
+
+def cached_response(view):
+    """Cache a GET view's 200 responses until the data version changes"""
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        conn = get_db()
+        version = get_data_version(conn)
+        updated_at = get_data_updated_at(conn)
+        etag = f'dv{version}'
+
+        # Браузер уже видел эту версию данных
+        # Слабое сравнение: сжатые ответы отдаются со слабым ETag (backend/serialize.py)
+        if request.if_none_match.contains_weak(etag) or (
+            not request.if_none_match and updated_at and request.if_modified_since
+            and request.if_modified_since >= updated_at.replace(microsecond=0)
+        ):
+            response = Response(status=304)
+        else:
+            key = (request.path, _normalized_args(), version)
+            cached = _store.get(key)
+            if cached is not None:
+                status, mimetype, body = cached
+                response = Response(body, status=status, mimetype=mimetype)
+                response.headers['X-Cache'] = 'HIT'
+            else:
+                response = view(*args, **kwargs)
+                if not isinstance(response, Response):
+                    return response  # (body, status) - ошибки не кэшируем
+                if response.status_code == 200:
+                    _store.set(key, (response.status_code, response.mimetype, response.get_data()))
+                response.headers['X-Cache'] = 'MISS'
+
+        response.set_etag(etag)
+        if updated_at:
+            response.last_modified = updated_at
+        response.headers['Cache-Control'] = 'no-cache'  # Кэшировать, но каждый раз сверять ETag
+        return response
+
+    return wrapper
@@ -0,0 +1,131 @@
+"""
+Capital Repair Management - JSON encoding and compression of API responses
+
+JSON is encoded with orjson when it is installed (falls back to the standard
+json module): Decimal is written as a string (as Flask did before), dates and
+timestamps as ISO 8601. List endpoints can return rows in a columnar shape
+({columns: [...], rows: [[...]]}) straight from a tuple cursor.
+
+Responses above API_COMPRESS_MIN_BYTES are compressed with brotli (optional
+`brotli` package) or gzip, depending on the client's Accept-Encoding.
+"""
+import gzip
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+
+from scripts.config import API_COMPRESS_MIN_BYTES
+
+try:
+    import orjson
+except ImportError:  # Необязательная зависимость
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # Необязательная зависимость
+    brotli = None
+
+RESPONSE_SHAPES = ('objects', 'columns')
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'text/plain', 'text/csv')
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (date, datetime, time)):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def dumps(obj, indent=False):
+    """Compact UTF-8 JSON bytes (indent=True - with 2-space indentation)"""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, default=_default, option=option)
+    if indent:
+        return json.dumps(obj, default=_default, ensure_ascii=False, indent=2).encode('utf-8')
+    return json.dumps(obj, default=_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+# Аргументы, которые jsonify() (DefaultJSONProvider.response) передает всегда
+_RESPONSE_DUMP_ARGS = {'indent', 'separators'}
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider on orjson; keys keep the SELECT column order"""
+
+    sort_keys = False
+
+    def dumps(self, obj, **kwargs):
+        # separators у orjson всегда компактные, indent - OPT_INDENT_2 (debug-режим Flask)
+        if set(kwargs) <= _RESPONSE_DUMP_ARGS:
+            return dumps(obj, indent=bool(kwargs.get('indent'))).decode('utf-8')
+        kwargs.setdefault('default', _default)
+        kwargs.setdefault('ensure_ascii', False)
+        return json.dumps(obj, **kwargs)
+
+
+def shape_rows(columns, rows, shape, key):
+    """
+    Rows of a tuple cursor as a response fragment:
+    {key: [{column: value}, ...]} or, for shape='columns', {'columns': [...], 'rows': [[...], ...]}
+    """
+    if shape == 'columns':
+        return {'columns': columns, 'rows': rows}
+    return {key: [dict(zip(columns, row)) for row in rows]}
+
+
+def _accepted_encoding():
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress_response(response):
+    """after_request hook: compress large responses the client can decode"""
+    if (
+        response.status_code != 200
+        or response.direct_passthrough
+        or response.is_streamed
+        or 'Content-Encoding' in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+    ):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = _accepted_encoding()
+    if encoding is None:
+        return response
+
+    body = response.get_data()
+    if len(body) < API_COMPRESS_MIN_BYTES:
+        return response
+
+    if encoding == 'br':
+        body = brotli.compress(body, quality=4)
+    else:
+        body = gzip.compress(body, compresslevel=5)
+
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    # Сжатое и несжатое тело - разные байты, ETag версии данных становится слабым
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_app(app):
+    """Use the fast JSON provider and compress large responses"""
+    if not isinstance(app.json, FastJSONProvider):  # metrics.TimedJSONProvider уже его подкласс
+        app.json_provider_class = FastJSONProvider
+        app.json = FastJSONProvider(app)
+    app.after_request(compress_response)
@@ -0,0 +1,143 @@
+"""
+Отчет по индексам: какие используют запросы бенчмарка и сколько они занимают
+
+Прогоняет SQL всех сценариев run.py (EXPLAIN ANALYZE, параметры как у
+нагрузки), собирает из планов имена индексов и печатает для каждого индекса
+таблиц API: размер, сценарии, в планах которых он встретился, число сканов
+по pg_stat_user_indexes (за прогон и с последнего сброса статистики).
+Индекс без сценариев и без сканов - кандидат на удаление.
+
+Использование:
+    python benchmarks/indexes.py
+    python benchmarks/indexes.py --database capital_repair_bench_10 --repeat 5 --out indexes.json
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR / 'scripts'))
+from config import DB_CONFIG
+from run import SCENARIOS, render_params, scenario_queries
+from seed import BENCH_DATABASE
+
+# Таблицы, которые читает API
+TABLES = [
+    'buildings', 'building_lift_summary', 'buildings_management', 'management_companies',
+    'company_summary', 'lifts', 'stats_snapshot', 'building_scores',
+]
+
+INDEX_STATS_QUERY = """
+    SELECT s.relname as table_name, s.indexrelname as index_name, s.idx_scan,
+           pg_relation_size(s.indexrelid) as size_bytes,
+           pg_get_indexdef(s.indexrelid) as definition
+    FROM pg_stat_user_indexes s
+    WHERE s.relname = ANY(%s)
+    ORDER BY s.relname, s.indexrelname
+"""
+
+
+def plan_indexes(node, found):
+    """Имена индексов во всех узлах плана (Index Scan, Index Only Scan, Bitmap Index Scan)"""
+    if 'Index Name' in node and node.get('Actual Loops', 1):
+        found.add(node['Index Name'])
+    for child in node.get('Plans', []):
+        plan_indexes(child, found)
+    return found
+
+
+def index_stats(conn):
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        # Счетчики читаются из снимка статистики - сбрасываем его, чтобы увидеть свежие
+        cur.execute("SELECT pg_stat_clear_snapshot()")
+        cur.execute(INDEX_STATS_QUERY, (TABLES,))
+        rows = {row['index_name']: row for row in cur.fetchall()}
+    conn.rollback()
+    return rows
+
+
+def replay(conn, repeat, seed):
+    """EXPLAIN ANALYZE запросов каждого сценария; {индекс: {сценарий: время выполнения, мс}}"""
+    rng = random.Random(seed)
+    usage = {}
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        for name, _, endpoint, params in SCENARIOS:
+            for _ in range(repeat):
+                for label, sql, sql_params in scenario_queries(endpoint, render_params(params, rng)):
+                    cur.execute("EXPLAIN (ANALYZE, FORMAT JSON) " + sql, sql_params)
+                    plan = list(cur.fetchone().values())[0][0]
+                    for index in plan_indexes(plan['Plan'], set()):
+                        scenarios = usage.setdefault(index, {})
+                        scenarios[f"{name}:{label}"] = round(plan['Execution Time'], 2)
+            conn.rollback()
+    return usage
+
+
+def report(before, after, usage):
+    rows = []
+    for index, stat in after.items():
+        rows.append({
+            'table': stat['table_name'],
+            'index': index,
+            'size_bytes': stat['size_bytes'],
+            'replay_scans': stat['idx_scan'] - before.get(index, stat)['idx_scan'],
+            'total_scans': stat['idx_scan'],
+            'scenarios': usage.get(index, {}),
+            'definition': stat['definition'],
+        })
+    return rows
+
+
+def print_report(rows):
+    print(f"{'таблица':<24} {'индекс':<38} {'размер':>9} {'сканов':>8} {'всего':>10}  сценарии")
+    for row in rows:
+        size = f"{row['size_bytes'] / 1024 / 1024:.1f} МБ"
+        scenarios = ', '.join(sorted(row['scenarios'])) or '-'
+        print(f"{row['table']:<24} {row['index']:<38} {size:>9} {row['replay_scans']:>8} "
+              f"{row['total_scans']:>10}  {scenarios}")
+
+    unused = [row for row in rows if not row['scenarios'] and not row['total_scans']]
+    total = sum(row['size_bytes'] for row in rows)
+    print(f"\nИндексов: {len(rows)}, {total / 1024 / 1024:.1f} МБ")
+    if unused:
+        size = sum(row['size_bytes'] for row in unused) / 1024 / 1024
+        print(f"Не использовались ни бенчмарком, ни с момента сброса статистики ({size:.1f} МБ):")
+        for row in unused:
+            print(f"    {row['definition']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Использование и размер индексов на запросах бенчмарка')
+    parser.add_argument('--database', default=BENCH_DATABASE, help='БД из seed.py (или рабочая - только чтение)')
+    parser.add_argument('--repeat', type=int, default=3, help='Сколько раз прогнать каждый сценарий')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--out', help='Сохранить отчет в JSON')
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(**dict(DB_CONFIG, database=args.database))
+    try:
+        before = index_stats(conn)
+        usage = replay(conn, args.repeat, args.seed)
+        # Статистика отправляется сервером не сразу после запроса
+        time.sleep(2)
+        after = index_stats(conn)
+    finally:
+        conn.close()
+
+    rows = report(before, after, usage)
+    print_report(rows)
+
+    if args.out:
+        Path(args.out).write_text(json.dumps(rows, ensure_ascii=False, indent=2), encoding='utf-8')
+        print(f"Отчет: {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,256 @@
+"""
+Бенчмарк REST API: нагрузка по сценариям + EXPLAIN запросов
+
+Прогоняет смесь сценариев (фильтры/сортировки /api/buildings, поиск по
+/api/companies, /api/stats) против запущенного API на БД из seed.py,
+считает rps и p50/p95/p99 по эндпоинтам и сценариям, снимает
+EXPLAIN (ANALYZE, BUFFERS) запросов каждого сценария и пишет все в JSON.
+
+Использование:
+    python benchmarks/run.py --url http://127.0.0.1:5000 --scale 1
+    python benchmarks/run.py --compare benchmarks/results/a.json benchmarks/results/b.json
+
+По умолчанию к каждому запросу добавляется уникальный параметр, чтобы
+кэш ответов API не скрывал запросы к БД (--cached - замер с кэшем).
+"""
+
+import argparse
+import json
+import random
+import subprocess
+import sys
+import urllib.parse
+from datetime import date, datetime
+from decimal import Decimal
+from pathlib import Path
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+sys.path.insert(0, str(BASE_DIR / 'scripts'))
+from backend import queries
+from backend.loadtest import percentile, replay
+from backend.pagination import encode_cursor
+from config import DB_CONFIG
+from seed import BENCH_DATABASE, STREETS, table_counts
+
+RESULTS_DIR = BASE_DIR / 'benchmarks' / 'results'
+
+# Курсоры "глубоких" страниц: середина диапазона баланса seed.py и годов замены лифтов.
+# Ключ баланса не NULL - запрос идет двумя ветками (диапазон + NULL-хвост)
+BALANCE_CURSOR = encode_cursor('balance', 'DESC', Decimal('1000000.00'), 0)
+DATE_CURSOR = encode_cursor('date', 'ASC', date(2025, 1, 1), 0)
+
+# (имя, вес, эндпоинт, параметры)
+SCENARIOS = [
+    ('buildings_default', 25, '/api/buildings', {'account_type': 'SPEC', 'has_lifts': 'true'}),
+    ('buildings_all', 5, '/api/buildings', {'account_type': '', 'has_lifts': 'false'}),
+    ('buildings_page_10', 5, '/api/buildings', {'account_type': 'SPEC', 'has_lifts': 'true', 'page': '10'}),
+    ('buildings_cursor_balance', 5, '/api/buildings', {'account_type': 'SPEC', 'has_lifts': 'true', 'cursor': BALANCE_CURSOR}),
+    ('buildings_cursor_date', 3, '/api/buildings', {'account_type': 'SPEC', 'has_lifts': 'true', 'sort_by': 'date', 'sort_order': 'asc', 'cursor': DATE_CURSOR}),
+    ('buildings_sort_date', 5, '/api/buildings', {'account_type': 'SPEC', 'has_lifts': 'true', 'sort_by': 'date', 'sort_order': 'asc'}),
+    ('buildings_sort_address', 3, '/api/buildings', {'account_type': '', 'has_lifts': 'true', 'sort_by': 'address', 'sort_order': 'asc'}),
+    ('buildings_sort_lifts', 3, '/api/buildings', {'account_type': 'SPEC', 'has_lifts': 'true', 'sort_by': 'lifts'}),
+    ('buildings_sort_score', 3, '/api/buildings', {'account_type': 'SPEC', 'has_lifts': 'true', 'sort_by': 'score'}),
+    ('buildings_years', 8, '/api/buildings', {'account_type': 'SPEC', 'has_lifts': 'true', 'replacement_year': '2026,2027'}),
+    ('buildings_region', 4, '/api/buildings', {'account_type': 'SPEC', 'has_lifts': 'true', 'region': 'Республика Татарстан'}),
+    ('buildings_region_id', 4, '/api/buildings', {'account_type': 'SPEC', 'has_lifts': 'true', 'region_id': '4'}),
+    ('buildings_balance', 5, '/api/buildings', {'account_type': 'SPEC', 'has_lifts': 'true', 'min_balance': '2000000'}),
+    ('buildings_search', 8, '/api/buildings', {'account_type': '', 'has_lifts': 'false', 'search': '{street}'}),
+    ('buildings_search_mkd', 3, '/api/buildings', {'account_type': '', 'has_lifts': 'false', 'search': '1000{digits}'}),
+    ('companies_default', 6, '/api/companies', {}),
+    ('companies_search', 6, '/api/companies', {'search': 'УК {digits}'}),
+    ('stats', 10, '/api/stats', {}),
+]
+
+
+def render_params(params, rng):
+    """Подстановка случайных значений поиска ({street}, {digits})"""
+    return {
+        key: value.format(street=rng.choice(STREETS), digits=rng.randint(1, 99))
+        for key, value in params.items()
+    }
+
+
+def load(base_url, concurrency, duration, cached, seed):
+    """Нагрузка смесью SCENARIOS (backend.loadtest.replay); latencies и число ошибок по сценариям"""
+    rng = random.Random(seed)
+    weights = [s[1] for s in SCENARIOS]
+    plan = [
+        (name, endpoint + '?' + urllib.parse.urlencode(render_params(params, rng)))
+        for name, _, endpoint, params in rng.choices(SCENARIOS, weights=weights, k=100000)
+    ]
+    latencies, errors, elapsed = replay(base_url, plan, concurrency, duration, bust_cache=not cached, timeout=60)
+
+    # Сценарий могло не выпасть в плане - в отчете он все равно есть, с нулями
+    return (
+        {name: latencies.get(name, []) for name, *_ in SCENARIOS},
+        {name: len(errors.get(name, [])) for name, *_ in SCENARIOS},
+        elapsed,
+    )
+
+
+def summarize(values, errors, elapsed):
+    return {
+        'requests': len(values),
+        'errors': errors,
+        'rps': round(len(values) / elapsed, 2) if elapsed else 0.0,
+        'p50_ms': round(percentile(values, 50) * 1000, 2),
+        'p95_ms': round(percentile(values, 95) * 1000, 2),
+        'p99_ms': round(percentile(values, 99) * 1000, 2),
+    }
+
+
+def scenario_queries(endpoint, params):
+    """SQL, который выполняет API для сценария: [(метка, sql, параметры)]"""
+    if endpoint == '/api/buildings':
+        page = int(params.get('page', 1))
+        query, query_params, count_query, count_params, _ = queries.buildings_page(
+            params, 20, (page - 1) * 20, params.get('cursor', '')
+        )
+        return [
+            ('page', query, query_params),
+            ('count', "SELECT COUNT(*) " + count_query, count_params),
+        ]
+    if endpoint == '/api/companies':
+        query, query_params, count_query, count_params, _ = queries.companies_page(params.get('search', ''), 20, 0, '')
+        return [
+            ('page', query, query_params),
+            ('count', "SELECT COUNT(*) " + count_query, count_params),
+        ]
+    if endpoint == '/api/stats':
+        return [('snapshot', queries.STATS_SNAPSHOT_QUERY, None)]
+    return []
+
+
+def explain_all(conn, seed):
+    """EXPLAIN (ANALYZE, BUFFERS) каждого запроса каждого сценария"""
+    rng = random.Random(seed)
+    plans = {}
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        for name, _, endpoint, params in SCENARIOS:
+            plans[name] = []
+            for label, sql, sql_params in scenario_queries(endpoint, render_params(params, rng)):
+                cur.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql, sql_params)
+                plan = list(cur.fetchone().values())[0][0]
+                plans[name].append({
+                    'query': label,
+                    'sql': cur.mogrify(sql, sql_params).decode('utf-8'),
+                    'planning_ms': plan.get('Planning Time'),
+                    'execution_ms': plan.get('Execution Time'),
+                    'plan': plan['Plan'],
+                })
+            conn.rollback()
+    return plans
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    print(f"{args.url}: {args.concurrency} клиентов, {args.duration:.0f} с, кэш {'вкл' if args.cached else 'выкл'}")
+    latencies, errors, elapsed = load(args.url, args.concurrency, args.duration, args.cached, args.seed)
+
+    by_endpoint = {}
+    for name, _, endpoint, _ in SCENARIOS:
+        entry = by_endpoint.setdefault(endpoint, {'values': [], 'errors': 0})
+        entry['values'].extend(latencies[name])
+        entry['errors'] += errors[name]
+
+    conn = psycopg2.connect(**dict(DB_CONFIG, database=args.database))
+    try:
+        plans = explain_all(conn, args.seed)
+        counts = table_counts(conn)
+    finally:
+        conn.close()
+
+    all_values = [v for values in latencies.values() for v in values]
+    result = {
+        'meta': {
+            'started_at': datetime.now().isoformat(timespec='seconds'),
+            'git_commit': git_commit(),
+            'url': args.url,
+            'database': args.database,
+            'scale': args.scale,
+            'tables': counts,
+            'concurrency': args.concurrency,
+            'duration_s': args.duration,
+            'cached': args.cached,
+            'seed': args.seed,
+        },
+        'total': summarize(all_values, sum(errors.values()), elapsed),
+        'endpoints': {
+            endpoint: summarize(entry['values'], entry['errors'], elapsed)
+            for endpoint, entry in by_endpoint.items()
+        },
+        'scenarios': {
+            name: dict(summarize(latencies[name], errors[name], elapsed), endpoint=endpoint, params=params,
+                       queries=plans[name])
+            for name, _, endpoint, params in SCENARIOS
+        },
+    }
+
+    out = Path(args.out) if args.out else RESULTS_DIR / f"{datetime.now():%Y%m%d_%H%M%S}_x{args.scale:g}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, ensure_ascii=False, indent=2, default=str), encoding='utf-8')
+
+    print(f"\n{'сценарий':<26} {'запросов':>9} {'ошибок':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'SQL ms':>8}")
+    for name, s in result['scenarios'].items():
+        sql_ms = sum(q['execution_ms'] or 0 for q in s['queries'])
+        print(f"{name:<26} {s['requests']:>9} {s['errors']:>7} {s['p50_ms']:>8.1f} {s['p95_ms']:>8.1f} "
+              f"{s['p99_ms']:>8.1f} {sql_ms:>8.1f}")
+    t = result['total']
+    print(f"\nВсего: {t['requests']} запросов, {t['rps']} rps, p50 {t['p50_ms']} / p95 {t['p95_ms']} / p99 {t['p99_ms']} мс")
+    print(f"Результаты: {out}")
+
+
+def compare(old_path, new_path):
+    """Разница p50/p95/p99 и времени SQL между двумя прогонами"""
+    old = json.loads(Path(old_path).read_text(encoding='utf-8'))
+    new = json.loads(Path(new_path).read_text(encoding='utf-8'))
+
+    def delta(a, b):
+        if not a:
+            return '     n/a'
+        return f"{(b - a) / a * 100:+7.1f}%"
+
+    print(f"{'сценарий':<26} {'p50':>8} {'p95':>8} {'p99':>8} {'SQL':>8}")
+    for name, s in new['scenarios'].items():
+        o = old['scenarios'].get(name)
+        if o is None:
+            print(f"{name:<26} (нет в {old_path})")
+            continue
+        old_sql = sum(q['execution_ms'] or 0 for q in o['queries'])
+        new_sql = sum(q['execution_ms'] or 0 for q in s['queries'])
+        print(f"{name:<26} {delta(o['p50_ms'], s['p50_ms'])} {delta(o['p95_ms'], s['p95_ms'])} "
+              f"{delta(o['p99_ms'], s['p99_ms'])} {delta(old_sql, new_sql)}")
+    print(f"\nrps: {old['total']['rps']} -> {new['total']['rps']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк REST API')
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help='Адрес запущенного API')
+    parser.add_argument('--database', default=BENCH_DATABASE, help='БД, на которой запущен API (для EXPLAIN)')
+    parser.add_argument('--scale', type=float, default=1, help='Масштаб, с которым заполнялась БД (для отчета)')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=60, help='Длительность нагрузки, с')
+    parser.add_argument('--cached', action='store_true', help='Не обходить кэш ответов API')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--out', help='Файл результатов (по умолчанию benchmarks/results/<время>_x<масштаб>.json)')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='Сравнить два файла результатов')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+    else:
+        run(args)
+
+
+if __name__ == '__main__':
+    main()
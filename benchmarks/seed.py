@@ -0,0 +1,199 @@
+"""
+Заполнение отдельной БД синтетическими данными для бенчмарков API
+
+Создает БД заново, применяет database/0*.sql и генерирует дома, лифты, УК и
+связи дом-УК в масштабе ПФО (1x ~ 180 000 домов в 14 регионах). Данные
+генерируются на сервере (generate_series) с фиксированным seed, поэтому два
+запуска с одним масштабом дают одинаковую БД.
+
+Использование:
+    python benchmarks/seed.py --scale 1
+    python benchmarks/seed.py --scale 10 --database capital_repair_bench_10
+
+API для замеров запускается на этой же БД:
+    DB_NAME=capital_repair_bench gunicorn --bind 127.0.0.1:5000 --workers 4 backend.api:app
+"""
+
+import argparse
+import logging
+import sys
+import time
+from pathlib import Path
+
+import psycopg2
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR / 'scripts'))
+from config import DB_CONFIG, LOG_FORMAT, LOG_LEVEL
+from post_import import finish_import
+
+logger = logging.getLogger(__name__)
+
+BENCH_DATABASE = 'capital_repair_bench'
+MIGRATIONS_DIR = BASE_DIR / 'database'
+
+# Масштаб 1x - примерно весь ПФО
+PFO_BUILDINGS = 180000
+MUNICIPALITIES_PER_REGION = 40
+BUILDINGS_PER_COMPANY = 40
+
+# Улицы для адресов; run.py ищет по ним же
+STREETS = [
+    'Ленина', 'Мира', 'Советская', 'Гагарина', 'Победы', 'Пушкина', 'Кирова',
+    'Московская', 'Садовая', 'Молодежная', 'Школьная', 'Набережная', 'Лесная',
+    'Центральная', 'Заводская', 'Октябрьская', 'Комсомольская', 'Первомайская',
+]
+
+SEED_SQL = """
+SELECT setseed(%(seed)s);
+
+-- Муниципалитеты
+INSERT INTO municipalities (region_id, oktmo_code, name)
+SELECT r.id, lpad((r.id * 1000 + g)::text, 11, '0'), 'МО ' || r.region_name || ' №' || g
+FROM regions r, generate_series(1, %(municipalities)s) g;
+
+-- УК/ТСЖ/ЖСК
+INSERT INTO management_companies (type_id, name, inn, ogrn, director_name, phone, email, region_id, data_source)
+SELECT t.id,
+       CASE t.code WHEN 'UK' THEN 'ООО "УК ' ELSE t.code || ' "Дом ' END || g || '"',
+       '1' || lpad(g::text, 9, '0'),
+       '1' || lpad(g::text, 12, '0'),
+       CASE WHEN random() < 0.7 THEN 'Иванов Иван Иванович' END,
+       CASE WHEN random() < 0.6 THEN '+7 900 ' || lpad(g::text, 7, '0') END,
+       CASE WHEN random() < 0.4 THEN 'uk' || g || '@example.ru' END,
+       ids.region_ids[1 + g %% cardinality(ids.region_ids)],
+       'benchmark'
+FROM generate_series(1, %(companies)s) g
+CROSS JOIN (SELECT array_agg(id ORDER BY id) as region_ids FROM regions) ids
+JOIN organization_types t ON t.code = (ARRAY['UK', 'UK', 'TSJ', 'JSK'])[1 + g %% 4];
+
+-- Дома
+INSERT INTO buildings (
+    region_id, municipality_id, region, mkd_code, address, commission_year, total_sq,
+    number_floors_max, spec_account_owner_type, overhaul_funds_balance
+)
+SELECT m.region_id, m.id, r.region_name,
+       (100000000 + g)::text,
+       r.region_name || ', г. Город-' || (g %% 50) || ', ул. ' || (%(streets)s::text[])[1 + (g * 7) %% cardinality(%(streets)s::text[])]
+           || ', д. ' || (1 + g %% 150),
+       1950 + (random() * 70)::int,
+       round((500 + random() * 15000)::numeric, 2),
+       1 + (random() * 16)::int,
+       (ARRAY['UK', 'UK', 'UK', 'TSJ', 'JSK', 'REGOP', 'REGOP', 'REGOP', 'REGOP', NULL])[1 + (random() * 9)::int],
+       CASE WHEN random() < 0.9 THEN round((exp(random() * 6) * 50000)::numeric, 2) END
+FROM generate_series(1, %(buildings)s) g
+CROSS JOIN (SELECT array_agg(id ORDER BY id) as mun_ids FROM municipalities) ids
+JOIN municipalities m ON m.id = ids.mun_ids[1 + (g * 7919) %% cardinality(ids.mun_ids)]
+JOIN regions r ON r.id = m.region_id;
+
+-- Лифты: в домах от 9 этажей, 1-4 на дом, срок службы 25 лет
+INSERT INTO lifts (building_id, element_code, lift_type, stops_count, commissioning_date, decommissioning_date)
+SELECT b.id, 'L' || n, 'Пассажирский', b.number_floors_max, d.commissioned, d.commissioned + interval '25 years'
+FROM buildings b
+CROSS JOIN LATERAL generate_series(1, 1 + (b.id %% 4)::int) n
+CROSS JOIN LATERAL (SELECT make_date(1985 + ((b.id * 13 + n) %% 30)::int, 1 + ((b.id + n) %% 12)::int, 1) as commissioned) d
+WHERE b.number_floors_max >= 9;
+
+-- Связь дом-УК: дома на спецсчетах и часть домов регоператора
+INSERT INTO buildings_management (building_id, company_id, contract_start_date, is_active)
+SELECT b.id, ids.company_ids[1 + (b.id * 31) %% cardinality(ids.company_ids)], DATE '2015-01-01', true
+FROM buildings b
+CROSS JOIN (SELECT array_agg(id ORDER BY id) as company_ids FROM management_companies) ids
+WHERE b.spec_account_owner_type IN ('UK', 'TSJ', 'JSK') OR random() < 0.3;
+"""
+
+
+def recreate_database(database):
+    """DROP + CREATE DATABASE (через служебную БД postgres)"""
+    admin_config = dict(DB_CONFIG, database='postgres')
+    conn = psycopg2.connect(**admin_config)
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f'DROP DATABASE IF EXISTS "{database}"')
+            cur.execute(f'CREATE DATABASE "{database}" ENCODING \'UTF8\' TEMPLATE template0')
+    finally:
+        conn.close()
+    logger.info(f"БД {database} создана")
+
+
+def apply_migrations(conn):
+    """database/0*.sql по порядку номеров"""
+    for path in sorted(MIGRATIONS_DIR.glob('0*.sql')):
+        started = time.monotonic()
+        with conn.cursor() as cur:
+            cur.execute(path.read_text(encoding='utf-8'))
+            if path.name.startswith('001_'):
+                # Текстовое название региона используется API (/api/regions, фильтр region),
+                # в миграциях его нет - колонка была добавлена на сервере вручную
+                cur.execute("ALTER TABLE buildings ADD COLUMN IF NOT EXISTS region TEXT")
+        conn.commit()
+        logger.info(f"{path.name}: {time.monotonic() - started:.1f} с")
+
+
+def seed(conn, scale, seed_value):
+    buildings = int(PFO_BUILDINGS * scale)
+    params = {
+        'seed': seed_value,
+        'municipalities': MUNICIPALITIES_PER_REGION,
+        'companies': max(buildings // BUILDINGS_PER_COMPANY, 1),
+        'buildings': buildings,
+        'streets': STREETS,
+    }
+    started = time.monotonic()
+    with conn.cursor() as cur:
+        cur.execute(SEED_SQL, params)
+    conn.commit()
+    logger.info(f"Сгенерировано {buildings} домов за {time.monotonic() - started:.1f} с")
+
+    # Агрегаты, которые обычно пересчитывает импорт
+    started = time.monotonic()
+    with conn.cursor() as cur:
+        cur.execute("SELECT refresh_building_lift_summary(NULL)")
+        cur.execute("SELECT refresh_lift_forecast_cube(NULL)")
+        cur.execute("SELECT refresh_company_summary(NULL)")
+    conn.commit()
+    logger.info(f"Сводка лифтов, куб прогноза и сводка по УК: {time.monotonic() - started:.1f} с")
+
+    finish_import(conn, 'benchmark_seed')
+
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute("VACUUM ANALYZE")
+    conn.autocommit = False
+
+
+def table_counts(conn):
+    """Размер данных - пишется в результаты бенчмарка"""
+    counts = {}
+    with conn.cursor() as cur:
+        for table in ('buildings', 'lifts', 'management_companies', 'buildings_management'):
+            cur.execute(f"SELECT COUNT(*) FROM {table}")
+            counts[table] = cur.fetchone()[0]
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Синтетическая БД для бенчмарков API')
+    parser.add_argument('--scale', type=float, default=1, help='Масштаб относительно ПФО: 1, 10, 50')
+    parser.add_argument('--database', default=BENCH_DATABASE, help='Имя БД (будет пересоздана!)')
+    parser.add_argument('--seed', type=float, default=0.42, help='seed генератора (-1..1)')
+    args = parser.parse_args()
+
+    if args.database == DB_CONFIG['database']:
+        parser.error('--database совпадает с рабочей БД из config.py')
+
+    logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+
+    recreate_database(args.database)
+    conn = psycopg2.connect(**dict(DB_CONFIG, database=args.database))
+    try:
+        apply_migrations(conn)
+        seed(conn, args.scale, args.seed)
+        logger.info(f"Готово: {table_counts(conn)}")
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+-- ============================================
+-- Миграция 003: Сводка по лифтам на уровне дома
+-- Используется /api/buildings вместо коррелированных подзапросов к lifts
+-- ============================================
+
+SET client_encoding = 'UTF8';
+
+-- ============================================
+-- 1. ТАБЛИЦА
+-- ============================================
+
+CREATE TABLE IF NOT EXISTS building_lift_summary (
+    building_id BIGINT PRIMARY KEY REFERENCES buildings(id) ON DELETE CASCADE,
+
+    lifts_count INTEGER NOT NULL,
+    nearest_replacement DATE,
+    replacement_years SMALLINT[] NOT NULL DEFAULT '{}',
+
+    refreshed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+COMMENT ON TABLE building_lift_summary IS 'Агрегаты по лифтам дома. Только дома с лифтами. Обновляется импортом КР 1.2';
+COMMENT ON COLUMN building_lift_summary.nearest_replacement IS 'MIN(lifts.decommissioning_date)';
+COMMENT ON COLUMN building_lift_summary.replacement_years IS 'Годы вывода лифтов из эксплуатации (без повторов)';
+
+-- Сортировка по количеству лифтов и по сроку замены
+CREATE INDEX IF NOT EXISTS idx_lift_summary_count ON building_lift_summary(lifts_count, building_id);
+CREATE INDEX IF NOT EXISTS idx_lift_summary_nearest ON building_lift_summary(nearest_replacement, building_id);
+-- Фильтр по годам замены: replacement_years && ARRAY[...]
+CREATE INDEX IF NOT EXISTS idx_lift_summary_years ON building_lift_summary USING gin(replacement_years);
+
+-- ============================================
+-- 2. ФУНКЦИЯ ПЕРЕСЧЕТА
+-- ============================================
+
+-- Пересчет сводки для региона (NULL = все регионы). Возвращает количество домов с лифтами
+CREATE OR REPLACE FUNCTION refresh_building_lift_summary(p_region_id INTEGER DEFAULT NULL)
+RETURNS INTEGER AS $$
+DECLARE
+    affected INTEGER;
+BEGIN
+    DELETE FROM building_lift_summary s
+    USING buildings b
+    WHERE s.building_id = b.id
+      AND (p_region_id IS NULL OR b.region_id = p_region_id);
+
+    INSERT INTO building_lift_summary (building_id, lifts_count, nearest_replacement, replacement_years)
+    SELECT
+        l.building_id,
+        COUNT(*),
+        MIN(l.decommissioning_date),
+        COALESCE(
+            ARRAY_AGG(DISTINCT EXTRACT(YEAR FROM l.decommissioning_date)::SMALLINT)
+                FILTER (WHERE l.decommissioning_date IS NOT NULL),
+            '{}'
+        )
+    FROM lifts l
+    JOIN buildings b ON b.id = l.building_id
+    WHERE p_region_id IS NULL OR b.region_id = p_region_id
+    GROUP BY l.building_id;
+
+    GET DIAGNOSTICS affected = ROW_COUNT;
+    RETURN affected;
+END;
+$$ language 'plpgsql';
+
+-- Первичное заполнение
+SELECT refresh_building_lift_summary(NULL);
+
+ANALYZE building_lift_summary;
@@ -0,0 +1,34 @@
+-- ============================================
+-- Миграция 004: Версия данных
+-- Счетчик, который увеличивают скрипты импорта после успешной загрузки.
+-- API использует его как ключ инвалидации своих кэшей
+-- ============================================
+
+SET client_encoding = 'UTF8';
+
+CREATE TABLE IF NOT EXISTS data_version (
+    id BOOLEAN PRIMARY KEY DEFAULT true CHECK (id),  -- Ровно одна строка
+    version BIGINT NOT NULL DEFAULT 1,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_by VARCHAR(50)
+);
+
+COMMENT ON TABLE data_version IS 'Глобальная версия данных, увеличивается каждым импортом';
+
+INSERT INTO data_version (id) VALUES (true) ON CONFLICT (id) DO NOTHING;
+
+-- Увеличить версию данных. p_source - имя скрипта импорта
+CREATE OR REPLACE FUNCTION bump_data_version(p_source VARCHAR DEFAULT NULL)
+RETURNS BIGINT AS $$
+DECLARE
+    new_version BIGINT;
+BEGIN
+    UPDATE data_version
+    SET version = version + 1,
+        updated_at = CURRENT_TIMESTAMP,
+        updated_by = p_source
+    RETURNING version INTO new_version;
+
+    RETURN new_version;
+END;
+$$ language 'plpgsql';
@@ -0,0 +1,54 @@
+-- ============================================
+-- Миграция 005: Снимок статистики для дашборда
+-- Обновляется скриптами импорта (scripts/post_import.py), /api/stats читает одну строку
+-- ============================================
+
+SET client_encoding = 'UTF8';
+
+-- Живой расчет: по одному проходу на таблицу вместо пяти отдельных COUNT(*)
+CREATE OR REPLACE VIEW v_dashboard_stats AS
+SELECT
+    b.buildings,
+    mc.companies,
+    mc.with_phone,
+    mc.with_email,
+    bm.linked
+FROM (SELECT COUNT(*) AS buildings FROM buildings) b,
+     (SELECT COUNT(*) AS companies,
+             COUNT(phone) AS with_phone,
+             COUNT(email) AS with_email
+      FROM management_companies) mc,
+     (SELECT COUNT(*) AS linked FROM buildings_management) bm;
+
+COMMENT ON VIEW v_dashboard_stats IS 'Статистика дашборда (живой расчет)';
+
+CREATE TABLE IF NOT EXISTS stats_snapshot (
+    id BOOLEAN PRIMARY KEY DEFAULT true CHECK (id),  -- Ровно одна строка
+    buildings BIGINT NOT NULL,
+    companies BIGINT NOT NULL,
+    with_phone BIGINT NOT NULL,
+    with_email BIGINT NOT NULL,
+    linked BIGINT NOT NULL,
+    refreshed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+COMMENT ON TABLE stats_snapshot IS 'Снимок v_dashboard_stats на момент последнего импорта';
+
+CREATE OR REPLACE FUNCTION refresh_stats_snapshot()
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO stats_snapshot (id, buildings, companies, with_phone, with_email, linked, refreshed_at)
+    SELECT true, buildings, companies, with_phone, with_email, linked, CURRENT_TIMESTAMP
+    FROM v_dashboard_stats
+    ON CONFLICT (id) DO UPDATE SET
+        buildings = EXCLUDED.buildings,
+        companies = EXCLUDED.companies,
+        with_phone = EXCLUDED.with_phone,
+        with_email = EXCLUDED.with_email,
+        linked = EXCLUDED.linked,
+        refreshed_at = EXCLUDED.refreshed_at;
+END;
+$$ language 'plpgsql';
+
+-- Первичное заполнение
+SELECT refresh_stats_snapshot();
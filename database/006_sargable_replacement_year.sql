@@ -0,0 +1,131 @@
+-- ============================================
+-- Миграция 006: Фильтр по году замены лифтов без EXTRACT по строкам
+-- Условия "год вывода <= N" переписаны как диапазоны дат, чтобы работали индексы
+-- ============================================
+
+SET client_encoding = 'UTF8';
+
+-- ============================================
+-- 1. ИНДЕКСЫ
+-- ============================================
+
+-- EXISTS/MIN/COUNT по лифтам дома читают только индекс
+CREATE INDEX IF NOT EXISTS idx_lifts_building_decommission ON lifts(building_id, decommissioning_date);
+
+-- building_id уже покрыт unique_lift (building_id, element_code) и индексом выше
+DROP INDEX IF EXISTS idx_lifts_building;
+
+-- ============================================
+-- 2. ПРЕДСТАВЛЕНИЯ
+-- ============================================
+
+-- View 1: Целевые дома для продаж
+CREATE OR REPLACE VIEW v_target_buildings AS
+SELECT
+    b.id as building_id,
+    b.address,
+    r.region_name,
+    m.name as municipality,
+    b.spec_account_owner_type,
+    b.overhaul_funds_balance,
+    b.total_ppl as residents,
+    b.commission_year,
+
+    -- Лифты
+    COUNT(l.id) as lifts_count,
+    MIN(l.decommissioning_date) as earliest_replacement_date,
+    EXTRACT(YEAR FROM MIN(l.decommissioning_date)) - EXTRACT(YEAR FROM CURRENT_DATE) as years_to_replacement,
+    ROUND(AVG(EXTRACT(YEAR FROM CURRENT_DATE) - EXTRACT(YEAR FROM l.commissioning_date))) as avg_lift_age,
+
+    -- УК
+    mc.id as company_id,
+    mc.name as management_company,
+    mc.director_name,
+    mc.phone as company_phone,
+    mc.email as company_email,
+    mc.inn as company_inn,
+
+    -- CRM данные
+    d.id as deal_id,
+    ds.name as deal_status,
+    ds.code as deal_status_code,
+    d.assigned_user_id,
+    u.full_name as assigned_user_name,
+    d.potential_amount,
+    d.probability_percent,
+
+    -- Приоритет (формула)
+    -- "замена через N лет" = MIN(дата вывода) раньше 1 января (текущий год + N + 1)
+    CASE
+        WHEN b.overhaul_funds_balance >= 5000000
+            AND MIN(l.decommissioning_date) < make_date(EXTRACT(YEAR FROM CURRENT_DATE)::int + 3, 1, 1)
+            THEN 'HIGH'
+        WHEN b.overhaul_funds_balance >= 2000000
+            AND MIN(l.decommissioning_date) < make_date(EXTRACT(YEAR FROM CURRENT_DATE)::int + 6, 1, 1)
+            THEN 'MEDIUM'
+        ELSE 'LOW'
+    END as priority,
+
+    -- Потенциал сделки
+    COUNT(l.id) * 2400000 as estimated_deal_amount
+
+FROM buildings b
+JOIN regions r ON b.region_id = r.id
+LEFT JOIN municipalities m ON b.municipality_id = m.id
+LEFT JOIN lifts l ON b.id = l.building_id
+LEFT JOIN buildings_management bm ON b.id = bm.building_id AND bm.is_active = true
+LEFT JOIN management_companies mc ON bm.company_id = mc.id
+LEFT JOIN deals d ON b.id = d.building_id
+    AND d.status_id NOT IN (
+        SELECT id FROM deal_statuses WHERE code IN ('won', 'lost')
+    )
+LEFT JOIN deal_statuses ds ON d.status_id = ds.id
+LEFT JOIN users u ON d.assigned_user_id = u.id
+
+WHERE b.spec_account_owner_type IN ('UK', 'TSJ', 'JSK')
+  AND b.overhaul_funds_balance >= 1200000
+
+GROUP BY b.id, r.region_name, m.name, mc.id, mc.name, mc.director_name,
+         mc.phone, mc.email, mc.inn, d.id, ds.name, ds.code,
+         d.assigned_user_id, u.full_name, d.potential_amount, d.probability_percent
+
+ORDER BY
+    b.overhaul_funds_balance DESC,
+    MIN(l.decommissioning_date) ASC;
+
+COMMENT ON VIEW v_target_buildings IS 'Целевые дома для продаж: спецсчета, есть деньги, есть лифты';
+
+-- View 3: Статистика по регионам
+CREATE OR REPLACE VIEW v_regional_stats AS
+SELECT
+    r.region_name,
+    r.region_code,
+
+    -- Дома
+    COUNT(DISTINCT b.id) as total_buildings,
+    COUNT(DISTINCT CASE WHEN b.spec_account_owner_type IN ('UK', 'TSJ', 'JSK') THEN b.id END) as spec_account_buildings,
+    ROUND(AVG(b.overhaul_funds_balance), 2) as avg_balance,
+    SUM(b.overhaul_funds_balance) as total_balance,
+
+    -- Лифты
+    COUNT(l.id) as total_lifts,
+    COUNT(l.id) FILTER (
+        WHERE l.decommissioning_date < make_date(EXTRACT(YEAR FROM CURRENT_DATE)::int + 6, 1, 1)
+    ) as lifts_need_replacement_5y,
+
+    -- Сделки
+    COUNT(DISTINCT d.id) as active_deals,
+    COALESCE(SUM(d.potential_amount), 0) as pipeline_amount
+
+FROM regions r
+LEFT JOIN buildings b ON r.id = b.region_id
+LEFT JOIN lifts l ON b.id = l.building_id
+LEFT JOIN deals d ON b.id = d.building_id
+    AND d.status_id NOT IN (SELECT id FROM deal_statuses WHERE code IN ('won', 'lost'))
+
+GROUP BY r.id, r.region_name, r.region_code
+ORDER BY total_buildings DESC;
+
+COMMENT ON VIEW v_regional_stats IS 'Статистика по регионам: дома, лифты, сделки';
+
+ANALYZE lifts;
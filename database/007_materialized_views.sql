@@ -0,0 +1,70 @@
+-- ============================================
+-- Миграция 007: Материализованные представления
+-- Копии v_target_buildings, v_regional_stats, v_top_management_companies.
+-- Обновляются REFRESH ... CONCURRENTLY в конце каждого импорта (scripts/post_import.py)
+-- ============================================
+
+SET client_encoding = 'UTF8';
+
+-- ============================================
+-- 1. ЦЕЛЕВЫЕ ДОМА
+-- ============================================
+
+-- Строка = дом × УК × открытая сделка. company_key/deal_key - ключ без NULL для уникального индекса
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_target_buildings AS
+SELECT
+    v.*,
+    COALESCE(v.company_id, 0) as company_key,
+    COALESCE(v.deal_id, 0) as deal_key
+FROM v_target_buildings v;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_mv_target_key
+    ON mv_target_buildings(building_id, company_key, deal_key);
+CREATE INDEX IF NOT EXISTS idx_mv_target_priority_balance
+    ON mv_target_buildings(priority, overhaul_funds_balance DESC);
+CREATE INDEX IF NOT EXISTS idx_mv_target_balance
+    ON mv_target_buildings(overhaul_funds_balance DESC);
+CREATE INDEX IF NOT EXISTS idx_mv_target_region ON mv_target_buildings(region_name);
+
+COMMENT ON MATERIALIZED VIEW mv_target_buildings IS 'Снимок v_target_buildings на момент последнего импорта';
+
+-- ============================================
+-- 2. СТАТИСТИКА ПО РЕГИОНАМ
+-- ============================================
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_regional_stats AS
+SELECT * FROM v_regional_stats;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_mv_regional_code ON mv_regional_stats(region_code);
+
+COMMENT ON MATERIALIZED VIEW mv_regional_stats IS 'Снимок v_regional_stats на момент последнего импорта';
+
+-- ============================================
+-- 3. ТОП УПРАВЛЯЮЩИХ КОМПАНИЙ
+-- ============================================
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_top_management_companies AS
+SELECT * FROM v_top_management_companies;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_mv_top_companies_id ON mv_top_management_companies(id);
+CREATE INDEX IF NOT EXISTS idx_mv_top_companies_rank
+    ON mv_top_management_companies(lifts_count DESC, total_balance_in_buildings DESC);
+
+COMMENT ON MATERIALIZED VIEW mv_top_management_companies IS 'Снимок v_top_management_companies на момент последнего импорта';
+
+-- ============================================
+-- 4. ЖУРНАЛ ОБНОВЛЕНИЙ
+-- ============================================
+
+CREATE TABLE IF NOT EXISTS mv_refresh_log (
+    id BIGSERIAL PRIMARY KEY,
+    view_name VARCHAR(100) NOT NULL,
+    source VARCHAR(50),
+    duration_ms INTEGER NOT NULL,
+    row_count BIGINT,
+    refreshed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_mv_refresh_log_view ON mv_refresh_log(view_name, refreshed_at);
+
+COMMENT ON TABLE mv_refresh_log IS 'Длительность REFRESH MATERIALIZED VIEW - чтобы видеть рост времени вместе с данными';
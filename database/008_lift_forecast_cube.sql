@@ -0,0 +1,95 @@
+-- ============================================
+-- Миграция 008: Куб прогноза замены лифтов
+-- год × регион × муниципалитет × тип счета × корзина баланса.
+-- Пересчитывается импортом КР 1.1/1.2 (scripts/import_csv.py), читается /api/forecast
+-- ============================================
+
+SET client_encoding = 'UTF8';
+
+-- Корзина баланса ФКР (границы - как в приоритетах v_target_buildings)
+--   0: меньше 1.2 млн или нет данных (не хватает на аванс)
+--   1: 1.2 - 2 млн
+--   2: 2 - 5 млн
+--   3: 5 млн и больше
+CREATE OR REPLACE FUNCTION balance_bucket(p_balance NUMERIC)
+RETURNS SMALLINT AS $$
+    SELECT (CASE
+        WHEN p_balance IS NULL OR p_balance < 1200000 THEN 0
+        WHEN p_balance < 2000000 THEN 1
+        WHEN p_balance < 5000000 THEN 2
+        ELSE 3
+    END)::SMALLINT
+$$ language 'sql' IMMUTABLE;
+
+CREATE TABLE IF NOT EXISTS lift_forecast_cube (
+    id BIGSERIAL PRIMARY KEY,
+
+    replacement_year SMALLINT NOT NULL,
+    region_id INTEGER NOT NULL REFERENCES regions(id) ON DELETE CASCADE,
+    municipality_id INTEGER REFERENCES municipalities(id) ON DELETE CASCADE,
+    account_type VARCHAR(10) NOT NULL,
+    balance_bucket SMALLINT NOT NULL,
+
+    lifts_count INTEGER NOT NULL,
+    buildings_count INTEGER NOT NULL,
+    balance_sum DECIMAL(18,2),
+
+    refreshed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+COMMENT ON TABLE lift_forecast_cube IS 'Сколько лифтов выходит из эксплуатации по годам в разрезе регионов, МО, типов счета и баланса';
+COMMENT ON COLUMN lift_forecast_cube.account_type IS 'UK/TSJ/JSK/REGOP (дома без типа счета считаются REGOP, как в /api/buildings)';
+COMMENT ON COLUMN lift_forecast_cube.buildings_count IS 'Дома с лифтами к замене в этом году. При суммировании по годам дом учитывается в каждом году';
+COMMENT ON COLUMN lift_forecast_cube.balance_sum IS 'Сумма overhaul_funds_balance этих домов';
+
+CREATE INDEX IF NOT EXISTS idx_forecast_year_region ON lift_forecast_cube(replacement_year, region_id);
+CREATE INDEX IF NOT EXISTS idx_forecast_region ON lift_forecast_cube(region_id);
+CREATE INDEX IF NOT EXISTS idx_forecast_municipality ON lift_forecast_cube(municipality_id);
+
+-- Пересчет куба для региона (NULL = все регионы). Возвращает количество ячеек
+CREATE OR REPLACE FUNCTION refresh_lift_forecast_cube(p_region_id INTEGER DEFAULT NULL)
+RETURNS INTEGER AS $$
+DECLARE
+    affected INTEGER;
+BEGIN
+    DELETE FROM lift_forecast_cube
+    WHERE p_region_id IS NULL OR region_id = p_region_id;
+
+    INSERT INTO lift_forecast_cube (
+        replacement_year, region_id, municipality_id, account_type, balance_bucket,
+        lifts_count, buildings_count, balance_sum
+    )
+    SELECT
+        bl.replacement_year,
+        b.region_id,
+        b.municipality_id,
+        COALESCE(b.spec_account_owner_type, 'REGOP'),
+        balance_bucket(b.overhaul_funds_balance),
+        SUM(bl.lifts),
+        COUNT(*),
+        SUM(b.overhaul_funds_balance)
+    FROM (
+        -- Лифты дома по году вывода
+        SELECT l.building_id,
+               EXTRACT(YEAR FROM l.decommissioning_date)::SMALLINT as replacement_year,
+               COUNT(*) as lifts
+        FROM lifts l
+        JOIN buildings b ON b.id = l.building_id
+        WHERE l.decommissioning_date IS NOT NULL
+          AND (p_region_id IS NULL OR b.region_id = p_region_id)
+        GROUP BY l.building_id, replacement_year
+    ) bl
+    JOIN buildings b ON b.id = bl.building_id
+    WHERE b.region_id IS NOT NULL
+    GROUP BY bl.replacement_year, b.region_id, b.municipality_id,
+             COALESCE(b.spec_account_owner_type, 'REGOP'), balance_bucket(b.overhaul_funds_balance);
+
+    GET DIAGNOSTICS affected = ROW_COUNT;
+    RETURN affected;
+END;
+$$ language 'plpgsql';
+
+-- Первичное заполнение
+SELECT refresh_lift_forecast_cube(NULL);
+
+ANALYZE lift_forecast_cube;
@@ -0,0 +1,30 @@
+-- ============================================
+-- Миграция 009: Индексы подсказок поиска (/api/search/suggest)
+-- Триграммы по коду МКД и по нормализованному адресу
+-- ============================================
+
+SET client_encoding = 'UTF8';
+
+-- Нормализованный адрес: нижний регистр, ё -> е, без сокращений (г., ул., д. ...) и пунктуации.
+-- "г. Москва, ул. Тверская, д. 7" -> "москва тверская 7"
+CREATE OR REPLACE FUNCTION normalize_address(p_address TEXT)
+RETURNS TEXT AS $$
+    SELECT btrim(regexp_replace(
+        regexp_replace(
+            -- Пунктуация -> пробел ("пр-кт" -> "пр кт", "р-н" -> "р н")
+            regexp_replace(translate(lower(p_address), 'ё', 'е'), '[^[:alnum:]]+', ' ', 'g'),
+            '\m(г|гор|ул|д|дом|пр|кт|просп|пер|пл|ш|б|р|н|наб|обл|респ|край|ао|пос|п|пгт|с|дер|мкр|корп|к|стр|лит|кв)\M', ' ', 'g'
+        ),
+        ' +', ' ', 'g'
+    ))
+$$ language 'sql' IMMUTABLE;
+
+-- GiST поддерживает ORDER BY ... <<-> ... LIMIT N (ближайшие по триграммам) без сортировки всей выборки
+CREATE INDEX IF NOT EXISTS idx_buildings_address_norm_trgm
+    ON buildings USING gist (normalize_address(address) gist_trgm_ops);
+
+-- Код МКД: LIKE/ILIKE по подстроке (в т.ч. search в /api/buildings)
+CREATE INDEX IF NOT EXISTS idx_buildings_mkd_code_trgm
+    ON buildings USING gin (mkd_code gin_trgm_ops);
+
+ANALYZE buildings;
@@ -0,0 +1,104 @@
+-- ============================================
+-- Миграция 010: Сводка по управляющим компаниям
+-- Используется /api/companies и /api/companies/<id> вместо
+-- LEFT JOIN buildings_management + GROUP BY по всем компаниям на каждой странице
+-- ============================================
+
+SET client_encoding = 'UTF8';
+
+-- ============================================
+-- 1. ТАБЛИЦА
+-- ============================================
+
+CREATE TABLE IF NOT EXISTS company_summary (
+    company_id BIGINT PRIMARY KEY REFERENCES management_companies(id) ON DELETE CASCADE,
+
+    buildings_count INTEGER NOT NULL DEFAULT 0,
+    lifts_count INTEGER NOT NULL DEFAULT 0,
+    spec_account_balance DECIMAL(18,2) NOT NULL DEFAULT 0,
+
+    refreshed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+COMMENT ON TABLE company_summary IS 'Агрегаты по УК. Строка есть у каждой компании. Обновляется привязкой ОЖФ (import_ojf.py) и импортом КР 1.2';
+COMMENT ON COLUMN company_summary.buildings_count IS 'Все связи компании в buildings_management, как прежний COUNT(bm.building_id) в /api/companies';
+COMMENT ON COLUMN company_summary.lifts_count IS 'SUM(building_lift_summary.lifts_count) по домам с активной связью (без повторов)';
+COMMENT ON COLUMN company_summary.spec_account_balance IS 'Сумма overhaul_funds_balance домов на спецсчете (UK/TSJ/JSK)';
+
+-- Сортировка списка по умолчанию и keyset-курсор: (buildings_count, company_id) DESC
+CREATE INDEX IF NOT EXISTS idx_company_summary_buildings ON company_summary(buildings_count DESC, company_id DESC);
+
+-- ============================================
+-- 2. ФУНКЦИЯ ПЕРЕСЧЕТА
+-- ============================================
+
+-- Пересчет сводки для компаний (NULL = все компании). Возвращает количество строк
+CREATE OR REPLACE FUNCTION refresh_company_summary(p_company_ids BIGINT[] DEFAULT NULL)
+RETURNS INTEGER AS $$
+DECLARE
+    affected INTEGER;
+BEGIN
+    INSERT INTO company_summary (company_id, buildings_count, lifts_count, spec_account_balance, refreshed_at)
+    SELECT
+        mc.id,
+        COALESCE(MAX(l.links_count), 0),
+        COALESCE(SUM(ls.lifts_count), 0),
+        COALESCE(SUM(b.overhaul_funds_balance) FILTER (WHERE b.spec_account_owner_type IN ('UK', 'TSJ', 'JSK')), 0),
+        CURRENT_TIMESTAMP
+    FROM management_companies mc
+    -- buildings_count: все строки buildings_management, включая неактивные и повторные
+    LEFT JOIN (
+        SELECT company_id, COUNT(*) as links_count
+        FROM buildings_management
+        WHERE p_company_ids IS NULL OR company_id = ANY(p_company_ids)
+        GROUP BY company_id
+    ) l ON l.company_id = mc.id
+    -- Лифты и баланс: каждый дом с активной связью один раз
+    LEFT JOIN (
+        SELECT DISTINCT company_id, building_id
+        FROM buildings_management
+        WHERE is_active = true
+          AND (p_company_ids IS NULL OR company_id = ANY(p_company_ids))
+    ) bm ON bm.company_id = mc.id
+    LEFT JOIN buildings b ON b.id = bm.building_id
+    LEFT JOIN building_lift_summary ls ON ls.building_id = b.id
+    WHERE p_company_ids IS NULL OR mc.id = ANY(p_company_ids)
+    GROUP BY mc.id
+    ON CONFLICT (company_id) DO UPDATE SET
+        buildings_count = EXCLUDED.buildings_count,
+        lifts_count = EXCLUDED.lifts_count,
+        spec_account_balance = EXCLUDED.spec_account_balance,
+        refreshed_at = EXCLUDED.refreshed_at;
+
+    GET DIAGNOSTICS affected = ROW_COUNT;
+    RETURN affected;
+END;
+$$ language 'plpgsql';
+
+-- Компании домов региона - для пересчета после импорта КР 1.2 (лифты и баланс)
+CREATE OR REPLACE FUNCTION region_company_ids(p_region_id INTEGER)
+RETURNS BIGINT[] AS $$
+    SELECT COALESCE(ARRAY_AGG(DISTINCT bm.company_id), '{}')
+    FROM buildings_management bm
+    JOIN buildings b ON b.id = bm.building_id
+    WHERE b.region_id = p_region_id AND bm.company_id IS NOT NULL
+$$ language 'sql' STABLE;
+
+-- Новая компания сразу попадает в список (с нулями) до ближайшего пересчета
+CREATE OR REPLACE FUNCTION company_summary_on_insert()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO company_summary (company_id) VALUES (NEW.id) ON CONFLICT DO NOTHING;
+    RETURN NEW;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS trg_company_summary_insert ON management_companies;
+CREATE TRIGGER trg_company_summary_insert
+    AFTER INSERT ON management_companies
+    FOR EACH ROW EXECUTE FUNCTION company_summary_on_insert();
+
+-- Первичное заполнение
+SELECT refresh_company_summary(NULL);
+
+ANALYZE company_summary;
@@ -0,0 +1,43 @@
+-- ============================================
+-- Миграция 011: Составные и частичные индексы под запросы /api/buildings
+-- Каждый индекс - под конкретную форму фильтра (backend/queries.py).
+-- Используются ли они и сколько занимают - benchmarks/indexes.py
+-- ============================================
+
+SET client_encoding = 'UTF8';
+
+-- ============================================
+-- 1. СПИСОК ДОМОВ: СОРТИРОВКА ПО БАЛАНСУ
+-- ============================================
+
+-- ORDER BY overhaul_funds_balance DESC NULLS LAST, id DESC LIMIT N - сортировка по умолчанию.
+-- idx_buildings_balance (ASC NULLS LAST) при обратном проходе дает NULLS FIRST и не годится
+CREATE INDEX IF NOT EXISTS idx_buildings_balance_desc
+    ON buildings(overhaul_funds_balance DESC NULLS LAST, id DESC);
+
+-- То же для фильтра account_type=SPEC (фронтенд по умолчанию): только дома на спецсчетах.
+-- COUNT по этому фильтру - index only scan
+CREATE INDEX IF NOT EXISTS idx_buildings_spec_balance
+    ON buildings(overhaul_funds_balance DESC NULLS LAST, id DESC)
+    WHERE spec_account_owner_type IN ('UK', 'TSJ', 'JSK');
+
+-- Регион (region_id) + спецсчет + сортировка по балансу
+CREATE INDEX IF NOT EXISTS idx_buildings_region_spec_balance
+    ON buildings(region_id, overhaul_funds_balance DESC NULLS LAST, id DESC)
+    WHERE spec_account_owner_type IN ('UK', 'TSJ', 'JSK');
+
+-- Фильтр min_balance по спецсчетам покрывают те же индексы (диапазон по первой колонке)
+
+-- ============================================
+-- 2. СВЯЗЬ ДОМ-УК
+-- ============================================
+
+-- LEFT JOIN buildings_management bm ON b.id = bm.building_id -> management_companies:
+-- company_id берется из индекса без чтения таблицы
+CREATE INDEX IF NOT EXISTS idx_bm_building_company ON buildings_management(building_id, company_id);
+
+-- Перекрывается idx_bm_building_company (та же первая колонка)
+DROP INDEX IF EXISTS idx_bm_building;
+
+ANALYZE buildings;
+ANALYZE buildings_management;
@@ -0,0 +1,70 @@
+-- ============================================
+-- Миграция 012: Естественные ключи construction_elements и services
+-- Без уникального ключа INSERT ... ON CONFLICT DO NOTHING в import_csv.py
+-- никогда не срабатывал, и каждый повторный импорт без --clean дублировал строки.
+-- Ключи:
+--   construction_elements: (building_id, element_code), только для строк с кодом
+--   services:              (building_id, service_code, work_code)
+-- Элементы без кода (NULL) ключа не имеют: у дома их может быть несколько разных,
+-- поэтому они не дедуплицируются и не входят в уникальный индекс. Импорт КР 1.2
+-- заменяет их целиком - удаляет элементы без кода домов региона и вставляет заново.
+-- Пустые коды услуг импорт пишет как NULL, а UNIQUE считает NULL разными значениями
+-- (NULLS NOT DISTINCT есть только с PostgreSQL 15) - поэтому индекс услуг по COALESCE(..., '').
+-- import_csv.py делает upsert с тем же выражением в ON CONFLICT
+-- ============================================
+
+SET client_encoding = 'UTF8';
+
+-- ============================================
+-- 1. РАЗОВАЯ ОЧИСТКА ДУБЛЕЙ
+-- Из дублей остается последняя загруженная строка (максимальный id).
+-- Элементы без кода не трогаем: различить дубль и другой элемент нельзя
+-- ============================================
+
+DELETE FROM construction_elements
+WHERE id IN (
+    SELECT id FROM (
+        SELECT id, ROW_NUMBER() OVER (
+            PARTITION BY building_id, element_code
+            ORDER BY id DESC
+        ) as rn
+        FROM construction_elements
+        WHERE element_code IS NOT NULL
+    ) d
+    WHERE d.rn > 1
+);
+
+DELETE FROM services
+WHERE id IN (
+    SELECT id FROM (
+        SELECT id, ROW_NUMBER() OVER (
+            PARTITION BY building_id, COALESCE(service_code, ''), COALESCE(work_code, '')
+            ORDER BY id DESC
+        ) as rn
+        FROM services
+    ) d
+    WHERE d.rn > 1
+);
+
+-- ============================================
+-- 2. УНИКАЛЬНЫЕ КЛЮЧИ
+-- ============================================
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_elements_building_element_code
+    ON construction_elements(building_id, element_code)
+    WHERE element_code IS NOT NULL;
+
+-- Поиск и удаление элементов без кода по дому (замена при импорте КР 1.2)
+CREATE INDEX IF NOT EXISTS idx_elements_building_no_code
+    ON construction_elements(building_id)
+    WHERE element_code IS NULL;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_services_building_service_work
+    ON services(building_id, (COALESCE(service_code, '')), (COALESCE(work_code, '')));
+
+-- Поиск по дому покрывают уникальные индексы (building_id - первая колонка) и idx_elements_building_no_code
+DROP INDEX IF EXISTS idx_elements_building;
+DROP INDEX IF EXISTS idx_services_building;
+
+ANALYZE construction_elements;
+ANALYZE services;
@@ -0,0 +1,203 @@
+-- ============================================
+-- Миграция 013: Помесячное секционирование audit_log и activities
+-- Обе таблицы только дописываются (каждое действие в CRM) и читаются по времени.
+-- Секция - месяц по created_at / activity_date; новые секции создаются заранее
+-- (ensure_monthly_partitions), старые отсоединяются и выгружаются в архив
+-- скриптом scripts/maintain_partitions.py
+-- ============================================
+
+SET client_encoding = 'UTF8';
+
+-- Переименование, перенос данных и удаление старых таблиц - одной транзакцией:
+-- при ошибке на любом шаге схема остается прежней
+BEGIN;
+
+-- ============================================
+-- 1. ФУНКЦИИ ОБСЛУЖИВАНИЯ СЕКЦИЙ
+-- ============================================
+
+-- Секции <таблица>_yYYYYmMM для месяцев с p_from по p_to включительно.
+-- Возвращает количество созданных секций
+CREATE OR REPLACE FUNCTION ensure_monthly_partitions(p_table TEXT, p_from DATE, p_to DATE)
+RETURNS INTEGER AS $$
+DECLARE
+    month_start DATE;
+    partition_name TEXT;
+    created INTEGER := 0;
+BEGIN
+    FOR month_start IN
+        SELECT generate_series(date_trunc('month', p_from), date_trunc('month', p_to), interval '1 month')::DATE
+    LOOP
+        partition_name := format('%s_y%sm%s', p_table, to_char(month_start, 'YYYY'), to_char(month_start, 'MM'));
+
+        IF to_regclass(partition_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                partition_name, p_table, month_start, (month_start + interval '1 month')::DATE
+            );
+            created := created + 1;
+        END IF;
+    END LOOP;
+    RETURN created;
+END;
+$$ language 'plpgsql';
+
+-- Помесячные секции таблицы, целиком лежащие раньше p_before (кандидаты в архив)
+CREATE OR REPLACE FUNCTION monthly_partitions_before(p_table TEXT, p_before DATE)
+RETURNS TABLE (partition_name TEXT, range_start DATE, range_end DATE) AS $$
+    SELECT c.relname::TEXT,
+           to_date(substring(c.relname from '_y(\d{4}m\d{2})$'), 'YYYY"m"MM'),
+           (to_date(substring(c.relname from '_y(\d{4}m\d{2})$'), 'YYYY"m"MM') + interval '1 month')::DATE
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = p_table::regclass
+      AND c.relname ~ '_y\d{4}m\d{2}$'
+      AND to_date(substring(c.relname from '_y(\d{4}m\d{2})$'), 'YYYY"m"MM') + interval '1 month' <= p_before
+    ORDER BY 2
+$$ language 'sql' STABLE;
+
+-- ============================================
+-- 2. AUDIT_LOG
+-- ============================================
+
+ALTER TABLE audit_log RENAME TO audit_log_unpartitioned;
+ALTER TABLE audit_log_unpartitioned RENAME CONSTRAINT audit_log_pkey TO audit_log_unpartitioned_pkey;
+ALTER SEQUENCE audit_log_id_seq RENAME TO audit_log_unpartitioned_id_seq;
+ALTER INDEX IF EXISTS idx_audit_user RENAME TO idx_audit_user_unpartitioned;
+ALTER INDEX IF EXISTS idx_audit_entity RENAME TO idx_audit_entity_unpartitioned;
+ALTER INDEX IF EXISTS idx_audit_created RENAME TO idx_audit_created_unpartitioned;
+
+CREATE TABLE audit_log (
+    id BIGSERIAL,
+
+    user_id INTEGER REFERENCES users(id),
+
+    -- Действие
+    action VARCHAR(50) NOT NULL,
+    entity_type VARCHAR(50),
+    entity_id BIGINT,
+
+    -- Изменения
+    old_values JSONB,
+    new_values JSONB,
+
+    -- Контекст
+    ip_address INET,
+    user_agent TEXT,
+
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    -- Ключ секционирования входит в первичный ключ
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+COMMENT ON TABLE audit_log IS 'Журнал аудита, секции по месяцам created_at. Пишется пакетами (backend/audit.py)';
+
+CREATE INDEX idx_audit_user ON audit_log(user_id);
+CREATE INDEX idx_audit_entity ON audit_log(entity_type, entity_id);
+CREATE INDEX idx_audit_created ON audit_log(created_at);
+
+-- Строки вне созданных секций (часы сервера, старые даты) не теряются
+CREATE TABLE audit_log_default PARTITION OF audit_log DEFAULT;
+
+-- ============================================
+-- 3. ACTIVITIES
+-- ============================================
+
+ALTER TABLE activities RENAME TO activities_unpartitioned;
+ALTER TABLE activities_unpartitioned RENAME CONSTRAINT activities_pkey TO activities_unpartitioned_pkey;
+ALTER SEQUENCE activities_id_seq RENAME TO activities_unpartitioned_id_seq;
+ALTER INDEX IF EXISTS idx_activities_deal RENAME TO idx_activities_deal_unpartitioned;
+ALTER INDEX IF EXISTS idx_activities_contact RENAME TO idx_activities_contact_unpartitioned;
+ALTER INDEX IF EXISTS idx_activities_user RENAME TO idx_activities_user_unpartitioned;
+ALTER INDEX IF EXISTS idx_activities_date RENAME TO idx_activities_date_unpartitioned;
+ALTER INDEX IF EXISTS idx_activities_next_action RENAME TO idx_activities_next_action_unpartitioned;
+
+CREATE TABLE activities (
+    id BIGSERIAL,
+
+    deal_id BIGINT REFERENCES deals(id) ON DELETE CASCADE,
+    contact_id BIGINT REFERENCES contacts(id),
+
+    -- Тип активности
+    activity_type VARCHAR(50) NOT NULL,
+    subject VARCHAR(500),
+    description TEXT,
+
+    -- Результат
+    outcome VARCHAR(100),
+    next_action TEXT,
+    next_action_date DATE,
+
+    -- Время
+    activity_date TIMESTAMP NOT NULL,
+    duration_minutes INTEGER,
+
+    -- Ответственный
+    user_id INTEGER REFERENCES users(id),
+
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    PRIMARY KEY (id, activity_date)
+) PARTITION BY RANGE (activity_date);
+
+COMMENT ON TABLE activities IS 'История взаимодействий, секции по месяцам activity_date';
+COMMENT ON COLUMN activities.activity_type IS 'call, email, meeting, presentation, offer_sent';
+
+CREATE INDEX idx_activities_deal ON activities(deal_id);
+CREATE INDEX idx_activities_contact ON activities(contact_id);
+CREATE INDEX idx_activities_user ON activities(user_id);
+CREATE INDEX idx_activities_date ON activities(activity_date);
+CREATE INDEX idx_activities_next_action ON activities(next_action_date)
+    WHERE next_action_date IS NOT NULL;
+
+CREATE TABLE activities_default PARTITION OF activities DEFAULT;
+
+-- ============================================
+-- 4. СЕКЦИИ И ПЕРЕНОС ДАННЫХ
+-- ============================================
+
+-- Секции от самой старой строки (но не дальше 5 лет назад - более старое ляжет в DEFAULT)
+-- до 3 месяцев вперед; дальше их создает maintain_partitions.py
+SELECT ensure_monthly_partitions(
+    'audit_log',
+    GREATEST(
+        COALESCE((SELECT MIN(created_at)::DATE FROM audit_log_unpartitioned), CURRENT_DATE),
+        (CURRENT_DATE - interval '5 years')::DATE
+    ),
+    (CURRENT_DATE + interval '3 months')::DATE
+);
+
+SELECT ensure_monthly_partitions(
+    'activities',
+    GREATEST(
+        COALESCE((SELECT MIN(activity_date)::DATE FROM activities_unpartitioned), CURRENT_DATE),
+        (CURRENT_DATE - interval '5 years')::DATE
+    ),
+    (CURRENT_DATE + interval '3 months')::DATE
+);
+
+INSERT INTO audit_log (id, user_id, action, entity_type, entity_id, old_values, new_values, ip_address, user_agent, created_at)
+SELECT id, user_id, action, entity_type, entity_id, old_values, new_values, ip_address, user_agent,
+       COALESCE(created_at, CURRENT_TIMESTAMP)
+FROM audit_log_unpartitioned;
+
+INSERT INTO activities (
+    id, deal_id, contact_id, activity_type, subject, description, outcome,
+    next_action, next_action_date, activity_date, duration_minutes, user_id, created_at
+)
+SELECT id, deal_id, contact_id, activity_type, subject, description, outcome,
+       next_action, next_action_date, activity_date, duration_minutes, user_id, created_at
+FROM activities_unpartitioned;
+
+-- Последовательности продолжают нумерацию старых таблиц
+SELECT setval(pg_get_serial_sequence('audit_log', 'id'), COALESCE((SELECT MAX(id) FROM audit_log), 0) + 1, false);
+SELECT setval(pg_get_serial_sequence('activities', 'id'), COALESCE((SELECT MAX(id) FROM activities), 0) + 1, false);
+
+DROP TABLE audit_log_unpartitioned;
+DROP TABLE activities_unpartitioned;
+
+ANALYZE audit_log;
+ANALYZE activities;
+
+COMMIT;
@@ -0,0 +1,162 @@
+-- ============================================
+-- Миграция 014: Сводка воронки продаж по статусам
+-- Канбан CRM (/api/deals/pipeline) перерисовывается после каждого перемещения
+-- карточки; v_sales_pipeline агрегирует все сделки на каждый запрос.
+-- deal_pipeline_summary хранит по строке на статус и обновляется триггером
+-- на deals: каждая вставка/изменение/удаление сделки сдвигает счетчики
+-- только старого и нового статуса
+-- ============================================
+
+SET client_encoding = 'UTF8';
+
+-- ============================================
+-- 1. ТАБЛИЦА
+-- ============================================
+
+CREATE TABLE IF NOT EXISTS deal_pipeline_summary (
+    status_id INTEGER PRIMARY KEY REFERENCES deal_statuses(id) ON DELETE CASCADE,
+
+    deals_count INTEGER NOT NULL DEFAULT 0,
+    total_amount DECIMAL(18,2) NOT NULL DEFAULT 0,
+
+    -- AVG(probability_percent) = probability_sum / probability_count (NULL не учитываются, как в AVG)
+    probability_sum BIGINT NOT NULL DEFAULT 0,
+    probability_count INTEGER NOT NULL DEFAULT 0,
+
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+COMMENT ON TABLE deal_pipeline_summary IS 'Воронка продаж: агрегаты сделок по статусу. Поддерживается триггером на deals';
+
+-- Менеджеры на этапе (колонка managers в v_sales_pipeline): сделок статуса у каждого ответственного
+CREATE TABLE IF NOT EXISTS deal_pipeline_managers (
+    status_id INTEGER NOT NULL REFERENCES deal_statuses(id) ON DELETE CASCADE,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    deals_count INTEGER NOT NULL DEFAULT 0,
+
+    PRIMARY KEY (status_id, user_id)
+);
+
+COMMENT ON TABLE deal_pipeline_managers IS 'Сделки по статусу и ответственному менеджеру. Поддерживается триггером на deals';
+
+-- ============================================
+-- 2. ИНКРЕМЕНТАЛЬНОЕ ОБНОВЛЕНИЕ
+-- ============================================
+
+-- Добавить (p_sign = 1) или убрать (p_sign = -1) вклад одной сделки
+CREATE OR REPLACE FUNCTION deal_pipeline_apply(
+    p_status_id INTEGER, p_amount DECIMAL, p_probability INTEGER, p_user_id INTEGER, p_sign INTEGER
+)
+RETURNS VOID AS $$
+BEGIN
+    IF p_status_id IS NULL THEN
+        RETURN;  -- Сделки без статуса в воронку не попадают (как и в v_sales_pipeline)
+    END IF;
+
+    INSERT INTO deal_pipeline_summary AS s (
+        status_id, deals_count, total_amount, probability_sum, probability_count, updated_at
+    ) VALUES (
+        p_status_id, p_sign, p_sign * COALESCE(p_amount, 0),
+        p_sign * COALESCE(p_probability, 0), CASE WHEN p_probability IS NULL THEN 0 ELSE p_sign END,
+        CURRENT_TIMESTAMP
+    )
+    ON CONFLICT (status_id) DO UPDATE SET
+        deals_count = s.deals_count + EXCLUDED.deals_count,
+        total_amount = s.total_amount + EXCLUDED.total_amount,
+        probability_sum = s.probability_sum + EXCLUDED.probability_sum,
+        probability_count = s.probability_count + EXCLUDED.probability_count,
+        updated_at = EXCLUDED.updated_at;
+
+    IF p_user_id IS NOT NULL THEN
+        INSERT INTO deal_pipeline_managers AS m (status_id, user_id, deals_count)
+        VALUES (p_status_id, p_user_id, p_sign)
+        ON CONFLICT (status_id, user_id) DO UPDATE SET
+            deals_count = m.deals_count + EXCLUDED.deals_count;
+    END IF;
+END;
+$$ language 'plpgsql';
+
+CREATE OR REPLACE FUNCTION deal_pipeline_on_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM deal_pipeline_apply(OLD.status_id, OLD.potential_amount, OLD.probability_percent, OLD.assigned_user_id, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM deal_pipeline_apply(NEW.status_id, NEW.potential_amount, NEW.probability_percent, NEW.assigned_user_id, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS deal_pipeline_insert_delete ON deals;
+CREATE TRIGGER deal_pipeline_insert_delete AFTER INSERT OR DELETE ON deals
+    FOR EACH ROW EXECUTE FUNCTION deal_pipeline_on_change();
+
+-- Правка заметок или дат воронку не трогает (смена ответственного - трогает: колонка managers)
+DROP TRIGGER IF EXISTS deal_pipeline_update ON deals;
+CREATE TRIGGER deal_pipeline_update AFTER UPDATE ON deals
+    FOR EACH ROW
+    WHEN (OLD.status_id IS DISTINCT FROM NEW.status_id
+          OR OLD.potential_amount IS DISTINCT FROM NEW.potential_amount
+          OR OLD.probability_percent IS DISTINCT FROM NEW.probability_percent
+          OR OLD.assigned_user_id IS DISTINCT FROM NEW.assigned_user_id)
+    EXECUTE FUNCTION deal_pipeline_on_change();
+
+-- ============================================
+-- 3. ПОЛНЫЙ ПЕРЕСЧЕТ
+-- На случай массовых правок с отключенными триггерами; заодно первичное заполнение
+-- ============================================
+
+CREATE OR REPLACE FUNCTION refresh_deal_pipeline_summary()
+RETURNS INTEGER AS $$
+DECLARE
+    affected INTEGER;
+BEGIN
+    -- Сериализуется с триггером: сделки не меняются, пока идет пересчет
+    LOCK TABLE deals IN SHARE MODE;
+
+    INSERT INTO deal_pipeline_summary (
+        status_id, deals_count, total_amount, probability_sum, probability_count, updated_at
+    )
+    SELECT
+        ds.id,
+        COUNT(d.id),
+        COALESCE(SUM(d.potential_amount), 0),
+        COALESCE(SUM(d.probability_percent), 0),
+        COUNT(d.probability_percent),
+        CURRENT_TIMESTAMP
+    FROM deal_statuses ds
+    LEFT JOIN deals d ON d.status_id = ds.id
+    GROUP BY ds.id
+    ON CONFLICT (status_id) DO UPDATE SET
+        deals_count = EXCLUDED.deals_count,
+        total_amount = EXCLUDED.total_amount,
+        probability_sum = EXCLUDED.probability_sum,
+        probability_count = EXCLUDED.probability_count,
+        updated_at = EXCLUDED.updated_at;
+
+    GET DIAGNOSTICS affected = ROW_COUNT;
+
+    DELETE FROM deal_pipeline_managers;
+    INSERT INTO deal_pipeline_managers (status_id, user_id, deals_count)
+    SELECT status_id, assigned_user_id, COUNT(*)
+    FROM deals
+    WHERE status_id IS NOT NULL AND assigned_user_id IS NOT NULL
+    GROUP BY status_id, assigned_user_id;
+
+    RETURN affected;
+END;
+$$ language 'plpgsql';
+
+SELECT refresh_deal_pipeline_summary();
+
+-- ============================================
+-- 4. ИНДЕКСЫ ДЛЯ СПИСКА СДЕЛОК
+-- Колонка канбана: сделки статуса, новые сверху (keyset по id)
+-- ============================================
+
+CREATE INDEX IF NOT EXISTS idx_deals_status_id ON deals(status_id, id DESC);
+DROP INDEX IF EXISTS idx_deals_status;
+
+ANALYZE deals;
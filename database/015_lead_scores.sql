@@ -0,0 +1,261 @@
+-- ============================================
+-- Миграция 015: Скоринг лидов
+-- Приоритет HIGH/MEDIUM/LOW в v_target_buildings считался на каждый запрос
+-- вложенными агрегатами по lifts. Теперь у каждого дома есть числовой балл
+-- 0-100 (building_scores), который пересчитывается одним проходом
+-- refresh_building_scores() после каждого импорта (scripts/score_leads.py).
+-- Веса - параметр функции: пересчет с другими весами не требует миграции
+-- ============================================
+
+SET client_encoding = 'UTF8';
+
+-- ============================================
+-- 1. ТАБЛИЦЫ
+-- ============================================
+
+CREATE TABLE IF NOT EXISTS building_scores (
+    building_id BIGINT PRIMARY KEY REFERENCES buildings(id) ON DELETE CASCADE,
+
+    score DECIMAL(5,2) NOT NULL,
+
+    -- Составляющие балла, 0..1 (до умножения на веса)
+    balance_score REAL NOT NULL,
+    replacement_score REAL NOT NULL,
+    lifts_score REAL NOT NULL,
+    age_score REAL NOT NULL,
+    contact_score REAL NOT NULL,
+
+    -- Признаки, из которых они получены
+    years_to_replacement INTEGER,
+    avg_lift_age INTEGER,
+
+    scored_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+COMMENT ON TABLE building_scores IS 'Балл лида по дому. Пересчитывается после каждого импорта (scripts/score_leads.py)';
+COMMENT ON COLUMN building_scores.score IS '100 * взвешенное среднее составляющих; 0 у домов без лифтов';
+
+-- Сортировка /api/buildings?sort_by=score и keyset-курсор: ORDER BY score DESC NULLS LAST, id DESC.
+-- Список по баллу идет от building_scores (JOIN, не LEFT JOIN - backend/queries.py score_join).
+-- NULLS LAST как в запросе: по умолчанию DESC дает NULLS FIRST, и индекс не подошел бы
+CREATE INDEX IF NOT EXISTS idx_building_scores_score ON building_scores(score DESC NULLS LAST, building_id DESC);
+
+CREATE TABLE IF NOT EXISTS lead_score_runs (
+    id BIGSERIAL PRIMARY KEY,
+    source VARCHAR(50),
+    weights JSONB NOT NULL,
+    duration_ms INTEGER NOT NULL,
+    row_count BIGINT,
+    scored_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+COMMENT ON TABLE lead_score_runs IS 'Прогоны скоринга: с какими весами и сколько длились';
+
+-- ============================================
+-- 2. ФУНКЦИЯ ПЕРЕСЧЕТА
+-- ============================================
+
+-- Составляющие:
+--   balance     - баланс спецсчета (UK/TSJ/JSK), 5 млн и больше = 1; у регоператора 0
+--   replacement - год ближайшего вывода лифта: в этом году или раньше = 1, через 10 лет и позже = 0
+--   lifts       - количество лифтов, 4 и больше = 1
+--   age         - средний возраст лифтов, 25 лет и больше = 1
+--   contact     - у УК есть телефон (0.5) и email (0.5)
+-- p_weights: {"balance": 0.35, "replacement": 0.3, ...}; отсутствующий ключ = вес 0.
+-- Строки, где ничего не изменилось, не перезаписываются. Возвращает количество домов
+CREATE OR REPLACE FUNCTION refresh_building_scores(p_weights JSONB)
+RETURNS INTEGER AS $$
+DECLARE
+    w_balance REAL := COALESCE((p_weights->>'balance')::REAL, 0);
+    w_replacement REAL := COALESCE((p_weights->>'replacement')::REAL, 0);
+    w_lifts REAL := COALESCE((p_weights->>'lifts')::REAL, 0);
+    w_age REAL := COALESCE((p_weights->>'age')::REAL, 0);
+    w_contact REAL := COALESCE((p_weights->>'contact')::REAL, 0);
+    w_total REAL;
+    current_year INTEGER := EXTRACT(YEAR FROM CURRENT_DATE)::INTEGER;
+    affected INTEGER;
+BEGIN
+    w_total := w_balance + w_replacement + w_lifts + w_age + w_contact;
+    IF LEAST(w_balance, w_replacement, w_lifts, w_age, w_contact) < 0 OR w_total <= 0 THEN
+        RAISE EXCEPTION 'Lead score weights must be non-negative with a positive sum: %', p_weights;
+    END IF;
+
+    INSERT INTO building_scores AS s (
+        building_id, score,
+        balance_score, replacement_score, lifts_score, age_score, contact_score,
+        years_to_replacement, avg_lift_age, scored_at
+    )
+    SELECT
+        f.building_id,
+        CASE WHEN f.lifts_count = 0 THEN 0 ELSE ROUND((100 * (
+            w_balance * f.balance_score + w_replacement * f.replacement_score + w_lifts * f.lifts_score
+            + w_age * f.age_score + w_contact * f.contact_score
+        ) / w_total)::NUMERIC, 2) END,
+        f.balance_score, f.replacement_score, f.lifts_score, f.age_score, f.contact_score,
+        f.years_to_replacement, f.avg_lift_age, CURRENT_TIMESTAMP
+    FROM (
+        SELECT
+            b.id as building_id,
+            COALESCE(ls.lifts_count, 0) as lifts_count,
+            CASE WHEN b.spec_account_owner_type IN ('UK', 'TSJ', 'JSK')
+                 THEN LEAST(GREATEST(COALESCE(b.overhaul_funds_balance, 0), 0) / 5000000.0, 1)
+                 ELSE 0 END::REAL as balance_score,
+            COALESCE(LEAST(GREATEST(1 - (EXTRACT(YEAR FROM ls.nearest_replacement) - current_year) / 10.0, 0), 1), 0)::REAL
+                as replacement_score,
+            LEAST(COALESCE(ls.lifts_count, 0) / 4.0, 1)::REAL as lifts_score,
+            LEAST(COALESCE(la.avg_age, 0) / 25.0, 1)::REAL as age_score,
+            COALESCE(c.contact, 0)::REAL as contact_score,
+            (EXTRACT(YEAR FROM ls.nearest_replacement) - current_year)::INTEGER as years_to_replacement,
+            ROUND(la.avg_age)::INTEGER as avg_lift_age
+        FROM buildings b
+        LEFT JOIN building_lift_summary ls ON ls.building_id = b.id
+        LEFT JOIN (
+            SELECT building_id, AVG(current_year - EXTRACT(YEAR FROM commissioning_date)) as avg_age
+            FROM lifts
+            WHERE commissioning_date IS NOT NULL
+            GROUP BY building_id
+        ) la ON la.building_id = b.id
+        LEFT JOIN (
+            SELECT bm.building_id,
+                   MAX(0.5 * (NULLIF(mc.phone, '') IS NOT NULL)::INTEGER
+                       + 0.5 * (NULLIF(mc.email, '') IS NOT NULL)::INTEGER) as contact
+            FROM buildings_management bm
+            JOIN management_companies mc ON mc.id = bm.company_id
+            WHERE bm.is_active = true
+            GROUP BY bm.building_id
+        ) c ON c.building_id = b.id
+    ) f
+    ON CONFLICT (building_id) DO UPDATE SET
+        score = EXCLUDED.score,
+        balance_score = EXCLUDED.balance_score,
+        replacement_score = EXCLUDED.replacement_score,
+        lifts_score = EXCLUDED.lifts_score,
+        age_score = EXCLUDED.age_score,
+        contact_score = EXCLUDED.contact_score,
+        years_to_replacement = EXCLUDED.years_to_replacement,
+        avg_lift_age = EXCLUDED.avg_lift_age,
+        scored_at = EXCLUDED.scored_at
+    WHERE (s.score, s.balance_score, s.replacement_score, s.lifts_score, s.age_score, s.contact_score,
+           s.years_to_replacement, s.avg_lift_age)
+        IS DISTINCT FROM
+          (EXCLUDED.score, EXCLUDED.balance_score, EXCLUDED.replacement_score, EXCLUDED.lifts_score,
+           EXCLUDED.age_score, EXCLUDED.contact_score, EXCLUDED.years_to_replacement, EXCLUDED.avg_lift_age);
+
+    GET DIAGNOSTICS affected = ROW_COUNT;
+    RETURN affected;
+END;
+$$ language 'plpgsql';
+
+-- Приоритет для v_target_buildings и /api/targets
+CREATE OR REPLACE FUNCTION lead_priority(p_score DECIMAL)
+RETURNS TEXT AS $$
+    SELECT CASE
+        WHEN p_score >= 60 THEN 'HIGH'
+        WHEN p_score >= 35 THEN 'MEDIUM'
+        ELSE 'LOW'
+    END
+$$ language 'sql' IMMUTABLE;
+
+-- Первичный расчет с весами по умолчанию (как LEAD_SCORE_WEIGHTS в scripts/config.py)
+SELECT refresh_building_scores('{"balance": 0.35, "replacement": 0.30, "lifts": 0.15, "age": 0.10, "contact": 0.10}');
+
+-- ============================================
+-- 3. ЦЕЛЕВЫЕ ДОМА ПО БАЛЛУ
+-- Лифты - из building_lift_summary и building_scores вместо GROUP BY по lifts.
+-- Набор колонок прежний, в конце добавлен lead_score
+-- ============================================
+
+DROP MATERIALIZED VIEW IF EXISTS mv_target_buildings;
+DROP VIEW IF EXISTS v_target_buildings;
+
+CREATE VIEW v_target_buildings AS
+SELECT
+    b.id as building_id,
+    b.address,
+    r.region_name,
+    m.name as municipality,
+    b.spec_account_owner_type,
+    b.overhaul_funds_balance,
+    b.total_ppl as residents,
+    b.commission_year,
+
+    -- Лифты
+    COALESCE(ls.lifts_count, 0) as lifts_count,
+    ls.nearest_replacement as earliest_replacement_date,
+    s.years_to_replacement,
+    s.avg_lift_age,
+
+    -- УК
+    mc.id as company_id,
+    mc.name as management_company,
+    mc.director_name,
+    mc.phone as company_phone,
+    mc.email as company_email,
+    mc.inn as company_inn,
+
+    -- CRM данные
+    d.id as deal_id,
+    ds.name as deal_status,
+    ds.code as deal_status_code,
+    d.assigned_user_id,
+    u.full_name as assigned_user_name,
+    d.potential_amount,
+    d.probability_percent,
+
+    -- Приоритет по баллу скоринга
+    lead_priority(COALESCE(s.score, 0)) as priority,
+
+    -- Потенциал сделки
+    COALESCE(ls.lifts_count, 0) * 2400000 as estimated_deal_amount,
+
+    s.score as lead_score
+
+FROM buildings b
+JOIN regions r ON b.region_id = r.id
+LEFT JOIN municipalities m ON b.municipality_id = m.id
+LEFT JOIN building_lift_summary ls ON ls.building_id = b.id
+LEFT JOIN building_scores s ON s.building_id = b.id
+LEFT JOIN (
+    -- Повторные активные связи с той же УК не размножают строки
+    SELECT DISTINCT building_id, company_id FROM buildings_management WHERE is_active = true
+) bm ON b.id = bm.building_id
+LEFT JOIN management_companies mc ON bm.company_id = mc.id
+LEFT JOIN deals d ON b.id = d.building_id
+    AND d.status_id NOT IN (
+        SELECT id FROM deal_statuses WHERE code IN ('won', 'lost')
+    )
+LEFT JOIN deal_statuses ds ON d.status_id = ds.id
+LEFT JOIN users u ON d.assigned_user_id = u.id
+
+WHERE b.spec_account_owner_type IN ('UK', 'TSJ', 'JSK')
+  AND b.overhaul_funds_balance >= 1200000
+
+ORDER BY
+    s.score DESC NULLS LAST,
+    b.overhaul_funds_balance DESC;
+
+COMMENT ON VIEW v_target_buildings IS
+'Целевые дома для продаж: спецсчета с балансом >= 1.2 млн руб.
+Приоритет - lead_priority(building_scores.score):
+- HIGH: балл >= 60
+- MEDIUM: балл >= 35
+- LOW: остальные';
+
+CREATE MATERIALIZED VIEW mv_target_buildings AS
+SELECT
+    v.*,
+    COALESCE(v.company_id, 0) as company_key,
+    COALESCE(v.deal_id, 0) as deal_key
+FROM v_target_buildings v;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_mv_target_key
+    ON mv_target_buildings(building_id, company_key, deal_key);
+CREATE INDEX IF NOT EXISTS idx_mv_target_priority_balance
+    ON mv_target_buildings(priority, overhaul_funds_balance DESC);
+CREATE INDEX IF NOT EXISTS idx_mv_target_balance
+    ON mv_target_buildings(overhaul_funds_balance DESC);
+CREATE INDEX IF NOT EXISTS idx_mv_target_region ON mv_target_buildings(region_name);
+
+COMMENT ON MATERIALIZED VIEW mv_target_buildings IS 'Снимок v_target_buildings на момент последнего импорта';
+
+ANALYZE building_scores;
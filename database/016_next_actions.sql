@@ -0,0 +1,110 @@
+-- ============================================
+-- Миграция 016: Очередь следующих действий менеджера
+-- Экран "дела на сегодня" (/api/activities/next-actions): невыполненные
+-- next_action с датой до сегодняшнего дня включительно, по одному менеджеру.
+-- Выполненное действие помечается next_action_done_at и выпадает из
+-- частичного индекса - индекс растет с числом открытых дел, а не с историей.
+-- Счетчик для бейджа хранится в next_action_counts и обновляется триггером
+-- ============================================
+
+SET client_encoding = 'UTF8';
+
+-- ============================================
+-- 1. ОТМЕТКА О ВЫПОЛНЕНИИ И ИНДЕКС ОЧЕРЕДИ
+-- ============================================
+
+ALTER TABLE activities ADD COLUMN IF NOT EXISTS next_action_done_at TIMESTAMP;
+
+COMMENT ON COLUMN activities.next_action_done_at IS 'Когда next_action выполнено; NULL - еще в очереди';
+
+-- Keyset очереди: user_id = ? ORDER BY (next_action_date, id).
+-- Заменяет idx_activities_next_action, который не читал ни один запрос
+CREATE INDEX IF NOT EXISTS idx_activities_next_action_queue
+    ON activities(user_id, next_action_date, id)
+    WHERE next_action_date IS NOT NULL AND next_action_done_at IS NULL;
+
+DROP INDEX IF EXISTS idx_activities_next_action;
+
+-- ============================================
+-- 2. СЧЕТЧИК ОТКРЫТЫХ ДЕЛ
+-- По дням, а не одним числом: "просрочено" и "на сегодня" сдвигаются в полночь без записи в БД
+-- ============================================
+
+CREATE TABLE IF NOT EXISTS next_action_counts (
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    next_action_date DATE NOT NULL,
+    pending_count INTEGER NOT NULL DEFAULT 0,
+
+    PRIMARY KEY (user_id, next_action_date)
+);
+
+COMMENT ON TABLE next_action_counts IS 'Невыполненные next_action по менеджеру и дате. Поддерживается триггером на activities';
+
+-- Добавить (p_delta = 1) или убрать (p_delta = -1) одно открытое дело
+CREATE OR REPLACE FUNCTION next_action_counts_apply(p_user_id INTEGER, p_date DATE, p_delta INTEGER)
+RETURNS VOID AS $$
+BEGIN
+    IF p_user_id IS NULL OR p_date IS NULL THEN
+        RETURN;
+    END IF;
+
+    INSERT INTO next_action_counts AS c (user_id, next_action_date, pending_count)
+    VALUES (p_user_id, p_date, p_delta)
+    ON CONFLICT (user_id, next_action_date) DO UPDATE SET
+        pending_count = c.pending_count + EXCLUDED.pending_count;
+END;
+$$ language 'plpgsql';
+
+CREATE OR REPLACE FUNCTION next_action_counts_on_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.next_action_done_at IS NULL THEN
+        PERFORM next_action_counts_apply(OLD.user_id, OLD.next_action_date, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.next_action_done_at IS NULL THEN
+        PERFORM next_action_counts_apply(NEW.user_id, NEW.next_action_date, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+-- Триггеры на секционированной таблице создаются и на всех секциях, в том числе будущих
+DROP TRIGGER IF EXISTS next_action_counts_insert_delete ON activities;
+CREATE TRIGGER next_action_counts_insert_delete AFTER INSERT OR DELETE ON activities
+    FOR EACH ROW EXECUTE FUNCTION next_action_counts_on_change();
+
+DROP TRIGGER IF EXISTS next_action_counts_update ON activities;
+CREATE TRIGGER next_action_counts_update AFTER UPDATE ON activities
+    FOR EACH ROW
+    WHEN (OLD.user_id IS DISTINCT FROM NEW.user_id
+          OR OLD.next_action_date IS DISTINCT FROM NEW.next_action_date
+          OR OLD.next_action_done_at IS DISTINCT FROM NEW.next_action_done_at)
+    EXECUTE FUNCTION next_action_counts_on_change();
+
+-- Полный пересчет: первичное заполнение и после DETACH/DROP секций
+-- (scripts/maintain_partitions.py) - удаление секции триггеры не вызывает
+CREATE OR REPLACE FUNCTION refresh_next_action_counts()
+RETURNS INTEGER AS $$
+DECLARE
+    affected INTEGER;
+BEGIN
+    LOCK TABLE next_action_counts IN EXCLUSIVE MODE;
+    -- Новые дела не появляются, пока идет пересчет
+    LOCK TABLE activities IN SHARE MODE;
+
+    DELETE FROM next_action_counts;
+
+    INSERT INTO next_action_counts (user_id, next_action_date, pending_count)
+    SELECT user_id, next_action_date, COUNT(*)
+    FROM activities
+    WHERE next_action_date IS NOT NULL AND next_action_done_at IS NULL AND user_id IS NOT NULL
+    GROUP BY user_id, next_action_date;
+
+    GET DIAGNOSTICS affected = ROW_COUNT;
+    RETURN affected;
+END;
+$$ language 'plpgsql';
+
+SELECT refresh_next_action_counts();
+
+ANALYZE activities;
@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import { Table, TableBody, TableCell, TableContainer, TableHead, TableRow, Paper, TextField, Typography, Pagination, CircularProgress, Box, Grid, Select, MenuItem, FormControl, InputLabel, TableSortLabel, Chip, FormControlLabel, Checkbox } from '@mui/material';
+import { Table, TableBody, TableCell, TableContainer, TableHead, TableRow, Paper, TextField, Typography, Pagination, CircularProgress, Box, Grid, Select, MenuItem, FormControl, InputLabel, TableSortLabel, Chip, FormControlLabel, Checkbox, Button, Stack } from '@mui/material';
 import axios from 'axios';
 
 const API_URL = 'http://localhost:5000/api';
@@ -24,23 +24,62 @@ export default function Buildings() {
   const [loading, setLoading] = useState(true);
   const [page, setPage] = useState(1);
   const [total, setTotal] = useState(0);
+  const [found, setFound] = useState(null); // Всего найдено домов
+  const [countApprox, setCountApprox] = useState(false); // total - оценка планировщика
   const [search, setSearch] = useState('');
   const [accountType, setAccountType] = useState('SPEC'); // По умолчанию только спецсчета
   const [minBalance, setMinBalance] = useState('0'); // Показываем все дома
   const [replacementYears, setReplacementYears] = useState([]); // Годы замены лифтов (массив)
-  const [regions, setRegions] = useState([]);
-  const [selectedRegion, setSelectedRegion] = useState('');
-  const [sortBy, setSortBy] = useState('balance'); // balance, address, lifts, date
+  const [facets, setFacets] = useState({ region: [], account_type: [], replacement_year: [] }); // Количество домов по значениям фильтров
+  const [regions, setRegions] = useState([]); // Справочник регионов (id, code, name)
+  const [selectedRegion, setSelectedRegion] = useState(''); // regions.id
+  const [sortBy, setSortBy] = useState('balance'); // balance, address, lifts, date, score
   const [sortOrder, setSortOrder] = useState('desc'); // asc или desc
   const [hasLifts, setHasLifts] = useState(true); // Только дома с лифтами
 
-  // Загрузка списка регионов
+  // Справочник регионов - один раз, фильтр по region_id
   useEffect(() => {
     axios.get(`${API_URL}/regions`)
       .then(res => setRegions(res.data.regions))
       .catch(err => console.error(err));
   }, []);
 
+  // Количество домов по значениям фильтров - одним запросом
+  useEffect(() => {
+    const params = new URLSearchParams({
+      search,
+      account_type: accountType,
+      min_balance: minBalance,
+      replacement_year: replacementYears.join(','),
+      region_id: selectedRegion,
+      has_lifts: hasLifts ? 'true' : 'false'
+    });
+    axios.get(`${API_URL}/buildings/facets?${params}`)
+      .then(res => setFacets(res.data.facets))
+      .catch(err => console.error(err));
+  }, [search, accountType, minBalance, replacementYears, selectedRegion, hasLifts]);
+
+  const facetCount = (facet, value) => {
+    const item = (facets[facet] || []).find(f => f.value === value);
+    return item ? item.count : 0;
+  };
+
+  // Текущие фильтры для выгрузки (те же, что и для списка)
+  const exportUrl = (format) => {
+    const params = new URLSearchParams({
+      format,
+      search,
+      account_type: accountType,
+      min_balance: minBalance,
+      replacement_year: replacementYears.join(','),
+      region_id: selectedRegion,
+      sort_by: sortBy,
+      sort_order: sortOrder,
+      has_lifts: hasLifts ? 'true' : 'false'
+    });
+    return `${API_URL}/buildings/export?${params}`;
+  };
+
   // Функция сортировки
   const handleSort = (column) => {
     if (sortBy === column) {
@@ -62,7 +101,7 @@ export default function Buildings() {
       account_type: accountType,
       min_balance: minBalance,
       replacement_year: replacementYears.join(','), // Передаем годы через запятую
-      region: selectedRegion,
+      region_id: selectedRegion,
       sort_by: sortBy,
       sort_order: sortOrder,
       has_lifts: hasLifts ? 'true' : 'false'
@@ -72,6 +111,8 @@ export default function Buildings() {
       .then(res => {
         setBuildings(res.data.buildings);
         setTotal(res.data.pages);
+        setFound(res.data.total);
+        setCountApprox(res.data.count_strategy === 'estimate');
         setLoading(false);
       })
       .catch(err => {
@@ -110,8 +151,8 @@ export default function Buildings() {
             <InputLabel>Регион</InputLabel>
             <Select value={selectedRegion} label="Регион" onChange={(e) => { setSelectedRegion(e.target.value); setPage(1); }}>
               <MenuItem value="">Все регионы</MenuItem>
-              {regions.map((r, idx) => (
-                <MenuItem key={idx} value={r.region}>{r.region}</MenuItem>
+              {regions.map((r) => (
+                <MenuItem key={r.id} value={r.id}>{r.name} ({facetCount('region', String(r.id))})</MenuItem>
               ))}
             </Select>
           </FormControl>
@@ -121,8 +162,8 @@ export default function Buildings() {
           <FormControl fullWidth>
             <InputLabel>Тип счета</InputLabel>
             <Select value={accountType} label="Тип счета" onChange={(e) => { setAccountType(e.target.value); setPage(1); }}>
-              <MenuItem value="SPEC">Спецсчет (УК/ТСЖ/ЖСК)</MenuItem>
-              <MenuItem value="REGOP">Регоператор</MenuItem>
+              <MenuItem value="SPEC">Спецсчет (УК/ТСЖ/ЖСК) ({facetCount('account_type', 'SPEC')})</MenuItem>
+              <MenuItem value="REGOP">Регоператор ({facetCount('account_type', 'REGOP')})</MenuItem>
               <MenuItem value="">Все</MenuItem>
             </Select>
           </FormControl>
@@ -153,7 +194,7 @@ export default function Buildings() {
                 const currentYear = new Date().getFullYear();
                 const years = [];
                 for (let y = currentYear - 5; y <= currentYear + 15; y++) {
-                  years.push(<MenuItem key={y} value={y.toString()}>{y}</MenuItem>);
+                  years.push(<MenuItem key={y} value={y.toString()}>{y} ({facetCount('replacement_year', y.toString())})</MenuItem>);
                 }
                 return years;
               })()}
@@ -177,6 +218,15 @@ export default function Buildings() {
 
       {loading ? <CircularProgress /> : (
         <>
+          <Stack direction="row" spacing={2} alignItems="center" sx={{ mb: 1 }}>
+            {found !== null && (
+              <Typography variant="body2" color="text.secondary">
+                Найдено: {countApprox ? '~' : ''}{Number(found).toLocaleString('ru-RU')}
+              </Typography>
+            )}
+            <Button size="small" variant="outlined" href={exportUrl('csv')}>Выгрузить CSV</Button>
+            <Button size="small" variant="outlined" href={exportUrl('xlsx')}>Выгрузить Excel</Button>
+          </Stack>
           <TableContainer component={Paper}>
             <Table>
               <TableHead>
@@ -218,6 +268,15 @@ export default function Buildings() {
                       <strong>Срок замены</strong>
                     </TableSortLabel>
                   </TableCell>
+                  <TableCell>
+                    <TableSortLabel
+                      active={sortBy === 'score'}
+                      direction={sortBy === 'score' ? sortOrder : 'desc'}
+                      onClick={() => handleSort('score')}
+                    >
+                      <strong>Балл</strong>
+                    </TableSortLabel>
+                  </TableCell>
                   <TableCell><strong>УК</strong></TableCell>
                   <TableCell><strong>Директор</strong></TableCell>
                   <TableCell><strong>Телефон</strong></TableCell>
@@ -240,6 +299,7 @@ export default function Buildings() {
                     }</TableCell>
                     <TableCell>{b.lifts_count || 0}</TableCell>
                     <TableCell>{b.nearest_replacement ? new Date(b.nearest_replacement).toLocaleDateString('ru-RU') : '-'}</TableCell>
+                    <TableCell>{b.lead_score != null ? Number(b.lead_score).toFixed(0) : '-'}</TableCell>
                     <TableCell>{b.company_name || '-'}</TableCell>
                     <TableCell>{b.director_name || '-'}</TableCell>
                     <TableCell><a href={`tel:${b.phone}`}>{formatPhone(b.phone)}</a></TableCell>
@@ -21,6 +21,42 @@ DB_CONFIG = {
     'password': os.getenv('DB_PASSWORD', 'repair_password_2026')
 }
 
+# Пул соединений REST API (backend/db.py)
+DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', '1'))
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', '10'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '5'))  # Сколько ждать свободное соединение, сек
+DB_POOL_HEALTHCHECK_IDLE = float(os.getenv('DB_POOL_HEALTHCHECK_IDLE', '30'))  # После какого простоя проверять SELECT 1, сек
+
+# Кэши и подсчеты REST API
+API_DATA_VERSION_CHECK_INTERVAL = float(os.getenv('API_DATA_VERSION_CHECK_INTERVAL', '5'))  # Как часто перечитывать data_version, сек
+API_STATS_TTL = float(os.getenv('API_STATS_TTL', '300'))  # Кэш /api/stats, сек
+API_RESPONSE_CACHE_SIZE = int(os.getenv('API_RESPONSE_CACHE_SIZE', '2000'))  # Ответов GET в кэше (на воркер)
+API_CACHE_REDIS_URL = os.getenv('API_CACHE_REDIS_URL', '')  # redis://localhost:6379/0 - общий кэш для всех воркеров (нужен пакет redis)
+API_CACHE_REDIS_TTL = int(os.getenv('API_CACHE_REDIS_TTL', '86400'))  # Время жизни ответа в Redis, сек
+API_COUNT_CACHE_SIZE = int(os.getenv('API_COUNT_CACHE_SIZE', '1000'))  # Точных COUNT в кэше (на воркер)
+API_COUNT_ESTIMATE_THRESHOLD = int(os.getenv('API_COUNT_ESTIMATE_THRESHOLD', '10000'))  # count=auto: выше - оценка планировщика
+API_SUGGEST_CACHE_SIZE = int(os.getenv('API_SUGGEST_CACHE_SIZE', '5000'))  # Подсказок поиска в кэше (на воркер)
+API_NEXT_ACTION_COUNT_TTL = float(os.getenv('API_NEXT_ACTION_COUNT_TTL', '30'))  # Кэш счетчика "дела на сегодня" менеджера, сек
+API_COMPRESS_MIN_BYTES = int(os.getenv('API_COMPRESS_MIN_BYTES', '1024'))  # Ответы больше - gzip/brotli
+API_PREPARED_STATEMENTS = os.getenv('API_PREPARED_STATEMENTS', 'true').lower() == 'true'  # PREPARE запросов списка домов на соединение пула
+API_PREPARED_MAX = int(os.getenv('API_PREPARED_MAX', '200'))  # Подготовленных запросов на соединение, дальше DEALLOCATE ALL
+
+# Метрики REST API (/metrics) и журнал медленных запросов
+API_METRICS_ENABLED = os.getenv('API_METRICS_ENABLED', 'true').lower() == 'true'
+API_SLOW_QUERY_MS = float(os.getenv('API_SLOW_QUERY_MS', '500'))  # Запрос медленнее - считается в api_slow_queries_total
+API_SLOW_QUERY_SAMPLE_RATE = float(os.getenv('API_SLOW_QUERY_SAMPLE_RATE', '0'))  # Доля медленных запросов с EXPLAIN ANALYZE в логе (0 - выкл.)
+
+# Журнал аудита: пакетная запись из API (backend/audit.py)
+AUDIT_FLUSH_INTERVAL = float(os.getenv('AUDIT_FLUSH_INTERVAL', '1'))  # Как часто сбрасывать буфер в audit_log, сек
+AUDIT_BATCH_SIZE = int(os.getenv('AUDIT_BATCH_SIZE', '500'))  # Записей в одном INSERT
+AUDIT_QUEUE_SIZE = int(os.getenv('AUDIT_QUEUE_SIZE', '10000'))  # Буфер на воркер; при переполнении записи отбрасываются с предупреждением
+
+# Секции audit_log и activities (scripts/maintain_partitions.py)
+PARTITION_MONTHS_AHEAD = int(os.getenv('PARTITION_MONTHS_AHEAD', '3'))  # На сколько месяцев вперед создавать секции
+AUDIT_RETENTION_MONTHS = int(os.getenv('AUDIT_RETENTION_MONTHS', '12'))  # Старше - в архив
+ACTIVITIES_RETENTION_MONTHS = int(os.getenv('ACTIVITIES_RETENTION_MONTHS', '60'))
+PARTITION_ARCHIVE_DIR = Path(os.getenv('PARTITION_ARCHIVE_DIR', str(BASE_DIR / 'data' / 'archive')))
+
 # Маппинг кодов регионов на папки
 REGION_MAPPING = {
     '02': {'code': '02', 'name': 'Республика Башкортостан', 'folder': '02_bashkortostan'},
@@ -48,6 +84,18 @@ SPEC_ACCOUNT_MAPPING = {
     'Счет регионального оператора': 'REGOP'
 }
 
+# Стоимость замены одного лифта с монтажом, руб (как в v_target_buildings и deals.estimated_cost_per_lift)
+LIFT_REPLACEMENT_COST = 2400000
+
+# Веса составляющих балла лида (database/015_lead_scores.sql, scripts/score_leads.py); нормируются на сумму
+LEAD_SCORE_WEIGHTS = {
+    'balance': float(os.getenv('LEAD_SCORE_WEIGHT_BALANCE', '0.35')),  # Баланс спецсчета
+    'replacement': float(os.getenv('LEAD_SCORE_WEIGHT_REPLACEMENT', '0.30')),  # Близость срока вывода лифтов
+    'lifts': float(os.getenv('LEAD_SCORE_WEIGHT_LIFTS', '0.15')),  # Количество лифтов
+    'age': float(os.getenv('LEAD_SCORE_WEIGHT_AGE', '0.10')),  # Средний возраст лифтов
+    'contact': float(os.getenv('LEAD_SCORE_WEIGHT_CONTACT', '0.10')),  # Есть телефон/email УК
+}
+
 # Настройки логирования
 LOG_LEVEL = 'INFO'
 LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
@@ -20,6 +20,7 @@ from psycopg2.extras import execute_batch
 from psycopg2.extensions import connection as Connection
 
 from config import DB_CONFIG, DATA_DIR, REGION_MAPPING, SPEC_ACCOUNT_MAPPING, LOG_FORMAT, LOG_LEVEL
+from post_import import finish_import
 
 # Настройка логирования
 logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
@@ -330,6 +331,17 @@ class CSVImporter:
             for mkd_code, building_id in cur.fetchall():
                 building_cache[mkd_code] = building_id
 
+        # У элементов без кода нет естественного ключа (012_natural_keys.sql): файл КР 1.2
+        # содержит их полный список по региону, поэтому старые удаляются и вставляются заново.
+        # Коммит - в конце импорта, вместе со вставкой
+        with self.conn.cursor() as cur:
+            cur.execute("""
+                DELETE FROM construction_elements
+                WHERE element_code IS NULL
+                  AND building_id IN (SELECT id FROM buildings WHERE region_id = %s)
+            """, (self.region_id,))
+            logger.info(f"Удалено элементов без кода: {cur.rowcount}")
+
         lifts_data = []
         elements_data = []
 
@@ -413,7 +425,7 @@ class CSVImporter:
         return row_num - 1
 
     def _batch_insert_lifts_and_elements(self, lifts_data: List[tuple], elements_data: List[tuple]):
-        """Пакетная вставка лифтов и элементов"""
+        """Пакетный upsert лифтов и элементов: повторный импорт обновляет строки, а не дублирует"""
         with self.conn.cursor() as cur:
             if lifts_data:
                 execute_batch(cur, """
@@ -422,11 +434,17 @@ class CSVImporter:
                         commissioning_date, decommissioning_date, last_update
                     ) VALUES (%s, %s, %s, %s, %s, %s, %s)
                     ON CONFLICT (building_id, element_code) DO UPDATE SET
+                        lift_type = EXCLUDED.lift_type,
+                        stops_count = EXCLUDED.stops_count,
                         commissioning_date = EXCLUDED.commissioning_date,
-                        decommissioning_date = EXCLUDED.decommissioning_date
+                        decommissioning_date = EXCLUDED.decommissioning_date,
+                        last_update = EXCLUDED.last_update
                 """, lifts_data)
 
-            if elements_data:
+            coded = [e for e in elements_data if e[1] is not None]
+            uncoded = [e for e in elements_data if e[1] is None]
+
+            if coded:
                 execute_batch(cur, """
                     INSERT INTO construction_elements (
                         building_id, element_code, element_type, system_type,
@@ -434,8 +452,55 @@ class CSVImporter:
                         facade_type, facade_area, foundation_type, wall_material,
                         comment, last_update
                     ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    ON CONFLICT DO NOTHING
-                """, elements_data)
+                    ON CONFLICT (building_id, element_code) WHERE element_code IS NOT NULL DO UPDATE SET
+                        element_type = EXCLUDED.element_type,
+                        system_type = EXCLUDED.system_type,
+                        roof_type = EXCLUDED.roof_type,
+                        roofing_area = EXCLUDED.roofing_area,
+                        basement_area = EXCLUDED.basement_area,
+                        facade_type = EXCLUDED.facade_type,
+                        facade_area = EXCLUDED.facade_area,
+                        foundation_type = EXCLUDED.foundation_type,
+                        wall_material = EXCLUDED.wall_material,
+                        comment = EXCLUDED.comment,
+                        last_update = EXCLUDED.last_update,
+                        imported_at = CURRENT_TIMESTAMP
+                """, coded)
+
+            # Без кода - просто вставка: старые строки удалены в начале import_kr1_2
+            if uncoded:
+                execute_batch(cur, """
+                    INSERT INTO construction_elements (
+                        building_id, element_code, element_type, system_type,
+                        roof_type, roofing_area, basement_area,
+                        facade_type, facade_area, foundation_type, wall_material,
+                        comment, last_update
+                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                """, uncoded)
+
+    def refresh_lift_summary(self):
+        """Пересчет сводки по лифтам (building_lift_summary) для региона"""
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT refresh_building_lift_summary(%s)", (self.region_id,))
+            count = cur.fetchone()[0]
+        self.conn.commit()
+        logger.info(f"Сводка по лифтам обновлена: {count} домов с лифтами")
+
+    def refresh_forecast_cube(self):
+        """Пересчет куба прогноза замены лифтов (lift_forecast_cube) для региона"""
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT refresh_lift_forecast_cube(%s)", (self.region_id,))
+            count = cur.fetchone()[0]
+        self.conn.commit()
+        logger.info(f"Куб прогноза замены лифтов обновлен: {count} ячеек")
+
+    def refresh_company_summary(self):
+        """Пересчет сводки по УК (company_summary) для компаний домов региона"""
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT refresh_company_summary(region_company_ids(%s))", (self.region_id,))
+            count = cur.fetchone()[0]
+        self.conn.commit()
+        logger.info(f"Сводка по УК обновлена: {count} компаний")
 
     def import_kr1_3(self, file_path: Path) -> int:
         """Импорт КР 1.3 - Услуги и работы"""
@@ -506,7 +571,7 @@ class CSVImporter:
         return row_num - 1
 
     def _batch_insert_services(self, services_data: List[tuple]):
-        """Пакетная вставка услуг"""
+        """Пакетный upsert услуг по ключу (building_id, service_code, work_code) - см. 012_natural_keys.sql"""
         with self.conn.cursor() as cur:
             execute_batch(cur, """
                 INSERT INTO services (
@@ -521,11 +586,31 @@ class CSVImporter:
                     %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
                     %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
                 )
-                ON CONFLICT DO NOTHING
+                ON CONFLICT (building_id, (COALESCE(service_code, '')), (COALESCE(work_code, ''))) DO UPDATE SET
+                    element_code = EXCLUDED.element_code,
+                    service_code = EXCLUDED.service_code,
+                    service_type = EXCLUDED.service_type,
+                    event_type = EXCLUDED.event_type,
+                    work_code = EXCLUDED.work_code,
+                    service_date = EXCLUDED.service_date,
+                    service_date_by_plan = EXCLUDED.service_date_by_plan,
+                    date_contract_concluded = EXCLUDED.date_contract_concluded,
+                    contract_date_services_finished = EXCLUDED.contract_date_services_finished,
+                    fact_date_services_finished = EXCLUDED.fact_date_services_finished,
+                    plan_service_cost_kpkr = EXCLUDED.plan_service_cost_kpkr,
+                    plan_service_cost_conclusion_contract = EXCLUDED.plan_service_cost_conclusion_contract,
+                    plan_service_cost_contract = EXCLUDED.plan_service_cost_contract,
+                    measure = EXCLUDED.measure,
+                    service_scope = EXCLUDED.service_scope,
+                    lifts_count = EXCLUDED.lifts_count,
+                    contractor_name = EXCLUDED.contractor_name,
+                    contractor_inn = EXCLUDED.contractor_inn,
+                    last_update = EXCLUDED.last_update,
+                    imported_at = CURRENT_TIMESTAMP
             """, services_data)
 
-    def run(self, kr_type: Optional[str] = None):
-        """Запуск импорта"""
+    def run(self, kr_type: Optional[str] = None, finalize: bool = True):
+        """Запуск импорта. finalize=False - без шагов post_import (их выполнит вызывающий)"""
         try:
             self.connect()
             self.region_id = self.get_region_id()
@@ -551,6 +636,14 @@ class CSVImporter:
                     self.import_kr1_2(files['kr1_2'])
                 else:
                     logger.warning("Файл КР 1.2 не найден")
+                # Лифты могли измениться (импорт или --clean) - пересчитываем сводку
+                self.refresh_lift_summary()
+
+            # Куб прогноза зависит и от лифтов (КР 1.2), и от балансов домов (КР 1.1)
+            if kr_type is None or kr_type in ('1.1', '1.2'):
+                self.refresh_forecast_cube()
+                # Лифты и баланс спецсчетов в сводке по УК - тоже
+                self.refresh_company_summary()
 
             if kr_type is None or kr_type == '1.3':
                 if files['kr1_3']:
@@ -558,6 +651,10 @@ class CSVImporter:
                 else:
                     logger.warning("Файл КР 1.3 не найден")
 
+            # Материализованные представления, снимок статистики, версия данных
+            if finalize:
+                finish_import(self.conn, 'import_csv')
+
             logger.info(f"=== Импорт завершен успешно ===")
 
         except Exception as e:
@@ -582,14 +679,24 @@ def main():
     else:
         regions = [args.region]
 
+    # При импорте нескольких регионов агрегаты пересчитываются один раз в конце
+    finalize_each = len(regions) == 1
+
     for region_code in regions:
         try:
             importer = CSVImporter(region_code, clean=args.clean)
-            importer.run(kr_type=args.kr)
+            importer.run(kr_type=args.kr, finalize=finalize_each)
         except Exception as e:
             logger.error(f"Ошибка импорта региона {region_code}: {e}")
             continue
 
+    if not finalize_each:
+        conn = psycopg2.connect(**DB_CONFIG)
+        try:
+            finish_import(conn, 'import_csv')
+        finally:
+            conn.close()
+
 
 if __name__ == '__main__':
     main()
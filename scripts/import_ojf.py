@@ -9,6 +9,7 @@ from pathlib import Path
 import psycopg2
 from psycopg2.extras import execute_batch
 from config import DB_CONFIG, BASE_DIR
+from post_import import finish_import
 import re
 
 # Setup logging
@@ -366,6 +367,10 @@ def import_ojf_file(filepath: Path, conn):
 
                 logger.info(f"Linked {len(link_records)} buildings to management companies")
 
+            # Сводка по УК (company_summary) - только для компаний из этого файла
+            cur.execute("SELECT refresh_company_summary(%s::bigint[])", (list(ogrn_to_id.values()),))
+            logger.info(f"Company summary refreshed for {cur.fetchone()[0]} companies")
+
         conn.commit()
         cur.close()
 
@@ -418,6 +423,9 @@ def import_all_ojf_files(region_codes=None):
             total_houses += houses
             total_uk += uk
 
+        # Материализованные представления, снимок статистики, версия данных
+        finish_import(conn, 'import_ojf')
+
         logger.info("=" * 60)
         logger.info(f"OJF Import completed!")
         logger.info(f"Total unique houses: {total_houses}")
@@ -9,6 +9,7 @@ import psycopg2
 from psycopg2.extras import execute_batch
 import pandas as pd
 from config import DB_CONFIG, BASE_DIR
+from post_import import finish_import
 
 # Setup logging
 logging.basicConfig(
@@ -198,6 +199,9 @@ def import_registry(file_path: Path):
             conn.commit()
             logger.info(f"Updated {len(updates)} management companies with contact information")
 
+            # Материализованные представления, снимок статистики, версия данных
+            finish_import(conn, 'import_registry')
+
         cur.close()
         conn.close()
 
@@ -0,0 +1,161 @@
+"""
+Обслуживание помесячных секций audit_log и activities (database/013_partitioned_logs.sql)
+
+1. Создает секции на PARTITION_MONTHS_AHEAD месяцев вперед.
+2. Секции старше срока хранения (AUDIT_RETENTION_MONTHS, ACTIVITIES_RETENTION_MONTHS)
+   выгружает в PARTITION_ARCHIVE_DIR/<таблица>/<секция>.csv.gz, отсоединяет и удаляет.
+   Выгрузка, DETACH и DROP - в одной транзакции: если что-то не удалось,
+   секция остается на месте.
+3. После архивирования activities пересчитывает next_action_counts.
+
+Запускать раз в месяц (cron), например:
+    0 3 1 * * cd /opt/capital-repair && venv/bin/python scripts/maintain_partitions.py
+
+Использование:
+    python maintain_partitions.py              # создать секции и архивировать старые
+    python maintain_partitions.py --dry-run    # только показать, что будет архивировано
+    python maintain_partitions.py --no-drop    # отсоединить, но оставить таблицы секций
+
+Восстановление архива (секция для этих месяцев или DEFAULT должна существовать):
+    gunzip -c audit_log_y2025m01.csv.gz | psql -d capital_repair_db -c "COPY audit_log FROM STDIN WITH (FORMAT csv, HEADER)"
+"""
+
+import argparse
+import gzip
+import logging
+import os
+
+import psycopg2
+from psycopg2 import sql
+
+from config import (
+    DB_CONFIG, LOG_FORMAT, LOG_LEVEL,
+    PARTITION_MONTHS_AHEAD, AUDIT_RETENTION_MONTHS, ACTIVITIES_RETENTION_MONTHS, PARTITION_ARCHIVE_DIR
+)
+
+logger = logging.getLogger(__name__)
+
+# Секционированная таблица -> срок хранения, месяцев
+PARTITIONED_TABLES = {
+    'audit_log': AUDIT_RETENTION_MONTHS,
+    'activities': ACTIVITIES_RETENTION_MONTHS,
+}
+
+
+def ensure_partitions(conn, table: str, months_ahead: int) -> int:
+    """Секции с текущего месяца на months_ahead месяцев вперед"""
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT ensure_monthly_partitions(%s, CURRENT_DATE, (CURRENT_DATE + make_interval(months => %s))::DATE)",
+            (table, months_ahead)
+        )
+        created = cur.fetchone()[0]
+    conn.commit()
+    logger.info(f"{table}: создано секций: {created}")
+    return created
+
+
+def expired_partitions(conn, table: str, retention_months: int):
+    """Секции, целиком лежащие раньше начала месяца (сейчас - retention_months)"""
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT partition_name, range_start, range_end
+            FROM monthly_partitions_before(
+                %s, (date_trunc('month', CURRENT_DATE) - make_interval(months => %s))::DATE
+            )
+        """, (table, retention_months))
+        rows = cur.fetchall()
+    conn.rollback()
+    return rows
+
+
+def archive_partition(conn, table: str, partition: str, drop: bool = True) -> int:
+    """COPY секции в gzip CSV, затем DETACH (и DROP). Возвращает количество строк"""
+    target_dir = PARTITION_ARCHIVE_DIR / table
+    target_dir.mkdir(parents=True, exist_ok=True)
+    path = target_dir / f"{partition}.csv.gz"
+    tmp_path = path.with_name(path.name + '.tmp')
+
+    try:
+        with conn.cursor() as cur:
+            # Запись в секцию блокируется до конца транзакции - архив совпадет с удаленными данными
+            cur.execute(sql.SQL("LOCK TABLE {} IN SHARE MODE").format(sql.Identifier(partition)))
+            cur.execute(sql.SQL("SELECT COUNT(*) FROM {}").format(sql.Identifier(partition)))
+            rows = cur.fetchone()[0]
+
+            copy = sql.SQL("COPY {} TO STDOUT WITH (FORMAT csv, HEADER)").format(sql.Identifier(partition))
+            with open(tmp_path, 'wb') as raw:
+                with gzip.GzipFile(fileobj=raw, mode='wb') as f:
+                    cur.copy_expert(copy.as_string(conn), f)
+                # Файл на диске до того, как данные будут удалены из БД
+                raw.flush()
+                os.fsync(raw.fileno())
+            tmp_path.replace(path)
+
+            cur.execute(sql.SQL("ALTER TABLE {} DETACH PARTITION {}").format(
+                sql.Identifier(table), sql.Identifier(partition)
+            ))
+            if drop:
+                cur.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(partition)))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+    action = 'удалена' if drop else 'отсоединена'
+    logger.info(f"{partition}: {rows} строк -> {path}, секция {action}")
+    return rows
+
+
+def refresh_next_action_counts(conn):
+    """Счетчик открытых дел (database/016_next_actions.sql): DETACH секции не вызывает триггеры на activities"""
+    with conn.cursor() as cur:
+        cur.execute("SELECT refresh_next_action_counts()")
+        rows = cur.fetchone()[0]
+    conn.commit()
+    logger.info(f"next_action_counts пересчитан: {rows} строк")
+
+
+def maintain(conn, months_ahead: int, dry_run: bool = False, drop: bool = True):
+    archived = set()
+    for table, retention_months in PARTITIONED_TABLES.items():
+        try:
+            if not dry_run:
+                ensure_partitions(conn, table, months_ahead)
+        except psycopg2.Error as e:
+            # Например, в DEFAULT уже есть строки за этот месяц - секцию нужно создать вручную
+            conn.rollback()
+            logger.error(f"{table}: не удалось создать секции: {e}")
+
+        for partition, range_start, range_end in expired_partitions(conn, table, retention_months):
+            if dry_run:
+                logger.info(f"{partition}: {range_start} - {range_end} будет архивирована")
+                continue
+            try:
+                archive_partition(conn, table, partition, drop)
+                archived.add(table)
+            except (psycopg2.Error, OSError) as e:
+                logger.error(f"{partition}: архивирование не удалось, секция оставлена: {e}")
+
+    if 'activities' in archived:
+        refresh_next_action_counts(conn)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Секции audit_log и activities: создание и архивирование')
+    parser.add_argument('--months-ahead', type=int, default=PARTITION_MONTHS_AHEAD)
+    parser.add_argument('--dry-run', action='store_true', help='Ничего не менять, показать кандидатов в архив')
+    parser.add_argument('--no-drop', action='store_true', help='После выгрузки только DETACH, таблицу секции оставить')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        maintain(conn, args.months_ahead, args.dry_run, drop=not args.no_drop)
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Общие шаги после импорта: скоринг лидов, пересчет агрегатов и увеличение версии данных
+
+Вызывается в конце import_csv.py, import_ojf.py и import_registry.py:
+    from post_import import finish_import
+    finish_import(conn, 'import_ojf')
+
+Можно запустить вручную (например, после правок в БД):
+    python post_import.py
+"""
+
+import logging
+import time
+
+import psycopg2
+
+from config import DB_CONFIG, LOG_FORMAT, LOG_LEVEL
+from score_leads import refresh_building_scores
+
+logger = logging.getLogger(__name__)
+
+# Материализованные представления (database/007_materialized_views.sql)
+MATERIALIZED_VIEWS = [
+    'mv_target_buildings',
+    'mv_regional_stats',
+    'mv_top_management_companies',
+]
+
+
+def refresh_materialized_views(conn, source: str):
+    """REFRESH CONCURRENTLY каждого представления, длительность пишется в mv_refresh_log"""
+    for view in MATERIALIZED_VIEWS:
+        started = time.monotonic()
+        with conn.cursor() as cur:
+            # CONCURRENTLY - API продолжает читать старые данные, пока идет пересчет
+            cur.execute(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {view}")
+            duration_ms = int((time.monotonic() - started) * 1000)
+
+            cur.execute(f"SELECT COUNT(*) FROM {view}")
+            row_count = cur.fetchone()[0]
+
+            cur.execute(
+                "INSERT INTO mv_refresh_log (view_name, source, duration_ms, row_count) VALUES (%s, %s, %s, %s)",
+                (view, source, duration_ms, row_count)
+            )
+        conn.commit()
+        logger.info(f"{view} обновлено за {duration_ms} мс ({row_count} строк)")
+
+
+def refresh_stats_snapshot(conn):
+    """Пересчет снимка статистики дашборда (stats_snapshot)"""
+    started = time.monotonic()
+    with conn.cursor() as cur:
+        cur.execute("SELECT refresh_stats_snapshot()")
+    conn.commit()
+    logger.info(f"Статистика дашборда обновлена за {time.monotonic() - started:.2f} с")
+
+
+def bump_data_version(conn, source: str) -> int:
+    """Увеличить версию данных - сигнал API сбросить кэши"""
+    with conn.cursor() as cur:
+        cur.execute("SELECT bump_data_version(%s)", (source,))
+        version = cur.fetchone()[0]
+    conn.commit()
+    logger.info(f"Версия данных: {version}")
+    return version
+
+
+def finish_import(conn, source: str):
+    """Все шаги после успешного импорта. Версия данных увеличивается последней"""
+    # Баллы - до представлений: приоритет в mv_target_buildings берется из building_scores
+    refresh_building_scores(conn, source)
+    refresh_materialized_views(conn, source)
+    refresh_stats_snapshot(conn)
+    bump_data_version(conn, source)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        finish_import(conn, 'post_import')
+    finally:
+        conn.close()
@@ -0,0 +1,87 @@
+"""
+Скоринг лидов: балл 0-100 для каждого дома (database/015_lead_scores.sql)
+
+Весь расчет - один запрос refresh_building_scores() по всем домам сразу,
+без построчной обработки в Python. Запускается автоматически в конце
+каждого импорта (post_import.finish_import); вручную - чтобы пересчитать
+баллы с другими весами:
+
+    python score_leads.py                                  # веса из LEAD_SCORE_WEIGHTS
+    python score_leads.py --weight balance=0.5 --weight contact=0
+    python score_leads.py --weight age=0.2 --no-finish     # без обновления mv_target_buildings и версии данных
+
+Веса нормируются на сумму, поэтому важны только пропорции.
+"""
+
+import argparse
+import json
+import logging
+import time
+
+import psycopg2
+
+from config import DB_CONFIG, LOG_FORMAT, LOG_LEVEL, LEAD_SCORE_WEIGHTS
+
+logger = logging.getLogger(__name__)
+
+
+def parse_weights(overrides) -> dict:
+    """["balance=0.5", ...] поверх LEAD_SCORE_WEIGHTS"""
+    weights = dict(LEAD_SCORE_WEIGHTS)
+    for item in overrides or []:
+        name, sep, value = item.partition('=')
+        if not sep or name not in weights:
+            raise ValueError(f"Неизвестный вес: {item} (допустимо: {', '.join(weights)})")
+        weights[name] = float(value)
+
+    if any(w < 0 for w in weights.values()) or sum(weights.values()) <= 0:
+        raise ValueError(f"Веса должны быть неотрицательными, с положительной суммой: {weights}")
+    return weights
+
+
+def refresh_building_scores(conn, source: str, weights: dict = None) -> int:
+    """Пересчет building_scores; прогон пишется в lead_score_runs. Возвращает количество измененных домов"""
+    weights = weights or LEAD_SCORE_WEIGHTS
+    started = time.monotonic()
+    with conn.cursor() as cur:
+        cur.execute("SELECT refresh_building_scores(%s::jsonb)", (json.dumps(weights),))
+        changed = cur.fetchone()[0]
+        duration_ms = int((time.monotonic() - started) * 1000)
+
+        cur.execute(
+            "INSERT INTO lead_score_runs (source, weights, duration_ms, row_count) VALUES (%s, %s::jsonb, %s, %s)",
+            (source, json.dumps(weights), duration_ms, changed)
+        )
+    conn.commit()
+    logger.info(f"Скоринг лидов за {duration_ms} мс: изменено {changed} домов")
+    return changed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Пересчет баллов лидов (building_scores)')
+    parser.add_argument('--weight', action='append', metavar='NAME=VALUE',
+                        help=f"Переопределить вес: {', '.join(LEAD_SCORE_WEIGHTS)}")
+    parser.add_argument('--no-finish', action='store_true',
+                        help='Не обновлять материализованные представления и версию данных')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+    try:
+        weights = parse_weights(args.weight)
+    except ValueError as e:
+        parser.error(str(e))
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        refresh_building_scores(conn, 'score_leads', weights)
+        if not args.no_finish:
+            # Приоритеты в mv_target_buildings и кэши API зависят от баллов
+            from post_import import refresh_materialized_views, bump_data_version
+            refresh_materialized_views(conn, 'score_leads')
+            bump_data_version(conn, 'score_leads')
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
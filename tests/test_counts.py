@@ -0,0 +1,72 @@
+"""Count strategy selection (backend/counts.py)"""
+import pytest
+
+from backend import counts
+from scripts.config import API_COUNT_ESTIMATE_THRESHOLD
+
+
+class FakeCursor:
+    """Answers EXPLAIN with a fixed estimate and COUNT(*) with a fixed total"""
+
+    def __init__(self, estimate, total):
+        self.estimate = estimate
+        self.total = total
+        self.connection = object()  # без .prepared - execute_prepared выполняет запрос как есть
+        self.executed = []
+        self._row = None
+
+    def execute(self, query, params=None):
+        self.executed.append(query)
+        if query.startswith('EXPLAIN'):
+            self._row = {'QUERY PLAN': [{'Plan': {'Plan Rows': self.estimate}}]}
+        else:
+            self._row = {'count': self.total}
+
+    def fetchone(self):
+        return self._row
+
+
+@pytest.fixture(autouse=True)
+def fixed_data_version(monkeypatch):
+    monkeypatch.setattr(counts, 'get_data_version', lambda conn: 1)
+    counts._exact_counts.clear()
+
+
+FROM_WHERE = "FROM buildings b WHERE 1=1"
+
+
+def test_none_runs_no_query():
+    cur = FakeCursor(estimate=5, total=5)
+    assert counts.count_rows(cur, FROM_WHERE, [], 'sig', 'none') == (None, 'none')
+    assert cur.executed == []
+
+
+def test_estimate_never_counts():
+    cur = FakeCursor(estimate=12, total=10)
+    assert counts.count_rows(cur, FROM_WHERE, [], 'sig', 'estimate') == (12, 'estimate')
+    assert not any('COUNT' in q for q in cur.executed)
+
+
+def test_exact_skips_explain_and_is_cached():
+    cur = FakeCursor(estimate=12, total=10)
+    assert counts.count_rows(cur, FROM_WHERE, [], 'sig', 'exact') == (10, 'exact')
+    assert counts.count_rows(cur, FROM_WHERE, [], 'sig', 'exact') == (10, 'exact')
+    assert cur.executed == ["SELECT COUNT(*) as count " + FROM_WHERE]
+
+
+def test_auto_estimates_broad_filters():
+    cur = FakeCursor(estimate=API_COUNT_ESTIMATE_THRESHOLD, total=1)
+    assert counts.count_rows(cur, FROM_WHERE, [], 'sig', 'auto') == (API_COUNT_ESTIMATE_THRESHOLD, 'estimate')
+
+
+def test_auto_counts_narrow_filters():
+    cur = FakeCursor(estimate=API_COUNT_ESTIMATE_THRESHOLD - 1, total=7)
+    assert counts.count_rows(cur, FROM_WHERE, [], 'sig', 'auto') == (7, 'exact')
+    assert len(cur.executed) == 2
+
+
+def test_exact_cache_is_keyed_by_signature():
+    cur = FakeCursor(estimate=0, total=3)
+    counts.count_rows(cur, FROM_WHERE, [], 'a', 'exact')
+    cur.total = 4
+    assert counts.count_rows(cur, FROM_WHERE, [], 'b', 'exact') == (4, 'exact')
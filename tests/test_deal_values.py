@@ -0,0 +1,60 @@
+"""Validation of the deal JSON body (queries.deal_values)"""
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from backend.queries import deal_values
+
+
+def test_values_are_converted_to_column_types():
+    assert deal_values({
+        'building_id': 5,
+        'potential_amount': 2400000.5,
+        'estimated_cost_per_lift': '1200000.00',
+        'expected_close_date': '2026-12-01',
+        'probability_percent': 40.0,
+        'notes': 'звонок',
+        'rejection_reason': None,
+    }) == {
+        'building_id': 5,
+        'potential_amount': Decimal('2400000.5'),
+        'estimated_cost_per_lift': Decimal('1200000.00'),
+        'expected_close_date': date(2026, 12, 1),
+        'probability_percent': 40,
+        'notes': 'звонок',
+        'rejection_reason': None,
+    }
+
+
+@pytest.mark.parametrize('payload', [None, [], {}, 'deal'])
+def test_body_must_be_non_empty_object(payload):
+    with pytest.raises(ValueError, match='non-empty JSON object'):
+        deal_values(payload)
+
+
+def test_unknown_fields_are_listed():
+    with pytest.raises(ValueError, match='Unknown fields: id, stage'):
+        deal_values({'stage': 'won', 'id': 1, 'notes': ''})
+
+
+@pytest.mark.parametrize('field, value', [
+    ('building_id', True),
+    ('building_id', 1.5),
+    ('building_id', 'abc'),
+    ('potential_amount', 'NaN'),
+    ('potential_amount', 'Infinity'),
+    ('potential_amount', False),
+    ('expected_close_date', '01.12.2026'),
+    ('expected_close_date', 20261201),
+    ('notes', 5),
+])
+def test_bad_values_are_rejected(field, value):
+    with pytest.raises(ValueError, match=f'Invalid value for {field}'):
+        deal_values({field: value})
+
+
+@pytest.mark.parametrize('probability', [-1, 101])
+def test_probability_is_a_percentage(probability):
+    with pytest.raises(ValueError, match='between 0 and 100'):
+        deal_values({'probability_percent': probability})
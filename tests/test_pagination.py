@@ -0,0 +1,113 @@
+"""Keyset cursors (backend/pagination.py) and the cursor branch of buildings_page"""
+import base64
+import json
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from backend import queries
+from backend.pagination import InvalidCursor, decode_cursor, encode_cursor, keyset_branches, keyset_condition
+
+
+@pytest.mark.parametrize('sort_key, decoded', [
+    (Decimal('1500000.50'), '1500000.50'),
+    (date(2026, 3, 1), '2026-03-01'),
+    ('ул. Ленина, д. 1', 'ул. Ленина, д. 1'),
+    (7, 7),
+    (None, None),
+])
+def test_cursor_round_trip(sort_key, decoded):
+    cursor = encode_cursor('balance', 'DESC', sort_key, 42)
+    assert '=' not in cursor
+    assert decode_cursor(cursor, 'balance', 'DESC') == (decoded, 42)
+
+
+@pytest.mark.parametrize('sort_by, sort_dir', [('date', 'DESC'), ('balance', 'ASC')])
+def test_cursor_for_other_sort_is_rejected(sort_by, sort_dir):
+    cursor = encode_cursor('balance', 'DESC', '100.00', 1)
+    with pytest.raises(InvalidCursor, match='does not match'):
+        decode_cursor(cursor, sort_by, sort_dir)
+
+
+def _raw_cursor(payload):
+    return base64.urlsafe_b64encode(json.dumps(payload).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+@pytest.mark.parametrize('cursor', [
+    'not a cursor!',
+    _raw_cursor({'s': 'balance', 'o': 'DESC', 'k': '1'}),  # без id
+    _raw_cursor({'s': 'balance', 'o': 'DESC', 'k': '1', 'id': 'x'}),
+    _raw_cursor(['balance', 'DESC']),
+    base64.urlsafe_b64encode(b'\xff\xfe').decode('ascii'),
+])
+def test_tampered_cursor_is_rejected(cursor):
+    with pytest.raises(InvalidCursor, match='Malformed'):
+        decode_cursor(cursor, 'balance', 'DESC')
+
+
+def test_keyset_condition_is_a_row_comparison():
+    assert keyset_condition('b.balance', 'b.id', 'DESC', '10', 5, 'numeric') == (
+        "(b.balance, b.id) < (%s::numeric, %s)", ['10', 5]
+    )
+    assert keyset_condition('b.balance', 'b.id', 'ASC', '10', 5, 'numeric')[0] == (
+        "(b.balance, b.id) > (%s::numeric, %s)"
+    )
+
+
+def test_keyset_null_tail_continues_by_id():
+    assert keyset_condition('b.balance', 'b.id', 'DESC', None, 5, 'numeric') == (
+        "(b.balance IS NULL AND b.id < %s)", [5]
+    )
+
+
+def test_keyset_branches_split_off_null_tail():
+    branches = keyset_branches('b.balance', 'b.id', 'DESC', '10', 5, 'numeric')
+    assert branches == [("(b.balance, b.id) < (%s::numeric, %s)", ['10', 5]), ("b.balance IS NULL", [])]
+    assert all(' OR ' not in condition for condition, _ in branches)
+
+    assert len(keyset_branches('b.balance', 'b.id', 'DESC', None, 5, 'numeric')) == 1
+    assert len(keyset_branches('b.address', 'b.id', 'ASC', 'a', 5, 'text', nullable=False)) == 1
+
+
+def test_buildings_page_cursor_on_nullable_sort_is_union_of_ranges():
+    cursor = encode_cursor('balance', 'DESC', Decimal('1000.00'), 9)
+    query, params, *_ = queries.buildings_page({'search': 'Ленина', 'cursor': cursor}, 20, 0, cursor)
+
+    assert query.count('UNION ALL') == 1
+    assert ' OR b.overhaul_funds_balance IS NULL' not in query
+    assert 'OFFSET' not in query
+    assert query.count('%s') == len(params)
+    # Фильтр поиска повторяется в каждой ветке, LIMIT - в ветках и снаружи
+    assert params == ['%Ленина%', '%Ленина%', '1000.00', 9, 20, '%Ленина%', '%Ленина%', 20, 20]
+
+
+def test_buildings_page_cursor_in_null_tail_is_single_range():
+    cursor = encode_cursor('balance', 'DESC', None, 9)
+    query, params, *_ = queries.buildings_page({}, 20, 0, cursor)
+
+    assert 'UNION ALL' not in query
+    assert '(b.overhaul_funds_balance IS NULL AND b.id < %s)' in query
+    assert params == [9, 20]
+
+
+def test_buildings_page_lifts_sort_counts_missing_summary_as_zero():
+    args = {'sort_by': 'lifts', 'sort_order': 'asc', 'has_lifts': 'false'}
+    cursor = encode_cursor('lifts', 'ASC', 0, 9)
+    query, params, *_ = queries.buildings_page(args, 20, 0, cursor)
+
+    assert 'ORDER BY COALESCE(ls.lifts_count, 0) ASC' in query
+    assert 'UNION ALL' not in query
+    assert params == [0, 9, 20]
+
+
+def test_buildings_page_score_sort_is_driven_by_building_scores():
+    cursor = encode_cursor('score', 'DESC', '50.00', 9)
+    query, params, count_from_where, *_ = queries.buildings_page({'sort_by': 'score'}, 20, 0, cursor)
+
+    assert 'LEFT JOIN building_scores' not in query
+    assert '(sc.score, sc.building_id) < (%s::numeric, %s)' in query
+    assert 'ORDER BY sc.score DESC NULLS LAST, sc.building_id DESC' in query
+    assert 'UNION ALL' not in query
+    assert 'JOIN building_scores sc' in count_from_where
+    assert params == ['50.00', 9, 20]
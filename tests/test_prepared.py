@@ -0,0 +1,58 @@
+"""Placeholder rewriting for PREPARE (backend/prepared.py)"""
+import pytest
+
+from backend.prepared import execute_prepared, statement_name, to_numbered
+
+
+@pytest.mark.parametrize('query, numbered', [
+    ("SELECT 1", "SELECT 1"),
+    ("a = %s AND b LIKE %s", "a = $1 AND b LIKE $2"),
+    ("ls.replacement_years && %s::smallint[] LIMIT %s", "ls.replacement_years && $1::smallint[] LIMIT $2"),
+    ("x LIKE 'a%%' AND y = %s", "x LIKE 'a%' AND y = $1"),
+    ("(%s, %s)", "($1, $2)"),
+    ("%%s = %s", "%s = $1"),
+])
+def test_to_numbered(query, numbered):
+    assert to_numbered(query) == numbered
+
+
+def test_statement_name_depends_on_text_only():
+    assert statement_name("SELECT %s") == statement_name("SELECT %s")
+    assert statement_name("SELECT %s") != statement_name("SELECT %s + 1")
+    assert statement_name("SELECT 1").startswith('api_')
+
+
+class FakeConnection:
+    def __init__(self, prepared=None):
+        if prepared is not None:
+            self.prepared = prepared
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.executed = []
+
+    def execute(self, query, params=None):
+        self.executed.append((query, params))
+
+
+def test_execute_prepared_prepares_once_per_connection():
+    cur = FakeCursor(FakeConnection(prepared=set()))
+    query = "SELECT * FROM buildings WHERE id = %s LIMIT %s"
+    name = statement_name(query)
+
+    execute_prepared(cur, query, [1, 20])
+    execute_prepared(cur, query, [2, 20])
+
+    assert cur.executed == [
+        (f"PREPARE {name} AS SELECT * FROM buildings WHERE id = $1 LIMIT $2", None),
+        (f"EXECUTE {name} (%s, %s)", [1, 20]),
+        (f"EXECUTE {name} (%s, %s)", [2, 20]),
+    ]
+
+
+def test_execute_prepared_plain_connection_runs_query_as_is():
+    cur = FakeCursor(FakeConnection())
+    execute_prepared(cur, "SELECT %s", [1])
+    assert cur.executed == [("SELECT %s", [1])]